@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from structured_logger import get_logger
+
+logger = get_logger("api_handler")
+
+API_KEY_HEADER = "x-api-key"
+DEFAULT_CLIENT_ID = "default"
+DEFAULT_KEY_SOURCE = "env"
+DEFAULT_REFRESH_SECONDS = 300
+DEFAULT_NEGATIVE_CACHE_SECONDS = 5
+NEGATIVE_CACHE_SIZE = 4096
+# Longer keys are rejected before they are hashed or cached
+MAX_API_KEY_LENGTH = 256
+
+_KEY_STORE = None
+_KEY_STORE_LOCK = threading.Lock()
+
+
+class EnvKeySource:
+    """
+    Reads keys from the environment.
+
+    API_TOKEN is the key of the "default" client. API_KEYS adds more as
+    comma-separated "client:key" pairs; a client may appear more than once
+    while its key is rotated.
+    """
+
+    def load(self) -> dict:
+        keys = {}
+
+        api_token = os.environ.get("API_TOKEN")
+        if api_token:
+            keys[api_token] = DEFAULT_CLIENT_ID
+
+        for pair in (os.environ.get("API_KEYS") or "").split(","):
+            client_id, _, key = pair.strip().partition(":")
+            if client_id and key:
+                keys[key] = client_id
+
+        return keys
+
+
+class FileKeySource:
+    """
+    Reads keys from a JSON file mapping each client to a key or a list of
+    keys. Stand-in for a secrets store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> dict:
+        with open(self.path) as f:
+            clients = json.load(f)
+
+        keys = {}
+        for client_id, client_keys in clients.items():
+            if isinstance(client_keys, str):
+                client_keys = [client_keys]
+            for key in client_keys:
+                keys[key] = client_id
+        return keys
+
+
+KEY_SOURCE_FACTORIES = {
+    "env": lambda: EnvKeySource(),
+    "file": lambda: FileKeySource(os.environ.get("API_KEYS_FILE")),
+}
+
+
+class ApiKeyStore:
+    """
+    Maps API keys to client ids.
+
+    Keys are loaded once and reloaded every refresh_seconds. Only their
+    SHA-256 digests are kept, and a presented key is found with a dict lookup
+    on its digest: the lookup's timing depends on the digest, which a client
+    cannot steer toward a stored one, not on the key itself. Digests of
+    rejected keys are remembered for negative_cache_seconds so repeated bad
+    keys are not logged again.
+    """
+
+    def __init__(
+        self,
+        source,
+        refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+        negative_cache_seconds: float = DEFAULT_NEGATIVE_CACHE_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self.negative_cache_seconds = negative_cache_seconds
+        self._clock = clock
+        self._digests = {}
+        self._expires_at = 0.0
+        self._negative = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._digests)
+
+    def refresh(self) -> None:
+        """Reloads the keys from the source, keeping the old ones on failure."""
+
+        with self._lock:
+            try:
+                keys = self.source.load()
+            except Exception as e:
+                logger.error("Could not load API keys due to: %s", e)
+            else:
+                self._digests = {
+                    _digest(key): client_id for key, client_id in keys.items()
+                }
+                # A key rejected before may have just been added
+                self._negative.clear()
+
+            self._expires_at = self._clock() + self.refresh_seconds
+
+    def authenticate(self, api_key: str):
+        """
+        Returns the client id of an API key.
+
+        Args:
+            api_key (str): The presented key.
+
+        Returns:
+            str | None: The client id, or None when the key is unknown.
+        """
+
+        return self.check(api_key)[0]
+
+    def check(self, api_key: str) -> tuple:
+        """
+        Returns the client id of an API key and whether it was recently
+        rejected.
+
+        Args:
+            api_key (str): The presented key.
+
+        Returns:
+            tuple: The client id, or None when the key is unknown or longer
+                than MAX_API_KEY_LENGTH, and True when the key was already
+                rejected within negative_cache_seconds.
+        """
+
+        if len(api_key) > MAX_API_KEY_LENGTH:
+            return None, False
+
+        now = self._clock()
+        if now >= self._expires_at:
+            self.refresh()
+
+        digest = _digest(api_key)
+        client_id = self._digests.get(digest)
+        if client_id is not None:
+            return client_id, False
+
+        rejected_until = self._negative.get(digest)
+        if rejected_until is not None and rejected_until > now:
+            return None, True
+
+        self._remember_rejected(digest, now)
+        return None, False
+
+    def _remember_rejected(self, digest: bytes, now: float) -> None:
+        if self.negative_cache_seconds <= 0:
+            return
+
+        with self._lock:
+            self._negative[digest] = now + self.negative_cache_seconds
+            self._negative.move_to_end(digest)
+            while len(self._negative) > NEGATIVE_CACHE_SIZE:
+                self._negative.popitem(last=False)
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
+def get_api_key(headers) -> str:
+    """
+    Returns the x-api-key header, whatever its case, in a single pass.
+
+    Args:
+        headers (dict | None): The request headers.
+
+    Returns:
+        str | None: The header value, or None when it is missing.
+    """
+
+    if not headers:
+        return None
+
+    for name, value in headers.items():
+        if len(name) == len(API_KEY_HEADER) and name.lower() == API_KEY_HEADER:
+            return value
+    return None
+
+
+def get_key_store() -> ApiKeyStore:
+    """
+    Returns the API key store, creating it on first use.
+
+    The source is chosen by API_KEYS_SOURCE (env or file) and the store is
+    rebuilt when its configuration changes.
+
+    Returns:
+        ApiKeyStore: The shared key store.
+    """
+
+    global _KEY_STORE
+
+    source_name = os.environ.get("API_KEYS_SOURCE") or DEFAULT_KEY_SOURCE
+    fingerprint = (
+        source_name,
+        os.environ.get("API_KEYS_FILE"),
+        os.environ.get("API_KEYS_REFRESH_SECONDS"),
+        os.environ.get("API_KEYS_NEGATIVE_CACHE_SECONDS"),
+    )
+
+    cached = _KEY_STORE
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    with _KEY_STORE_LOCK:
+        cached = _KEY_STORE
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        factory = KEY_SOURCE_FACTORIES.get(source_name)
+        if factory is None:
+            raise ValueError(f"Unknown API key source: {source_name}")
+
+        store = ApiKeyStore(
+            factory(),
+            refresh_seconds=float(
+                os.environ.get("API_KEYS_REFRESH_SECONDS") or DEFAULT_REFRESH_SECONDS
+            ),
+            negative_cache_seconds=float(
+                os.environ.get("API_KEYS_NEGATIVE_CACHE_SECONDS")
+                or DEFAULT_NEGATIVE_CACHE_SECONDS
+            ),
+        )
+        _KEY_STORE = (fingerprint, store)
+
+    return store
+
+
+def reset_key_store() -> None:
+    """Drops the cached key store, forcing the keys to be reloaded."""
+
+    global _KEY_STORE
+
+    with _KEY_STORE_LOCK:
+        _KEY_STORE = None
+
+
+def authenticate(headers):
+    """
+    Authenticates a request by its x-api-key header.
+
+    Args:
+        headers (dict | None): The request headers.
+
+    Returns:
+        str | None: The client id, or None when the request is not authorized.
+    """
+
+    api_key = get_api_key(headers)
+    if not api_key:
+        logger.warning("API token header missing")
+        return None
+
+    store = get_key_store()
+    client_id, repeated = store.check(api_key)
+    if client_id is None:
+        if repeated:
+            # Already logged when it was first rejected
+            return None
+        if not len(store):
+            logger.error("No API keys configured")
+        else:
+            logger.warning("Invalid API token")
+        return None
+
+    logger.debug("Token validated", client_id=client_id)
+    return client_id
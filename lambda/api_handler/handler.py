@@ -1,57 +1,112 @@
 import json
+import math
 import os
+import re
+import time
 import uuid
+import zlib
 from datetime import datetime
 
-import boto3
+import sqs_clients
+from auth import authenticate
+from claim_check import ENVELOPE_FIELD, encode_payload
+from metrics import get_metrics
+from rate_limit import get_rate_limiter
+from resilience import (
+    QueueUnavailableError,
+    attempt_timeouts,
+    budget_deadline,
+    call_sqs,
+)
+from resilience import snapshot as resilience_snapshot
+from structured_logger import buffered, get_logger
+from validation import (
+    DEFAULT_PRIORITY,
+    PRIORITY_ALIASES,
+    ValidationError,
+    validate_task,
+)
 
+logger = get_logger("api_handler")
+metrics = get_metrics("api_handler")
 
-def get_sqs_client():
-    config = {}
+# send_message_batch accepts at most 10 entries per call.
+SQS_BATCH_SIZE = 10
+MAX_BATCH_ITEMS = 500
+BATCH_PATH_SUFFIX = "/tasks/batch"
 
-    if os.environ.get("ENVIRONMENT") == "local":
-        # Use LocalStack container hostname (from inside Docker network)
-        localstack_endpoint = os.environ.get(
-            "LOCALSTACK_ENDPOINT", "http://localstack:4566"
-        )
-        config["endpoint_url"] = localstack_endpoint
-        print(f"DEBUG: Using LocalStack endpoint: {localstack_endpoint}")
+DEFAULT_MESSAGE_GROUP_ID = "tasks"
+DEFAULT_ORDERING_KEY_FIELD = "ordering_key"
+DEFAULT_TASK_TYPE = "default"
+# Request headers a trace ID is taken from, in order
+TRACE_HEADERS = ("x-trace-id", "x-amzn-trace-id")
+DEFAULT_RETRY_MODE = "adaptive"
+# MessageGroupId allows up to 128 alphanumeric or punctuation characters.
+_VALID_GROUP_ID = re.compile(r"^[\x21-\x7e]{1,128}$")
+# (ORDERING_KEY_SHARDS value, parsed shard count)
+_SHARDS = None
 
-    if (
-        os.environ.get("ENVIRONMENT") == "staging"
-        or os.environ.get("ENVIRONMENT") == "production"
-    ):
-        config["endpoint_url"] = os.environ.get("AWS_SQS_ENDPOINT_URL")
-        config["region_name"] = os.environ.get("AWS_REGION")
-        config["aws_access_key_id"] = os.environ.get("AWS_ACCESS_KEY_ID")
-        config["aws_secret_access_key"] = os.environ.get("AWS_SECRET_ACCESS_KEY")
 
-    return boto3.client("sqs", **config)
+def _resolve_pool_settings() -> dict:
+    """
+    Reads the client's retry mode and optional connection pool tuning.
 
+    botocore only rate limits and never retries itself: with the default
+    "adaptive" SQS_RETRY_MODE its client-side token bucket slows down sends
+    once SQS throttles, while retries, backoff and the latency budget are
+    left to resilience.call_sqs. Each attempt's connect and read timeouts
+    come from resilience.attempt_timeouts.
 
-def validate_api_token(headers) -> bool:
-    expected_token = os.environ.get("API_TOKEN")
+    Returns:
+        dict: botocore Config keyword arguments.
+    """
 
-    if not expected_token:
-        print("ERROR: API_TOKEN not configured")
-        return False
+    settings = {
+        "retries": {
+            "mode": os.environ.get("SQS_RETRY_MODE") or DEFAULT_RETRY_MODE,
+            "total_max_attempts": 1,
+        },
+        **attempt_timeouts(),
+    }
 
-    api_token_headers = (
-        headers.get("x-api-key") or headers.get("X-Api-Key") or headers.get("X-API-KEY")
-    )
+    max_pool_connections = os.environ.get("SQS_MAX_POOL_CONNECTIONS")
+    if max_pool_connections:
+        settings["max_pool_connections"] = int(max_pool_connections)
 
-    if not api_token_headers:
-        print("ERROR: API token header missing")
-        return False
+    tcp_keepalive = os.environ.get("SQS_TCP_KEEPALIVE")
+    if tcp_keepalive:
+        settings["tcp_keepalive"] = tcp_keepalive.lower() in ("1", "true", "yes")
 
-    if api_token_headers != expected_token:
-        print(
-            f"ERROR: Invalid API token. Expected: {expected_token}, Got: {api_token_headers}"
-        )
-        return False
+    return settings
+
+
+def get_sqs_client():
+    """
+    Returns the pooled SQS client of the API handler.
 
-    print("SUCCESS: Token validated")
-    return True
+    The client is shared with the task processor through the sqs_clients
+    layer module, tuned by _resolve_pool_settings. With SQS_BACKEND=memory
+    the in-process SQS emulator is returned instead, for offline load tests.
+
+    Returns:
+        botocore.client.SQS: The SQS client.
+    """
+
+    return sqs_clients.get_sqs_client(_resolve_pool_settings())
+
+
+def validate_api_token(headers) -> bool:
+    """
+    Checks the request's x-api-key header against the API key store.
+
+    Args:
+        headers (dict | None): The request headers.
+
+    Returns:
+        bool: Whether the key belongs to a known client.
+    """
+
+    return authenticate(headers) is not None
 
 
 def main(event, context):
@@ -66,27 +121,197 @@ def main(event, context):
         dict: A response object with status code and message.
     """
 
-    # Validate API token
-    headers = event.get("headers", {})
+    started = time.perf_counter()
 
-    if not validate_api_token(headers):
-        return {"statusCode": 401, "body": json.dumps({"message": "Unauthorized"})}
+    with buffered():
+        try:
+            response = _handle_request(event, context)
+        except BaseException:
+            _record_request_metrics(500, started)
+            raise
 
-    # Parse body
-    body = json.loads(event.get("body", "{}"))
-    data = _get_data_from_body(body)
+        _record_request_metrics(response["statusCode"], started)
+        return response
+
+
+def _record_request_metrics(status_code: int, started: float) -> None:
+    metrics.timing("RequestDuration", (time.perf_counter() - started) * 1000)
+    metrics.count(f"Status{status_code // 100}xx")
+    metrics.flush()
+
+
+def task_dimensions(body: dict) -> tuple:
+    """Returns the (priority, task_type) metric dimensions of a task."""
+
+    priority = body.get("priority") or DEFAULT_PRIORITY
+    return (
+        PRIORITY_ALIASES.get(priority, priority),
+        body.get("task_type", DEFAULT_TASK_TYPE),
+    )
+
+
+def _handle_request(event, context):
+    body, rejection = admit_request(event)
+    if rejection is not None:
+        return rejection
+
+    # SQS calls give up in time for the API to answer
+    deadline = budget_deadline(context)
+
+    if is_batch_request(event):
+        return _handle_batch(body, deadline, trace_attributes(event))
+
+    try:
+        task_id, message = prepare_task(body, trace_attributes(event))
+    except ValidationError as e:
+        return invalid_task_response(e)
 
     # Send to SQS
     sqs_client = get_sqs_client()
     queue_url = os.environ.get("QUEUE_URL")
+
+    try:
+        call_sqs(sqs_client.send_message, deadline, QueueUrl=queue_url, **message)
+    except QueueUnavailableError as e:
+        return unavailable_response(e)
+
+    metrics.count("TasksQueued", dimensions=task_dimensions(body))
+    return queued_response(task_id)
+
+
+def invalid_task_response(error: ValidationError) -> dict:
+    """
+    Builds the 400 answered for a task that does not match the schema.
+
+    Args:
+        error (ValidationError): The task's field errors.
+
+    Returns:
+        dict: A 400 response listing every field error.
+    """
+
+    logger.warning("Invalid task: %s", error)
+    return {
+        "statusCode": 400,
+        "body": json.dumps({"message": "Invalid task", "errors": error.errors}),
+    }
+
+
+def unavailable_response(error: QueueUnavailableError) -> dict:
+    """
+    Builds the 503 answered when SQS is unhealthy.
+
+    Args:
+        error (QueueUnavailableError): Why the task could not be queued.
+
+    Returns:
+        dict: A 503 response, with Retry-After when the breaker is open.
+    """
+
+    logger.warning("Queue unavailable: %s", error, **resilience_snapshot())
+
+    response = {
+        "statusCode": 503,
+        "body": json.dumps({"message": "Service temporarily unavailable"}),
+    }
+    if error.retry_after:
+        response["headers"] = {"Retry-After": str(math.ceil(error.retry_after))}
+    return response
+
+
+def admit_request(event: dict) -> tuple:
+    """
+    Authenticates, parses and rate limits a request.
+
+    Args:
+        event (dict): The API Gateway event.
+
+    Returns:
+        tuple: The parsed body and None when the request is admitted,
+            otherwise None and the response rejecting it.
+    """
+
+    # Validate API token
+    client_id = authenticate(event.get("headers"))
+
+    if client_id is None:
+        return None, {
+            "statusCode": 401,
+            "body": json.dumps({"message": "Unauthorized"}),
+        }
+
+    # Parse body
+    body = json.loads(event.get("body", "{}"))
+
+    # Shed load over the client's limit before it costs an SQS call
+    is_batch = is_batch_request(event)
+    cost = len(body) if is_batch and isinstance(body, list) else 1
+    throttled = _check_rate_limit(client_id, cost)
+    if throttled is not None:
+        return None, throttled
+
+    return body, None
+
+
+def prepare_task(body: dict, attributes: dict = None) -> tuple:
+    """
+    Validates a single task, assigns it a task id and builds its SQS message.
+
+    Args:
+        body (dict): The request body of a single task.
+        attributes (dict | None): MessageAttributes, see trace_attributes.
+
+    Returns:
+        tuple: The task id and the fields returned by _build_message.
+
+    Raises:
+        ValidationError: When the task does not match the Task schema.
+    """
+
     task_id = str(uuid.uuid4())
+    data = _get_data_from_body(validate_task(body), task_id)
+    group_id = _resolve_message_group_id(body)
 
-    sqs_client.send_message(
-        QueueUrl=queue_url,
-        MessageBody=json.dumps(data),
-        MessageGroupId="tasks",
-        MessageDeduplicationId=task_id,
-    )
+    return task_id, _build_message(data, task_id, group_id, attributes)
+
+
+def trace_attributes(event: dict, received_at: float = None) -> dict:
+    """
+    Builds the MessageAttributes that trace a request through the queue.
+
+    TraceId comes from the x-trace-id or X-Amzn-Trace-Id header, or is
+    generated. IngestedAt is when the request reached the API, in epoch
+    milliseconds: API Gateway's requestTimeEpoch when present. With SQS's
+    SentTimestamp they let the processor tell the time spent before the
+    send from the time spent in the queue.
+
+    Args:
+        event (dict): The API Gateway event.
+        received_at (float | None): Epoch seconds the request was received,
+            used without a requestTimeEpoch. Defaults to now.
+
+    Returns:
+        dict: The TraceId and IngestedAt message attributes.
+    """
+
+    trace_id = None
+    for name, value in (event.get("headers") or {}).items():
+        if name.lower() in TRACE_HEADERS and value:
+            trace_id = value
+            break
+
+    ingested_at = (event.get("requestContext") or {}).get("requestTimeEpoch")
+    if ingested_at is None:
+        ingested_at = int((received_at or time.time()) * 1000)
+
+    return {
+        "TraceId": {"DataType": "String", "StringValue": trace_id or uuid.uuid4().hex},
+        "IngestedAt": {"DataType": "Number", "StringValue": str(ingested_at)},
+    }
+
+
+def queued_response(task_id: str) -> dict:
+    """Builds the 200 answered once a task is queued, carrying its task_id."""
 
     return {
         "statusCode": 200,
@@ -94,18 +319,324 @@ def main(event, context):
     }
 
 
-def _get_data_from_body(body: dict) -> dict:
+def _check_rate_limit(client_id: str, cost: int):
+    """
+    Takes cost tokens from the client's rate limit bucket.
+
+    Args:
+        client_id (str): The authenticated client.
+        cost (int): Number of tasks in the request.
+
+    Returns:
+        dict | None: A 429 response when the client is over its limit,
+            otherwise None.
+    """
+
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return None
+
+    wait = limiter.acquire(client_id, cost)
+    if wait == 0:
+        return None
+
+    if wait is None:
+        _, burst = limiter.limits_for(client_id)
+        logger.warning(
+            "Request of %d tasks exceeds the burst limit", cost, client_id=client_id
+        )
+        return {
+            "statusCode": 429,
+            "body": json.dumps(
+                {"message": f"A request may hold at most {int(burst)} tasks"}
+            ),
+        }
+
+    logger.warning("Rate limit exceeded", client_id=client_id, retry_after=wait)
+    return {
+        "statusCode": 429,
+        "headers": {"Retry-After": str(math.ceil(wait))},
+        "body": json.dumps({"message": "Too many requests"}),
+    }
+
+
+def is_batch_request(event: dict) -> bool:
+    """Returns whether the event targets the /tasks/batch path."""
+
+    path = event.get("resource") or event.get("path") or event.get("rawPath") or ""
+    return path.rstrip("/").endswith(BATCH_PATH_SUFFIX)
+
+
+def _build_message(
+    data: dict, task_id: str, group_id: str, attributes: dict = None
+) -> dict:
+    """
+    Builds the SQS message fields shared by single and batch sends.
+
+    Large payloads are compressed or offloaded to the claim-check blob store
+    when CLAIM_CHECK_BACKEND is set, and sent as an envelope in place of the
+    payload field.
+
+    Args:
+        data (dict): The task data returned by _get_data_from_body.
+        task_id (str): The task id, also used for deduplication.
+        group_id (str): The FIFO message group id.
+        attributes (dict | None): MessageAttributes to send along.
+
+    Returns:
+        dict: MessageBody, MessageGroupId and MessageDeduplicationId, plus
+            MessageAttributes when given.
+    """
+
+    if "payload" in data:
+        envelope = encode_payload(data["payload"])
+        if envelope is not None:
+            data = {key: value for key, value in data.items() if key != "payload"}
+            data[ENVELOPE_FIELD] = envelope
+
+    message = {
+        # Compact, like the payload size check, so validated payloads fit in SQS
+        "MessageBody": json.dumps(data, separators=(",", ":")),
+        "MessageGroupId": group_id,
+        "MessageDeduplicationId": task_id,
+    }
+    if attributes:
+        message["MessageAttributes"] = attributes
+    return message
+
+
+def _resolve_message_group_id(body: dict) -> str:
+    """
+    Maps the task's ordering key to a FIFO MessageGroupId.
+
+    The key is read from the dotted field path in ORDERING_KEY_FIELD
+    (default "ordering_key"). Ordering only holds within a key, so different
+    tenants or entities are processed concurrently. When ORDERING_KEY_SHARDS
+    is set, keys are hashed into that many groups. Tasks without a key share
+    the default "tasks" group.
+
+    Args:
+        body (dict): The request body of a single task.
+
+    Returns:
+        str: The MessageGroupId for the task.
+    """
+
+    field_path = os.environ.get("ORDERING_KEY_FIELD") or DEFAULT_ORDERING_KEY_FIELD
+
+    key = body
+    for part in field_path.split("."):
+        if not isinstance(key, dict):
+            key = None
+            break
+        key = key.get(part)
+
+    if key is None or key == "" or isinstance(key, (dict, list)):
+        return DEFAULT_MESSAGE_GROUP_ID
+
+    key = str(key)
+    shards = _ordering_key_shards()
+
+    if shards > 0:
+        shard = zlib.crc32(key.encode("utf-8")) % shards
+        return f"{DEFAULT_MESSAGE_GROUP_ID}-{shard}"
+
+    if not _VALID_GROUP_ID.match(key):
+        # Keep keys with spaces, unicode or excess length stable but valid
+        return f"key-{zlib.crc32(key.encode('utf-8')):08x}"
+
+    return key
+
+
+def _ordering_key_shards() -> int:
+    """
+    Parses ORDERING_KEY_SHARDS once per value.
+
+    A value that is not a non-negative integer is ignored with a warning,
+    leaving sharding off, instead of failing every request.
+
+    Returns:
+        int: The number of shards, 0 when sharding is off.
+    """
+
+    global _SHARDS
+
+    value = os.environ.get("ORDERING_KEY_SHARDS") or ""
+    cached = _SHARDS
+    if cached is not None and cached[0] == value:
+        return cached[1]
+
+    try:
+        shards = int(value or 0)
+    except ValueError:
+        shards = -1
+    if shards < 0:
+        logger.warning("Ignoring ORDERING_KEY_SHARDS %s", value)
+        shards = 0
+
+    _SHARDS = (value, shards)
+    return shards
+
+
+def _handle_batch(body, deadline: float = None, attributes: dict = None) -> dict:
+    """
+    Validates a list of tasks and sends them to SQS with send_message_batch.
+
+    Args:
+        body (list): The request body, a JSON array of tasks.
+        deadline (float | None): time.monotonic() time SQS calls must end by.
+        attributes (dict | None): MessageAttributes shared by the tasks, see
+            trace_attributes.
+
+    Returns:
+        dict: A response object with a per-item task_id and status.
+    """
+
+    if not isinstance(body, list) or not body:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": "Body must be a non-empty array of tasks"}),
+        }
+
+    if len(body) > MAX_BATCH_ITEMS:
+        return {
+            "statusCode": 400,
+            "body": json.dumps(
+                {"message": f"A batch accepts at most {MAX_BATCH_ITEMS} tasks"}
+            ),
+        }
+
+    results = []
+    entries = []
+
+    for index, item in enumerate(body):
+        try:
+            task = validate_task(item)
+        except ValidationError as e:
+            results.append(
+                {
+                    "index": index,
+                    "status": "failed",
+                    "error": "Invalid task",
+                    "errors": e.errors,
+                }
+            )
+            continue
+
+        task_id = str(uuid.uuid4())
+        data = _get_data_from_body(task, task_id)
+        group_id = _resolve_message_group_id(item)
+        results.append({"index": index, "task_id": task_id, "status": "queued"})
+        entries.append(
+            {"Id": str(index), **_build_message(data, task_id, group_id, attributes)}
+        )
+
+    unavailable = False
+    if entries:
+        unavailable = _send_batch_entries(entries, results, deadline)
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+
+    for result in results:
+        if result["status"] == "queued":
+            metrics.count(
+                "TasksQueued", dimensions=task_dimensions(body[result["index"]])
+            )
+
+    if failed == len(results):
+        if not entries:
+            status_code = 400
+        else:
+            status_code = 503 if unavailable else 502
+    elif failed:
+        status_code = 207
+    else:
+        status_code = 200
+
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(
+            {
+                "message": "Batch processed",
+                "succeeded": len(results) - failed,
+                "failed": failed,
+                "results": results,
+            }
+        ),
+    }
+
+
+def _send_batch_entries(entries: list, results: list, deadline=None) -> bool:
+    """
+    Sends entries in chunks of SQS_BATCH_SIZE and records per-item failures.
+
+    Args:
+        entries (list): send_message_batch entries, Id is the item index.
+        results (list): Per-item results, updated in place on failure.
+        deadline (float | None): time.monotonic() time SQS calls must end by.
+
+    Returns:
+        bool: Whether a chunk failed because the queue was unavailable.
+    """
+
+    sqs_client = get_sqs_client()
+    queue_url = os.environ.get("QUEUE_URL")
+    unavailable = False
+
+    for start in range(0, len(entries), SQS_BATCH_SIZE):
+        chunk = entries[start : start + SQS_BATCH_SIZE]
+
+        try:
+            response = call_sqs(
+                sqs_client.send_message_batch,
+                deadline,
+                QueueUrl=queue_url,
+                Entries=chunk,
+            )
+        except QueueUnavailableError as e:
+            logger.error("send_message_batch failed due to: %s", e)
+            unavailable = True
+            failures = [{"Id": entry["Id"], "Message": str(e)} for entry in chunk]
+        except Exception as e:
+            logger.error("send_message_batch failed due to: %s", e)
+            failures = [{"Id": entry["Id"], "Message": str(e)} for entry in chunk]
+        else:
+            failures = response.get("Failed", [])
+
+        for failure in failures:
+            result = results[int(failure["Id"])]
+            result["status"] = "failed"
+            result["error"] = failure.get("Message") or failure.get("Code", "")
+            result.pop("task_id", None)
+
+    return unavailable
+
+
+def _get_data_from_body(body: dict, task_id: str = None) -> dict:
     """
     Extracts data from the request body and sends it to SQS.
 
     Args:
-        body (dict): The request body containing data.
+        body (dict): The request body containing data, as returned by
+            validate_task.
+        task_id (str | None): The task id returned to the client, which the
+            processor keys idempotency and results by. Generated when not
+            given.
     """
 
     return {
-        "id": str(uuid.uuid4()),
+        "id": task_id or str(uuid.uuid4()),
         "timestamp": datetime.utcnow().isoformat(),
+        "title": body.get("title"),
+        "task_type": body.get("task_type", DEFAULT_TASK_TYPE),
         "payload": body.get("payload", {}),
         "description": body.get("description", ""),
-        "priority": body.get("priority", "normal"),
+        "priority": body.get("priority", DEFAULT_PRIORITY),
+        "due_date": body.get("due_date"),
     }
+
+
+if os.environ.get("SQS_CLIENT_PREWARM", "").lower() in ("1", "true", "yes"):
+    # Builds the client during init instead of on the first request, which
+    # pays off with provisioned concurrency
+    get_sqs_client()
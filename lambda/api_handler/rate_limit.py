@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+
+from lazy_import import lazy_import
+from structured_logger import get_logger
+
+logger = get_logger("api_handler")
+
+# Only the sqlite backend needs it
+sqlite3 = lazy_import("sqlite3")
+
+DEFAULT_DB_PATH = "/tmp/rate_limit.sqlite3"
+
+_LIMITER = None
+_LIMITER_CONFIG = None
+_LIMITER_LOCK = threading.Lock()
+
+
+class InMemoryBucketBackend:
+    """
+    Token buckets kept in a dict, shared by the requests of one container.
+
+    A shared backend implements the same take method.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, rate: float, burst: float, now: float):
+        """
+        Takes cost tokens from key's bucket after refilling it.
+
+        Args:
+            key (str): The bucket, e.g. a client id.
+            cost (float): Tokens the request needs.
+            rate (float): Tokens added per second.
+            burst (float): Capacity of the bucket.
+            now (float): Current time in seconds.
+
+        Returns:
+            float: 0 when the tokens were taken, otherwise the seconds until
+                enough tokens are available.
+        """
+
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens, wait = _refill_and_take(tokens, updated_at, cost, rate, burst, now)
+            self._buckets[key] = (tokens, now)
+            return wait
+
+
+class SQLiteBucketBackend:
+    """
+    Token buckets in a SQLite file, so containers or processes sharing the
+    file (e.g. on EFS) share their limits. Stand-in for a shared store such
+    as Redis or DynamoDB.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def take(self, key: str, cost: float, rate: float, burst: float, now: float):
+        with self._lock:
+            # The write lock is taken up front so concurrent takes serialize
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT tokens, updated_at FROM rate_limit WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated_at = row if row is not None else (burst, now)
+                tokens, wait = _refill_and_take(
+                    tokens, updated_at, cost, rate, burst, now
+                )
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO rate_limit (key, tokens, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, tokens, now),
+                )
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+            return wait
+
+
+def _refill_and_take(tokens, updated_at, cost, rate, burst, now) -> tuple:
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class RateLimiter:
+    """
+    Token bucket admission control per client.
+
+    Every client gets rate tokens per second up to a burst capacity; a task
+    costs one token, so a batch of n tasks costs n. Limits can be set per
+    client, everyone else gets the default limit.
+    """
+
+    def __init__(
+        self,
+        backend,
+        rate: float,
+        burst: float = None,
+        overrides: dict = None,
+        clock=time.time,
+    ):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.overrides = overrides or {}
+        self._clock = clock
+
+    def limits_for(self, client_id: str) -> tuple:
+        """Returns the (rate, burst) of a client."""
+
+        return self.overrides.get(client_id, (self.rate, self.burst))
+
+    def acquire(self, client_id: str, cost: int = 1):
+        """
+        Admits a request of cost tokens for a client.
+
+        Args:
+            client_id (str): The client, or tenant, the limit applies to.
+            cost (int): Tokens the request needs, i.e. its number of tasks.
+
+        Returns:
+            float | None: 0 when admitted, the seconds to wait before retrying
+                when throttled, or None when cost exceeds the burst and the
+                request can never be admitted.
+        """
+
+        rate, burst = self.limits_for(client_id)
+        if cost > burst:
+            return None
+        return self.backend.take(client_id, cost, rate, burst, self._clock())
+
+
+def _parse_overrides(value: str) -> dict:
+    """
+    Parses "client:rate/burst,client:rate" into {client: (rate, burst)}.
+
+    Overrides whose rate or burst is not positive are ignored, leaving the
+    client on the default limit.
+    """
+
+    overrides = {}
+    for item in (value or "").split(","):
+        client_id, _, limit = item.strip().partition(":")
+        if not client_id or not limit:
+            continue
+        rate, _, burst = limit.partition("/")
+        rate = float(rate)
+        burst = float(burst or rate)
+        if rate <= 0 or burst <= 0:
+            logger.warning("Ignoring rate limit override %s", item.strip())
+            continue
+        overrides[client_id] = (rate, burst)
+    return overrides
+
+
+def get_rate_limiter():
+    """
+    Returns the rate limiter configured by the environment.
+
+    RATE_LIMIT_RATE enables limiting with that many tasks per second per
+    client, up to RATE_LIMIT_BURST at once. RATE_LIMITS overrides both per
+    client. RATE_LIMIT_BACKEND selects "memory" (default) or "sqlite"
+    (RATE_LIMIT_DB_PATH). The limiter is kept across warm invocations and
+    rebuilt when its configuration changes.
+
+    Returns:
+        RateLimiter | None: The limiter, or None when rate limiting is off.
+    """
+
+    global _LIMITER, _LIMITER_CONFIG
+
+    rate = os.environ.get("RATE_LIMIT_RATE")
+    if not rate:
+        return None
+
+    config = (
+        (os.environ.get("RATE_LIMIT_BACKEND") or "memory").lower(),
+        os.environ.get("RATE_LIMIT_DB_PATH") or DEFAULT_DB_PATH,
+        rate,
+        os.environ.get("RATE_LIMIT_BURST"),
+        os.environ.get("RATE_LIMITS"),
+    )
+
+    if _LIMITER is not None and _LIMITER_CONFIG == config:
+        return _LIMITER
+
+    with _LIMITER_LOCK:
+        if _LIMITER is None or _LIMITER_CONFIG != config:
+            backend_name, db_path, rate, burst, overrides = config
+
+            if float(rate) <= 0:
+                raise ValueError(f"RATE_LIMIT_RATE must be positive: {rate}")
+            if burst and float(burst) <= 0:
+                raise ValueError(f"RATE_LIMIT_BURST must be positive: {burst}")
+
+            if backend_name == "sqlite":
+                backend = SQLiteBucketBackend(db_path)
+            elif backend_name == "memory":
+                backend = InMemoryBucketBackend()
+            else:
+                raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend_name}")
+
+            _LIMITER = RateLimiter(
+                backend,
+                float(rate),
+                float(burst) if burst else None,
+                _parse_overrides(overrides),
+            )
+            _LIMITER_CONFIG = config
+
+    return _LIMITER
+
+
+def reset_rate_limiter() -> None:
+    """Drops the cached limiter and its in-process buckets."""
+
+    global _LIMITER, _LIMITER_CONFIG
+
+    with _LIMITER_LOCK:
+        _LIMITER = None
+        _LIMITER_CONFIG = None
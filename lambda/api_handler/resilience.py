@@ -0,0 +1,387 @@
+import os
+import random
+import threading
+import time
+
+from structured_logger import get_logger
+
+logger = get_logger("api_handler")
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF_BASE_MS = 50
+DEFAULT_BACKOFF_MAX_MS = 1000
+DEFAULT_BUDGET_MARGIN_MS = 500
+DEFAULT_CALL_BUDGET_MS = 6000
+DEFAULT_BREAKER_FAILURE_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_SECONDS = 30
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Error codes after which the same call may succeed later
+THROTTLING_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "SlowDown",
+}
+TRANSIENT_CODES = {
+    "InternalError",
+    "InternalFailure",
+    "ServiceUnavailable",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+# Raised by botocore without an error code when a connection fails
+TRANSIENT_EXCEPTIONS = {
+    "EndpointConnectionError",
+    "ConnectionClosedError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+}
+
+_BREAKER = None
+_BREAKER_LOCK = threading.Lock()
+
+
+class QueueUnavailableError(Exception):
+    """
+    Raised instead of calling SQS when the queue is unhealthy or the latency
+    budget is spent, so the API can answer 503 right away.
+    """
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ResilienceStats:
+    """Thread-safe counters of SQS call attempts, retries and breaker trips."""
+
+    FIELDS = (
+        "calls",
+        "attempts",
+        "retries",
+        "throttled",
+        "transient_errors",
+        "failures",
+        "budget_exhausted",
+        "breaker_opened",
+        "short_circuited",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add(self, **counters) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                self._counters[name] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = dict.fromkeys(self.FIELDS, 0)
+
+
+stats = ResilienceStats()
+
+
+class CircuitBreaker:
+    """
+    Fails fast once SQS keeps failing.
+
+    After failure_threshold consecutive transient failures the breaker opens
+    and calls are refused for reset_seconds. Then a single probe call is let
+    through (half open); its success closes the breaker, its failure opens
+    it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = DEFAULT_BREAKER_RESET_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == STATE_OPEN and self._reset_elapsed():
+                return STATE_HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Returns whether a call may go to SQS now."""
+
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_OPEN and self._reset_elapsed():
+                self._state = STATE_HALF_OPEN
+            if self._state == STATE_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Returns the seconds until the breaker lets a probe through."""
+
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_seconds - self._clock())
+
+    def release(self) -> None:
+        """Ends a call that says nothing about SQS's health, e.g. a bad request."""
+
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """
+        Counts a transient failure.
+
+        Returns:
+            bool: Whether this failure opened the breaker.
+        """
+
+        with self._lock:
+            self._failures += 1
+            was_probing = self._probing
+            self._probing = False
+
+            if self._state == STATE_OPEN:
+                return False
+            if was_probing or self._failures >= self.failure_threshold:
+                self._state = STATE_OPEN
+                self._opened_at = self._clock()
+                return True
+            return False
+
+    def _reset_elapsed(self) -> bool:
+        return self._clock() - self._opened_at >= self.reset_seconds
+
+
+def error_kind(error: Exception):
+    """
+    Classifies an SQS error.
+
+    Args:
+        error (Exception): The error raised by the client.
+
+    Returns:
+        str | None: "throttled", "transient", or None when retrying cannot
+            help.
+    """
+
+    code = getattr(error, "code", None)
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code") or code
+
+    if code in THROTTLING_CODES:
+        return "throttled"
+    if code in TRANSIENT_CODES:
+        return "transient"
+    if type(error).__name__ in TRANSIENT_EXCEPTIONS:
+        return "transient"
+    return None
+
+
+def budget_deadline(context):
+    """
+    Computes the monotonic time by which SQS calls must be done.
+
+    Args:
+        context (object): The Lambda context, may be None outside Lambda.
+
+    Returns:
+        float | None: A time.monotonic() deadline, or None without a context.
+    """
+
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+
+    margin_ms = int(os.environ.get("SQS_BUDGET_MARGIN_MS") or DEFAULT_BUDGET_MARGIN_MS)
+    remaining_ms = context.get_remaining_time_in_millis() - margin_ms
+    return time.monotonic() + remaining_ms / 1000
+
+
+def attempt_timeouts() -> dict:
+    """
+    Bounds each SQS attempt by a share of the call's budget.
+
+    SQS_CALL_BUDGET_MS is split evenly across SQS_MAX_ATTEMPTS attempts, and
+    each attempt's share is split between connecting and reading. Without
+    this botocore waits 60 seconds for each, longer than the Lambda runs.
+
+    Returns:
+        dict: connect_timeout and read_timeout botocore Config arguments,
+            in seconds.
+    """
+
+    budget_ms = int(os.environ.get("SQS_CALL_BUDGET_MS") or DEFAULT_CALL_BUDGET_MS)
+    max_attempts = int(os.environ.get("SQS_MAX_ATTEMPTS") or DEFAULT_MAX_ATTEMPTS)
+    timeout = budget_ms / max(max_attempts, 1) / 2 / 1000
+    return {"connect_timeout": timeout, "read_timeout": timeout}
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    Returns the breaker shared by the SQS calls of this container.
+
+    It is tuned by SQS_BREAKER_FAILURE_THRESHOLD and
+    SQS_BREAKER_RESET_SECONDS when first used.
+
+    Returns:
+        CircuitBreaker: The breaker.
+    """
+
+    global _BREAKER
+
+    if _BREAKER is None:
+        with _BREAKER_LOCK:
+            if _BREAKER is None:
+                _BREAKER = CircuitBreaker(
+                    failure_threshold=int(
+                        os.environ.get("SQS_BREAKER_FAILURE_THRESHOLD")
+                        or DEFAULT_BREAKER_FAILURE_THRESHOLD
+                    ),
+                    reset_seconds=float(
+                        os.environ.get("SQS_BREAKER_RESET_SECONDS")
+                        or DEFAULT_BREAKER_RESET_SECONDS
+                    ),
+                )
+    return _BREAKER
+
+
+def snapshot() -> dict:
+    """Returns the counters and the breaker state."""
+
+    return {**stats.snapshot(), "breaker_state": get_circuit_breaker().state}
+
+
+def reset_resilience() -> None:
+    """Drops the breaker and zeroes the counters."""
+
+    global _BREAKER
+
+    with _BREAKER_LOCK:
+        _BREAKER = None
+    stats.reset()
+
+
+def call_sqs(
+    operation,
+    deadline: float = None,
+    breaker: CircuitBreaker = None,
+    sleep=time.sleep,
+    clock=time.monotonic,
+    **kwargs,
+):
+    """
+    Calls an SQS client method with retries, backoff and circuit breaking.
+
+    Throttling and transient errors are retried up to SQS_MAX_ATTEMPTS
+    attempts in all, with "full jitter" exponential backoff between
+    SQS_BACKOFF_BASE_MS and SQS_BACKOFF_MAX_MS. A retry that could not finish
+    before the deadline is not attempted. Other errors are raised as they
+    are, since retrying cannot fix them.
+
+    Args:
+        operation (callable): The bound client method, e.g.
+            client.send_message.
+        deadline (float | None): time.monotonic() time the call must end by.
+        breaker (CircuitBreaker | None): The breaker, the shared one when None.
+        sleep (callable): Sleeps between attempts.
+        clock (callable): Monotonic clock the deadline is measured with.
+        **kwargs: Arguments of the operation.
+
+    Returns:
+        dict: The operation's response.
+
+    Raises:
+        QueueUnavailableError: When the breaker is open, the budget is spent
+            or every attempt failed transiently.
+    """
+
+    breaker = breaker or get_circuit_breaker()
+    max_attempts = int(os.environ.get("SQS_MAX_ATTEMPTS") or DEFAULT_MAX_ATTEMPTS)
+    base = int(os.environ.get("SQS_BACKOFF_BASE_MS") or DEFAULT_BACKOFF_BASE_MS)
+    cap = int(os.environ.get("SQS_BACKOFF_MAX_MS") or DEFAULT_BACKOFF_MAX_MS)
+
+    stats.add(calls=1)
+    attempt = 0
+
+    while True:
+        if not breaker.allow():
+            stats.add(short_circuited=1)
+            raise QueueUnavailableError(
+                "Queue unavailable, circuit breaker is open", breaker.retry_after()
+            )
+
+        attempt += 1
+        stats.add(attempts=1)
+
+        try:
+            response = operation(**kwargs)
+        except Exception as e:
+            kind = error_kind(e)
+            if kind is None:
+                # A bad request says nothing about the queue's health, so
+                # it neither closes nor opens the breaker
+                breaker.release()
+                stats.add(failures=1)
+                raise
+
+            stats.add(**{"throttled" if kind == "throttled" else "transient_errors": 1})
+            if breaker.record_failure():
+                stats.add(breaker_opened=1)
+                logger.error("SQS circuit breaker opened after: %s", e)
+
+            if attempt >= max_attempts:
+                stats.add(failures=1)
+                raise QueueUnavailableError(
+                    f"SQS call failed after {attempt} attempts: {e}",
+                    breaker.retry_after() or None,
+                ) from e
+
+            delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1))) / 1000
+            if deadline is not None and clock() + delay >= deadline:
+                stats.add(failures=1, budget_exhausted=1)
+                raise QueueUnavailableError(
+                    f"Latency budget exhausted after {attempt} attempts: {e}"
+                ) from e
+
+            logger.warning(
+                "Retrying SQS call after %s", e, attempt=attempt, delay_ms=delay * 1000
+            )
+            stats.add(retries=1)
+            sleep(delay)
+            continue
+
+        breaker.record_success()
+        return response
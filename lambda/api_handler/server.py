@@ -0,0 +1,344 @@
+"""
+Long-running ASGI server for the task API, for container deployments.
+
+Requests go through the same authentication, rate limiting and message
+building as the Lambda handler. Concurrent single-task requests are
+coalesced into send_message_batch calls; each caller is answered once its
+entry is acknowledged.
+
+Run it with any ASGI server, e.g.:
+
+    uvicorn server:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import handler
+from metrics import get_metrics
+from resilience import QueueUnavailableError, call_sqs
+from resilience import snapshot as resilience_snapshot
+from structured_logger import get_logger
+from validation import ValidationError
+
+logger = get_logger("api_server")
+metrics = get_metrics("api_server")
+
+DEFAULT_COALESCE_WINDOW_MS = 5
+DEFAULT_SEND_WORKERS = 8
+HEALTH_PATH = "/health"
+TASKS_PATH = "/tasks"
+
+
+class SendError(Exception):
+    """Raised to a caller whose entry SQS did not accept."""
+
+    def __init__(self, message: str, code: str = None):
+        super().__init__(message)
+        self.code = code
+
+
+class SendCoalescer:
+    """
+    Coalesces concurrent sends into send_message_batch calls.
+
+    A send waits at most window_seconds for others to join it. A batch is
+    sent as soon as it holds max_batch_size entries, so under load batches
+    fill up without waiting for the window. A larger window trades latency
+    for fewer SQS calls.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = DEFAULT_COALESCE_WINDOW_MS / 1000,
+        max_batch_size: int = handler.SQS_BATCH_SIZE,
+        executor=None,
+    ):
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, min(max_batch_size, handler.SQS_BATCH_SIZE))
+        # boto3 blocks, so batches are sent from worker threads
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=DEFAULT_SEND_WORKERS, thread_name_prefix="sqs-send"
+        )
+        self._pending = []
+        self._timer = None
+        self._in_flight = set()
+        self.batches_sent = 0
+        self.messages_sent = 0
+
+    async def send(self, message: dict) -> None:
+        """
+        Queues a message for the next batch and waits for its acknowledgement.
+
+        Args:
+            message (dict): The fields returned by handler._build_message.
+
+        Raises:
+            SendError: When SQS rejected the entry.
+            Exception: Whatever send_message_batch raised for the batch.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((message, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+
+        await future
+
+    async def drain(self) -> None:
+        """Sends whatever is pending and waits for every batch in flight."""
+
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+
+            task = asyncio.ensure_future(self._send_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send_batch(self, batch: list) -> None:
+        entries = [
+            {"Id": str(index), **message} for index, (message, _) in enumerate(batch)
+        ]
+
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(
+                self._executor, _send_message_batch, entries
+            )
+        except Exception as e:
+            logger.error("send_message_batch failed due to: %s", e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_sent += 1
+        self.messages_sent += len(entries)
+        metrics.count("CoalescedBatches")
+        # A count, like the processor's BatchSize: divided by CoalescedBatches
+        # it gives the mean batch size
+        metrics.count("CoalescedBatchSize", len(entries))
+
+        failures = {failure["Id"]: failure for failure in response.get("Failed", [])}
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                # The caller went away
+                continue
+            failure = failures.get(str(index))
+            if failure is None:
+                future.set_result(None)
+            else:
+                future.set_exception(
+                    SendError(
+                        failure.get("Message") or failure.get("Code", ""),
+                        failure.get("Code"),
+                    )
+                )
+
+        # One EMF write per batch, carrying the counts of earlier requests
+        metrics.flush()
+
+
+def _send_message_batch(entries: list) -> dict:
+    return call_sqs(
+        handler.get_sqs_client().send_message_batch,
+        QueueUrl=os.environ.get("QUEUE_URL"),
+        Entries=entries,
+    )
+
+
+def _admit_task(event: dict, received_at: float) -> tuple:
+    """
+    Admits a single-task request and builds its message.
+
+    Returns:
+        tuple: The body, the rejection response or None, and the task id and
+            message, which are None when the request was rejected.
+    """
+
+    body, rejection = handler.admit_request(event)
+    if rejection is not None:
+        return body, rejection, None, None
+
+    task_id, message = handler.prepare_task(
+        body, handler.trace_attributes(event, received_at)
+    )
+    return body, None, task_id, message
+
+
+def _coalescer_from_env() -> SendCoalescer:
+    """
+    Builds the coalescer from SERVER_COALESCE_WINDOW_MS and
+    SERVER_COALESCE_MAX_BATCH.
+    """
+
+    window_ms = float(
+        os.environ.get("SERVER_COALESCE_WINDOW_MS") or DEFAULT_COALESCE_WINDOW_MS
+    )
+    max_batch_size = int(
+        os.environ.get("SERVER_COALESCE_MAX_BATCH") or handler.SQS_BATCH_SIZE
+    )
+    return SendCoalescer(window_ms / 1000, max_batch_size)
+
+
+class TaskApiServer:
+    """
+    ASGI application serving POST /tasks and POST /tasks/batch.
+
+    Other paths answer 404. Batch requests already use send_message_batch
+    and run the Lambda handler in a worker thread; single tasks are
+    authenticated, rate limited and built in one too, so the event loop only
+    waits on the coalescer. GET /health answers 200 for load balancer checks,
+    with the SQS retry and circuit breaker counters.
+    """
+
+    def __init__(self, coalescer: SendCoalescer = None):
+        self._coalescer = coalescer
+
+    @property
+    def coalescer(self) -> SendCoalescer:
+        if self._coalescer is None:
+            self._coalescer = _coalescer_from_env()
+        return self._coalescer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            event = await _read_event(scope, receive)
+            response = await self.handle(event)
+            await _write_response(send, response)
+
+    async def handle(self, event: dict) -> dict:
+        """
+        Answers an API Gateway shaped event.
+
+        Args:
+            event (dict): The request, as built by _read_event.
+
+        Returns:
+            dict: A response object with status code and message.
+        """
+
+        received_at = time.time()
+
+        path = event["path"].rstrip("/")
+        if path == HEALTH_PATH:
+            return {
+                "statusCode": 200,
+                "body": json.dumps({"status": "ok", "sqs": resilience_snapshot()}),
+            }
+
+        if path not in (TASKS_PATH, handler.BATCH_PATH_SUFFIX):
+            return {"statusCode": 404, "body": json.dumps({"message": "Not found"})}
+
+        if event["httpMethod"] != "POST":
+            return {
+                "statusCode": 405,
+                "body": json.dumps({"message": "Method not allowed"}),
+            }
+
+        loop = asyncio.get_running_loop()
+        try:
+            if handler.is_batch_request(event):
+                return await loop.run_in_executor(None, handler.main, event, None)
+
+            # Key lookups, rate limiting and claim-check offloads may block
+            body, rejection, task_id, message = await loop.run_in_executor(
+                None, _admit_task, event, received_at
+            )
+            if rejection is not None:
+                return rejection
+
+            await self.coalescer.send(message)
+            metrics.count("TasksQueued", dimensions=handler.task_dimensions(body))
+        except QueueUnavailableError as e:
+            return handler.unavailable_response(e)
+        except ValidationError as e:
+            return handler.invalid_task_response(e)
+        except ValueError as e:
+            logger.warning("Bad request: %s", e)
+            return {"statusCode": 400, "body": json.dumps({"message": "Bad request"})}
+        except Exception as e:
+            logger.error("Failed to queue task due to: %s", e)
+            return {
+                "statusCode": 502,
+                "body": json.dumps({"message": "Failed to queue task"}),
+            }
+
+        return handler.queued_response(task_id)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Build the client before the first request needs it
+                await asyncio.get_running_loop().run_in_executor(
+                    None, handler.get_sqs_client
+                )
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._coalescer is not None:
+                    await self._coalescer.drain()
+                    logger.info(
+                        "Coalescer drained",
+                        batches_sent=self._coalescer.batches_sent,
+                        messages_sent=self._coalescer.messages_sent,
+                    )
+                metrics.flush()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def _read_event(scope, receive) -> dict:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+
+    return {
+        "httpMethod": scope["method"],
+        "path": scope["path"],
+        "headers": {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope.get("headers", [])
+        },
+        "body": b"".join(chunks).decode("utf-8") or "{}",
+    }
+
+
+async def _write_response(send, response: dict) -> None:
+    headers = [(b"content-type", b"application/json")]
+    for name, value in (response.get("headers") or {}).items():
+        headers.append((name.lower().encode("latin-1"), str(value).encode("latin-1")))
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": response["statusCode"],
+            "headers": headers,
+        }
+    )
+    await send({"type": "http.response.body", "body": response["body"].encode()})
+
+
+app = TaskApiServer()
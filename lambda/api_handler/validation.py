@@ -0,0 +1,235 @@
+"""
+Validation of task requests against the Task schema.
+
+The schema is compiled once, at import, into one checker closure per field
+that only runs the checks the field declares, so validating a request is a
+handful of isinstance and length checks. Every field is checked and all
+errors are reported together.
+"""
+
+import json
+import os
+from datetime import datetime
+
+PRIORITIES = ("low", "medium", "high")
+DEFAULT_PRIORITY = "medium"
+# Accepted in place of the spec's names, "normal" is what the API used to send
+PRIORITY_ALIASES = {"normal": "medium"}
+DEFAULT_TASK_TYPE = "default"
+
+TITLE_MAX_LENGTH = 200
+DESCRIPTION_MAX_LENGTH = 2000
+TASK_TYPE_MAX_LENGTH = 64
+# SQS rejects messages above 256 KiB. The rest of the message body (title,
+# description, escaping) and the message attributes fit in the remaining 16 KiB
+SQS_MAX_PAYLOAD_BYTES = 240 * 1024
+# Larger payloads are compressed or offloaded when claim-check is enabled
+CLAIM_CHECK_MAX_PAYLOAD_BYTES = 1024 * 1024
+
+_MISSING = object()
+
+
+class ValidationError(ValueError):
+    """Raised when a request body is not a valid task."""
+
+    def __init__(self, errors: list):
+        super().__init__(errors)
+        self.errors = errors
+
+    def __str__(self):
+        # Only built when logged, invalid requests are rejected without it
+        return "; ".join(
+            f"{error['field'] or 'body'} {error['message']}" for error in self.errors
+        )
+
+
+def compile_schema(schema: dict):
+    """
+    Compiles a schema into a validator function.
+
+    Each field's spec may declare:
+        type: A type or tuple of types the value must be an instance of.
+        required: Whether the field must be present (and not null).
+        default: Value used when the field is absent, or a callable
+            returning it.
+        aliases: Values replaced before any other check.
+        enum: The values allowed.
+        min_length / max_length: Bounds of a string's length.
+        iso8601: Whether a string must parse as an ISO-8601 date or time.
+        max_bytes: Bound of the value's compact JSON size.
+
+    Args:
+        schema (dict): Spec per field name.
+
+    Returns:
+        callable: validate(body) returning the task's fields with defaults
+            filled in, and raising ValidationError with every field error.
+    """
+
+    checkers = tuple(
+        (
+            name,
+            _compile_field(spec),
+            spec.get("required", False),
+            spec.get("default", _MISSING),
+        )
+        for name, spec in schema.items()
+    )
+
+    def validate(body) -> dict:
+        if not isinstance(body, dict):
+            raise ValidationError([_error(None, "must be a JSON object")])
+
+        task = {}
+        errors = []
+
+        for name, check, required, default in checkers:
+            value = body.get(name)
+            if value is None:
+                if required:
+                    errors.append(_error(name, "is required"))
+                elif default is not _MISSING:
+                    task[name] = default() if callable(default) else default
+                continue
+
+            value, message = check(value)
+            if message is not None:
+                errors.append(_error(name, message))
+            else:
+                task[name] = value
+
+        if errors:
+            raise ValidationError(errors)
+        return task
+
+    return validate
+
+
+def _compile_field(spec: dict):
+    types = spec.get("type")
+    type_message = None
+    if types is not None:
+        type_message = "must be " + _describe_types(types)
+
+    aliases = spec.get("aliases")
+    checks = []
+
+    enum = spec.get("enum")
+    if enum is not None:
+        allowed = frozenset(enum)
+        enum_message = "must be one of: " + ", ".join(enum)
+        checks.append(lambda value: None if value in allowed else enum_message)
+
+    min_length = spec.get("min_length")
+    if min_length:
+        if min_length == 1:
+            min_message = "must not be empty"
+        else:
+            min_message = f"must be at least {min_length} characters"
+        checks.append(lambda value: min_message if len(value) < min_length else None)
+
+    max_length = spec.get("max_length")
+    if max_length is not None:
+        max_message = f"must be at most {max_length} characters"
+        checks.append(lambda value: max_message if len(value) > max_length else None)
+
+    if spec.get("iso8601"):
+        checks.append(_check_iso8601)
+
+    max_bytes = spec.get("max_bytes")
+    if max_bytes is not None:
+        size_message = f"must be at most {max_bytes} bytes as JSON"
+        # json.dumps builds a new encoder per call when given separators.
+        # ensure_ascii keeps the length in characters equal to bytes
+        encode = json.JSONEncoder(separators=(",", ":")).encode
+
+        def check_size(value):
+            return size_message if len(encode(value)) > max_bytes else None
+
+        checks.append(check_size)
+
+    checks = tuple(checks)
+
+    def check(value):
+        # bool is an int, but never a valid number of anything here
+        if types is not None and (
+            not isinstance(value, types) or isinstance(value, bool)
+        ):
+            return None, type_message
+        if aliases is not None:
+            value = aliases.get(value, value)
+        for step in checks:
+            message = step(value)
+            if message is not None:
+                return None, message
+        return value, None
+
+    return check
+
+
+def _check_iso8601(value: str):
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return "must be an ISO-8601 date or date and time"
+    return None
+
+
+def _describe_types(types) -> str:
+    names = {str: "a string", dict: "an object", list: "an array", int: "an integer"}
+    if not isinstance(types, tuple):
+        types = (types,)
+    return " or ".join(names.get(t, t.__name__) for t in types)
+
+
+def _error(field, message: str) -> dict:
+    return {"field": field, "message": message}
+
+
+def max_payload_bytes() -> int:
+    """
+    Returns the largest payload accepted, as compact JSON.
+
+    TASK_MAX_PAYLOAD_BYTES sets it. Without CLAIM_CHECK_BACKEND payloads are
+    sent inline, so the limit never exceeds what fits in an SQS message.
+
+    Returns:
+        int: The limit in bytes.
+    """
+
+    configured = os.environ.get("TASK_MAX_PAYLOAD_BYTES")
+    if os.environ.get("CLAIM_CHECK_BACKEND"):
+        return int(configured or CLAIM_CHECK_MAX_PAYLOAD_BYTES)
+    return min(int(configured or SQS_MAX_PAYLOAD_BYTES), SQS_MAX_PAYLOAD_BYTES)
+
+
+TASK_SCHEMA = {
+    "title": {
+        "type": str,
+        "required": True,
+        "min_length": 1,
+        "max_length": TITLE_MAX_LENGTH,
+    },
+    "description": {"type": str, "max_length": DESCRIPTION_MAX_LENGTH, "default": ""},
+    "due_date": {"type": str, "iso8601": True},
+    "priority": {
+        "type": str,
+        "aliases": PRIORITY_ALIASES,
+        "enum": PRIORITIES,
+        "default": DEFAULT_PRIORITY,
+    },
+    "task_type": {
+        "type": str,
+        "min_length": 1,
+        "max_length": TASK_TYPE_MAX_LENGTH,
+        "default": DEFAULT_TASK_TYPE,
+    },
+    "payload": {
+        "type": dict,
+        # Read once at import, as the schema is only compiled then
+        "max_bytes": max_payload_bytes(),
+        "default": dict,
+    },
+}
+
+validate_task = compile_schema(TASK_SCHEMA)
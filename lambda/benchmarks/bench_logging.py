@@ -0,0 +1,115 @@
+"""
+Benchmark of the task processor's per-record logging overhead.
+
+Compares the previous print-based logging (full event dumped with
+json.dumps(indent=2) on every invocation) with the structured logger at
+INFO, at INFO with sampling, and at WARNING.
+
+Usage:
+    python lambda/benchmarks/bench_logging.py [--records 10] [--iterations 2000]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(lambda_root, "shared", "python"))
+
+from structured_logger import INFO, LazyJson, StructuredLogger, buffered
+
+
+def make_event(records: int) -> dict:
+    return {
+        "Records": [
+            {
+                "messageId": f"msg-{i}",
+                "receiptHandle": "receipt-handle-" + "x" * 200,
+                "body": json.dumps(
+                    {
+                        "task_id": f"task-{i}",
+                        "task_type": "email",
+                        "description": "Send welcome email",
+                        "priority": "high",
+                        "created_at": "2025-11-09T10:00:00",
+                        "payload": {"to": "user@example.com", "body": "y" * 512},
+                    }
+                ),
+                "attributes": {"MessageGroupId": f"tenant-{i % 3}"},
+            }
+            for i in range(records)
+        ]
+    }
+
+
+def log_with_print(event: dict) -> None:
+    print("Received event:", json.dumps(event, indent=2))
+    for record in event["Records"]:
+        task = json.loads(record["body"])
+        print(f"Processing task {task['task_id']}:")
+        print(
+            f"[HIGH PRIORITY] Handling task {task['task_id']} of type {task['task_type']} created at {task['created_at']}. Description: {task['description']}"
+        )
+        print(f"Task {task['task_id']} processed successfully.")
+
+
+def log_with_logger(logger: StructuredLogger, event: dict) -> None:
+    with buffered():
+        logger.info("Received event: %d records", len(event["Records"]))
+        logger.debug("Event: %s", LazyJson(event))
+        for record in event["Records"]:
+            task = json.loads(record["body"])
+            logger.sampled(INFO, "Processing task %s:", task["task_id"])
+            logger.info(
+                "[HIGH PRIORITY] Handling task %s of type %s created at %s. Description: %s",
+                task["task_id"],
+                task["task_type"],
+                task["created_at"],
+                task["description"],
+            )
+            logger.sampled(INFO, "Task %s processed successfully.", task["task_id"])
+
+
+def measure(fn, event: dict, iterations: int) -> float:
+    """Returns the mean overhead per record in microseconds."""
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fn(event)  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(event)
+        elapsed = time.perf_counter() - start
+
+    return elapsed / (iterations * len(event["Records"])) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    event = make_event(args.records)
+    scenarios = {
+        "print (before)": log_with_print,
+        "logger INFO": lambda e: log_with_logger(
+            StructuredLogger("bench", level="INFO", sample_rate=1.0), e
+        ),
+        "logger INFO, 10% sampled": lambda e: log_with_logger(
+            StructuredLogger("bench", level="INFO", sample_rate=0.1), e
+        ),
+        "logger WARNING": lambda e: log_with_logger(
+            StructuredLogger("bench", level="WARNING"), e
+        ),
+    }
+
+    print(f"Per-record logging overhead ({args.records} records per batch)")
+    for name, fn in scenarios.items():
+        print(f"  {name:<28} {measure(fn, event, args.iterations):8.2f} us/record")
+
+
+if __name__ == "__main__":
+    main()
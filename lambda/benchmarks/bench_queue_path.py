@@ -0,0 +1,115 @@
+"""
+Offline load test of the queue path through both handlers.
+
+Sends tasks through handler.main (the /tasks/batch endpoint) into the
+in-memory SQS emulator, then receives them in batches of ten, runs
+task_handler.process on each batch as the SQS trigger would and deletes
+the records that did not fail. Reports messages/sec for each stage and
+end to end.
+
+Usage:
+    python lambda/benchmarks/bench_queue_path.py [--messages 100000] [--request-size 100]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+from unittest.mock import patch
+
+lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(lambda_root, "api_handler"))
+sys.path.insert(0, os.path.join(lambda_root, "task_processor"))
+sys.path.insert(0, os.path.join(lambda_root, "shared", "python"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from events import API_TOKEN, make_api_event
+
+QUEUE_URL = "http://localhost:4566/000000000000/tasks.fifo"
+
+
+def send_all(handler, messages: int, request_size: int, payload_bytes: int) -> int:
+    events = {}
+    sent = 0
+
+    while sent < messages:
+        size = min(request_size, messages - sent)
+        event = events.get(size)
+        if event is None:
+            event = events[size] = make_api_event(
+                payload_bytes=payload_bytes, batch_size=size, priority_mix="mixed"
+            )
+        response = handler.main(event, None)
+        assert response["statusCode"] == 200, response
+        sent += size
+
+    return sent
+
+
+def drain(task_handler, sqs, to_lambda_event) -> tuple:
+    processed = failed = 0
+
+    while True:
+        messages = sqs.receive_message(QueueUrl=QUEUE_URL, MaxNumberOfMessages=10).get(
+            "Messages"
+        )
+        if not messages:
+            return processed, failed
+
+        event = to_lambda_event(messages)
+        result = task_handler.process(event, None)
+        failures = {item["itemIdentifier"] for item in result["batchItemFailures"]}
+
+        entries = [
+            {"Id": str(i), "ReceiptHandle": record["receiptHandle"]}
+            for i, record in enumerate(event["Records"])
+            if record["messageId"] not in failures
+        ]
+        if entries:
+            sqs.delete_message_batch(QueueUrl=QUEUE_URL, Entries=entries)
+
+        processed += len(entries)
+        failed += len(failures)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--request-size", type=int, default=100)
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    args = parser.parse_args()
+
+    env = {
+        "SQS_BACKEND": "memory",
+        "QUEUE_URL": QUEUE_URL,
+        "API_TOKEN": API_TOKEN,
+        "LOG_LEVEL": "WARNING",
+    }
+    with patch.dict(os.environ, env):
+        import handler
+        import task_handler
+        from sqs_client import to_lambda_event
+        from sqs_emulator import get_emulator
+
+        sqs = get_emulator()
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            sent = send_all(
+                handler, args.messages, args.request_size, args.payload_bytes
+            )
+            sent_at = time.perf_counter()
+            processed, failed = drain(task_handler, sqs, to_lambda_event)
+            end = time.perf_counter()
+
+    print(
+        f"Queue path load test ({sent:,} messages, {args.payload_bytes} byte payloads)"
+    )
+    print(f"  send    {sent / (sent_at - start):12,.0f} msg/s")
+    print(f"  process {processed / (end - sent_at):12,.0f} msg/s ({failed} failed)")
+    print(f"  total   {sent / (end - start):12,.0f} msg/s in {end - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Cold-start report and startup benchmark for both Lambda handlers.
+
+Every run imports a handler in a fresh interpreter with -X importtime and
+measures the import, the first (cold) invocation and a warm invocation.
+The report lists the handler's slowest direct imports and the imports it
+defers until first use. With --max-import-ms the script exits non-zero
+when a handler's median import time is above the budget, so regressions
+are caught.
+
+Usage:
+    python lambda/benchmarks/bench_startup.py [--runs 5] [--output startup.json]
+        [--max-import-ms 100]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+
+HANDLERS = {
+    "api_handler": ("handler", "main", "make_api_event()"),
+    "task_processor": ("task_handler", "process", "make_sqs_event()"),
+}
+
+# Runs in the fresh interpreter; prints its timings as JSON on the last line
+CHILD = """
+import json, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+from events import make_api_event, make_sqs_event
+event = {event}
+call = time.perf_counter()
+{module}.{entry}(event, None)
+first = time.perf_counter()
+{module}.{entry}(event, None)
+warm = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "first_invocation_ms": (first - call) * 1000,
+    "warm_invocation_ms": (warm - first) * 1000,
+}}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str, module: str) -> dict:
+    """
+    Splits -X importtime output into the handler's direct imports and the
+    top-level imports that happened after it, i.e. deferred ones.
+    """
+
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((len(indent) // 2, name, int(cumulative_us)))
+
+    direct = []
+    deferred = []
+    pending = []
+    seen_handler = False
+
+    # Children are printed before their parent, one level deeper
+    for depth, name, cumulative_us in entries:
+        if depth == 0 and name == module:
+            direct = [entry for entry in pending if entry[0] == 1]
+            seen_handler = True
+        elif depth == 0 and seen_handler and name != "events":
+            deferred.append({"module": name, "cumulative_ms": cumulative_us / 1000})
+        pending = [] if depth == 0 else pending + [(depth, name, cumulative_us)]
+
+    direct.sort(key=lambda entry: entry[2], reverse=True)
+    return {
+        "direct_imports": [
+            {"module": name, "cumulative_ms": cumulative_us / 1000}
+            for _, name, cumulative_us in direct
+        ],
+        "deferred_imports": deferred,
+    }
+
+
+def run_once(handler: str) -> dict:
+    module, entry, event = HANDLERS[handler]
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            [
+                os.path.join(lambda_root, handler),
+                os.path.join(lambda_root, "shared", "python"),
+                benchmarks_dir,
+            ]
+        ),
+        "API_TOKEN": "bench-token",
+        "QUEUE_URL": "https://sqs.us-east-1.amazonaws.com/000000000000/tasks.fifo",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "LOG_LEVEL": "WARNING",
+    }
+
+    # The stub keeps the invocation offline while boto3 is still imported
+    # and a real client built, as on a cold start
+    code = (
+        "import botocore.client\n"
+        "botocore.client.BaseClient._make_api_call = "
+        "lambda self, operation, params: {'MessageId': 'stub'}\n"
+        if handler == "api_handler"
+        else ""
+    )
+    code += CHILD.format(module=module, entry=entry, event=event)
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {**timings, **parse_importtime(result.stderr, module)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--output", help="Path of the JSON results file")
+    parser.add_argument("--max-import-ms", type=float)
+    args = parser.parse_args()
+
+    report = {}
+    for handler in HANDLERS:
+        runs = [run_once(handler) for _ in range(args.runs)]
+        summary = {
+            metric: round(statistics.median(run[metric] for run in runs), 2)
+            for metric in ("import_ms", "first_invocation_ms", "warm_invocation_ms")
+        }
+        summary["direct_imports"] = runs[-1]["direct_imports"][: args.top]
+        summary["deferred_imports"] = runs[-1]["deferred_imports"]
+        report[handler] = summary
+
+        print(f"{handler} (median of {args.runs} runs)")
+        print(f"  import           {summary['import_ms']:8.2f} ms")
+        print(f"  first invocation {summary['first_invocation_ms']:8.2f} ms")
+        print(f"  warm invocation  {summary['warm_invocation_ms']:8.2f} ms")
+        print("  slowest imports:")
+        for item in summary["direct_imports"]:
+            print(f"    {item['module']:<24} {item['cumulative_ms']:8.2f} ms")
+        if summary["deferred_imports"]:
+            print("  deferred until first use:")
+            for item in summary["deferred_imports"]:
+                print(f"    {item['module']:<24} {item['cumulative_ms']:8.2f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.max_import_ms is not None:
+        over = [
+            handler
+            for handler, summary in report.items()
+            if summary["import_ms"] > args.max_import_ms
+        ]
+        if over:
+            print(f"Import budget of {args.max_import_ms} ms exceeded by: {over}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Benchmark suite for the api_handler and task_processor hot paths.
+
+Runs handler.main and task_handler.process over synthetic API Gateway and
+SQS events with varying payload sizes, batch sizes and priority mixes, and
+a stubbed SQS client. Reports ops/sec, p50/p99 latency and peak memory per
+scenario, and saves the results as JSON so runs can be compared over time.
+
+Usage:
+    python lambda/benchmarks/bench_suite.py [--iterations 500] [--quick]
+        [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(lambda_root, "api_handler"))
+sys.path.insert(0, os.path.join(lambda_root, "task_processor"))
+sys.path.insert(0, os.path.join(lambda_root, "shared", "python"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from events import API_TOKEN, make_api_event, make_sqs_event
+
+# Iterations traced for peak memory; tracing is too slow for the timed runs
+MEMORY_ITERATIONS = 20
+
+
+class StubSQSClient:
+    """SQS client accepting every message without any I/O."""
+
+    def send_message(self, **kwargs):
+        return {"MessageId": "stub", "SequenceNumber": "1"}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        return {
+            "Successful": [
+                {"Id": entry["Id"], "MessageId": "stub"} for entry in Entries
+            ],
+            "Failed": [],
+        }
+
+
+def build_scenarios(quick: bool) -> list:
+    """Returns (name, target, event, params) for every benchmarked scenario."""
+
+    payload_sizes = [256, 4096] if quick else [256, 4096, 65536]
+    api_batch_sizes = [10] if quick else [10, 100]
+    record_counts = [1, 10]
+    priority_mixes = (
+        ["uniform", "mixed"] if quick else ["uniform", "mixed", "high-heavy"]
+    )
+
+    scenarios = []
+
+    for payload_bytes in payload_sizes:
+        params = {"payload_bytes": payload_bytes}
+        scenarios.append(
+            (
+                f"api.single payload={payload_bytes}",
+                "api",
+                make_api_event(**params),
+                params,
+            )
+        )
+
+    for batch_size in api_batch_sizes:
+        params = {"batch_size": batch_size, "payload_bytes": 256}
+        scenarios.append(
+            (f"api.batch size={batch_size}", "api", make_api_event(**params), params)
+        )
+
+    for records in record_counts:
+        for payload_bytes in payload_sizes:
+            for priority_mix in priority_mixes:
+                params = {
+                    "records": records,
+                    "payload_bytes": payload_bytes,
+                    "priority_mix": priority_mix,
+                }
+                name = (
+                    f"processor records={records} payload={payload_bytes} "
+                    f"mix={priority_mix}"
+                )
+                scenarios.append((name, "processor", make_sqs_event(**params), params))
+
+    return scenarios
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # Nearest-rank, as used for the processor's latency summaries
+    index = max(
+        0, min(len(sorted_values) - 1, int(fraction * len(sorted_values) + 0.5) - 1)
+    )
+    return sorted_values[index]
+
+
+def run_scenario(fn, event: dict, iterations: int) -> dict:
+    """
+    Times fn(event) and traces its peak memory.
+
+    Returns:
+        dict: ops_per_sec, p50_ms, p99_ms and peak_memory_kb.
+    """
+
+    fn(event)  # warm up caches, clients and imports
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(event)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        for _ in range(MEMORY_ITERATIONS):
+            fn(event)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "ops_per_sec": round(iterations / sum(timings), 1),
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 4),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_suite(iterations: int, quick: bool) -> dict:
+    import handler
+    import task_handler
+
+    targets = {
+        "api": lambda event: handler.main(event, None),
+        "processor": lambda event: task_handler.process(event, None),
+    }
+
+    results = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, target, event, params in build_scenarios(quick):
+            metrics = run_scenario(targets[target], event, iterations)
+            results.append({"name": name, "target": target, **params, **metrics})
+            print(f"{name}: {metrics}", file=sys.stderr)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iterations,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """Prints the ops/sec change of every scenario against a baseline run."""
+
+    previous = {result["name"]: result for result in baseline["results"]}
+
+    print(f"Compared with the run of {baseline['timestamp']}")
+    for result in report["results"]:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        change = (result["ops_per_sec"] / before["ops_per_sec"] - 1) * 100
+        print(f"  {result['name']:<52} {change:+7.1f}% ops/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--quick", action="store_true", help="Run fewer scenarios")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    args = parser.parse_args()
+
+    env = {
+        "API_TOKEN": API_TOKEN,
+        "QUEUE_URL": "https://sqs.us-east-1.amazonaws.com/000000000000/tasks.fifo",
+        "LOG_LEVEL": "WARNING",
+    }
+    with patch.dict(os.environ, env), patch(
+        "handler.get_sqs_client", return_value=StubSQSClient()
+    ):
+        report = run_suite(args.iterations, args.quick)
+
+    print(f"{'scenario':<52} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KB':>9}")
+    for result in report["results"]:
+        print(
+            f"{result['name']:<52} {result['ops_per_sec']:>10,.0f} "
+            f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+            f"{result['peak_memory_kb']:>9.1f}"
+        )
+
+    output = args.output or os.path.join(
+        lambda_root,
+        "benchmarks",
+        "results",
+        f"bench-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark of the task processor's message body decoding.
+
+Compares the previous decoding (json.loads, then dict lookups with a
+created_at default that read the clock on every record) with decode_task
+using the stdlib json module and, when installed, orjson.
+
+Usage:
+    python lambda/benchmarks/bench_task_decode.py [--records 10000] [--payload-bytes 512]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_task_model(name: str):
+    """Loads a separate copy of task_model, so backends can be compared."""
+
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(lambda_root, "task_processor", "task_model.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_bodies(records: int, payload_bytes: int) -> list:
+    return [
+        json.dumps(
+            {
+                "task_id": f"task-{i}",
+                "task_type": "email",
+                "description": "Send welcome email",
+                "priority": ("high", "medium", "low")[i % 3],
+                "created_at": "2025-11-09T10:00:00",
+                "payload": {"to": "user@example.com", "body": "y" * payload_bytes},
+            }
+        )
+        for i in range(records)
+    ]
+
+
+def decode_before(body: str) -> tuple:
+    message_body = json.loads(body)
+    return (
+        message_body["task_id"],
+        message_body["task_type"],
+        message_body.get("description", "No description provided"),
+        message_body.get("priority", "normal"),
+        message_body.get("created_at", datetime.utcnow().isoformat()),
+    )
+
+
+def measure(decode, bodies: list) -> float:
+    """Returns the number of records decoded per second."""
+
+    for body in bodies[:100]:
+        decode(body)  # warm up
+
+    start = time.perf_counter()
+    for body in bodies:
+        decode(body)
+    elapsed = time.perf_counter() - start
+
+    return len(bodies) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--payload-bytes", type=int, default=512)
+    args = parser.parse_args()
+
+    bodies = make_bodies(args.records, args.payload_bytes)
+    scenarios = {"json.loads + .get (before)": decode_before}
+
+    # A copy loaded without orjson measures the stdlib fallback
+    with patch.dict(sys.modules, {"orjson": None}):
+        stdlib_model = load_task_model("task_model_json")
+    scenarios["decode_task (json)"] = stdlib_model.decode_task
+
+    fast_model = load_task_model("task_model_fast")
+    if fast_model.JSON_BACKEND == "orjson":
+        scenarios["decode_task (orjson)"] = fast_model.decode_task
+
+    print(f"Task decoding throughput ({args.payload_bytes} byte payloads)")
+    for name, decode in scenarios.items():
+        print(f"  {name:<28} {measure(decode, bodies):12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
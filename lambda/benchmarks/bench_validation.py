@@ -0,0 +1,137 @@
+"""
+Benchmark of the API's task validation.
+
+Compares validate_task, whose schema is compiled once into per-field
+checkers, with a validator that walks the same schema on every request, for
+valid tasks and for tasks with several invalid fields.
+
+Usage:
+    python lambda/benchmarks/bench_validation.py [--tasks 20000] [--payload-bytes 256]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(lambda_root, "api_handler"))
+
+from validation import TASK_SCHEMA, ValidationError, validate_task  # noqa: E402
+
+
+def make_tasks(count: int, payload_bytes: int, valid: bool) -> list:
+    if valid:
+        return [
+            {
+                "title": f"Task {i}",
+                "description": "Send welcome email",
+                "due_date": "2025-12-01T09:00:00Z",
+                "priority": ("high", "medium", "low")[i % 3],
+                "task_type": "email",
+                "payload": {"body": "y" * payload_bytes},
+            }
+            for i in range(count)
+        ]
+    return [
+        {
+            "description": 5,
+            "due_date": "next week",
+            "priority": "urgent",
+            "payload": {"body": "y" * payload_bytes},
+        }
+        for _ in range(count)
+    ]
+
+
+def validate_interpreted(body) -> dict:
+    """Checks a task by reading every field's spec on each call."""
+
+    if not isinstance(body, dict):
+        raise ValidationError([{"field": None, "message": "must be a JSON object"}])
+
+    task = {}
+    errors = []
+    for name, spec in TASK_SCHEMA.items():
+        value = body.get(name)
+        if value is None:
+            if spec.get("required"):
+                errors.append({"field": name, "message": "is required"})
+            elif "default" in spec:
+                default = spec["default"]
+                task[name] = default() if callable(default) else default
+            continue
+
+        message = None
+        if not isinstance(value, spec["type"]) or isinstance(value, bool):
+            message = "has the wrong type"
+        else:
+            if "aliases" in spec:
+                value = spec["aliases"].get(value, value)
+            if "enum" in spec and value not in spec["enum"]:
+                message = "is not allowed"
+            elif len(value) < spec.get("min_length", 0):
+                message = "is too short"
+            elif len(value) > spec.get("max_length", float("inf")):
+                message = "is too long"
+            elif spec.get("iso8601"):
+                try:
+                    datetime.fromisoformat(value)
+                except ValueError:
+                    message = "is not ISO-8601"
+            elif "max_bytes" in spec:
+                if len(json.dumps(value, separators=(",", ":"))) > spec["max_bytes"]:
+                    message = "is too large"
+
+        if message is None:
+            task[name] = value
+        else:
+            errors.append({"field": name, "message": message})
+
+    if errors:
+        raise ValidationError(errors)
+    return task
+
+
+def measure(validate, tasks: list) -> float:
+    """Returns the number of tasks validated per second."""
+
+    def run(batch):
+        for task in batch:
+            try:
+                validate(task)
+            except ValidationError:
+                pass
+
+    run(tasks[:100])  # warm up
+
+    start = time.perf_counter()
+    run(tasks)
+    elapsed = time.perf_counter() - start
+
+    return len(tasks) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    args = parser.parse_args()
+
+    scenarios = {
+        "schema walked per call": validate_interpreted,
+        "validate_task (compiled)": validate_task,
+    }
+
+    print(f"Task validation throughput ({args.payload_bytes} byte payloads)")
+    for valid in (True, False):
+        tasks = make_tasks(args.tasks, args.payload_bytes, valid)
+        print(f"  {'valid' if valid else 'invalid'} tasks")
+        for name, validate in scenarios.items():
+            print(f"    {name:<26} {measure(validate, tasks):12,.0f} tasks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Synthetic API Gateway and SQS events for the benchmarks.
+
+Events are generated from a seeded random generator so runs are
+comparable over time.
+"""
+
+import json
+import random
+
+API_TOKEN = "bench-token"
+
+PRIORITY_MIXES = {
+    "uniform": {"medium": 1.0},
+    "mixed": {"high": 0.2, "medium": 0.5, "low": 0.3},
+    "high-heavy": {"high": 0.8, "medium": 0.1, "low": 0.1},
+}
+
+
+def make_payload(payload_bytes: int, rng: random.Random) -> dict:
+    return {
+        "to": "user@example.com",
+        "body": "".join(rng.choices("abcdefghijklmnopqrstuvwxyz ", k=payload_bytes)),
+    }
+
+
+def make_task(
+    index: int, payload_bytes: int, priority: str, rng: random.Random
+) -> dict:
+    return {
+        "title": f"Task {index}",
+        "description": "Send welcome email",
+        "priority": priority,
+        "ordering_key": f"tenant-{index % 5}",
+        "payload": make_payload(payload_bytes, rng),
+    }
+
+
+def pick_priorities(count: int, mix: str, rng: random.Random) -> list:
+    weights = PRIORITY_MIXES[mix]
+    return rng.choices(list(weights), weights=list(weights.values()), k=count)
+
+
+def make_api_event(
+    payload_bytes: int = 256,
+    batch_size: int = None,
+    priority_mix: str = "uniform",
+    seed: int = 0,
+) -> dict:
+    """
+    Builds an API Gateway proxy event posting one task, or a batch of tasks.
+
+    Args:
+        payload_bytes (int): Size of each task's payload body.
+        batch_size (int | None): Number of tasks posted to /tasks/batch, or
+            None for a single task posted to /tasks.
+        priority_mix (str): Key of PRIORITY_MIXES.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict: The API Gateway event.
+    """
+
+    rng = random.Random(seed)
+    count = batch_size or 1
+    tasks = [
+        make_task(i, payload_bytes, priority, rng)
+        for i, priority in enumerate(pick_priorities(count, priority_mix, rng))
+    ]
+
+    return {
+        "resource": "/tasks/batch" if batch_size else "/tasks",
+        "httpMethod": "POST",
+        "headers": {"x-api-key": API_TOKEN},
+        "body": json.dumps(tasks if batch_size else tasks[0]),
+    }
+
+
+def make_sqs_event(
+    records: int = 10,
+    payload_bytes: int = 256,
+    priority_mix: str = "uniform",
+    groups: int = 5,
+    seed: int = 0,
+) -> dict:
+    """
+    Builds an SQS FIFO event as delivered to the task processor.
+
+    Args:
+        records (int): Number of records in the batch.
+        payload_bytes (int): Size of each task's payload body.
+        priority_mix (str): Key of PRIORITY_MIXES.
+        groups (int): Number of message groups the records are spread over.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict: The SQS event.
+    """
+
+    rng = random.Random(seed)
+    priorities = pick_priorities(records, priority_mix, rng)
+
+    return {
+        "Records": [
+            {
+                "messageId": f"msg-{i}",
+                "receiptHandle": f"receipt-{i}",
+                "body": json.dumps(
+                    {
+                        "task_id": f"task-{i}",
+                        "task_type": "email",
+                        "description": "Send welcome email",
+                        "priority": priority,
+                        "created_at": "2025-11-09T10:00:00",
+                        "payload": make_payload(payload_bytes, rng),
+                    }
+                ),
+                "attributes": {
+                    "MessageGroupId": f"tenant-{i % groups}",
+                    "SentTimestamp": "1762682400000",
+                },
+                "eventSource": "aws:sqs",
+            }
+            for i, priority in enumerate(priorities)
+        ]
+    }
@@ -0,0 +1,304 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Message body field carrying the envelope in place of the payload. It is
+# never taken from a request, so clients cannot forge envelopes
+ENVELOPE_FIELD = "payload_claim_check"
+ENCODING_INLINE = "zlib+base64"
+ENCODING_BLOB = "zlib"
+
+DEFAULT_COMPRESS_THRESHOLD_BYTES = 16 * 1024
+# Leaves room under the 256 KB SQS limit for the rest of the message
+DEFAULT_MAX_INLINE_BYTES = 200 * 1024
+DEFAULT_BLOB_DIR = "/tmp/claim-check"
+DEFAULT_CACHE_SIZE = 32
+
+# Blobs are keyed by the sha256 of their content
+_VALID_REF = re.compile(r"^[0-9a-f]{64}$")
+
+_BLOB_STORES = {}
+_BLOB_STORES_LOCK = threading.Lock()
+
+
+class ClaimCheckError(Exception):
+    """Raised when an offloaded payload cannot be fetched."""
+
+
+class LocalDirBlobStore:
+    """
+    Blob store keeping one file per blob in a local directory.
+
+    Stand-in for an object store such as S3; any object with put(key, data)
+    and get(key) can be registered in its place.
+    """
+
+    def __init__(self, path: str = DEFAULT_BLOB_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def put(self, key: str, data: bytes) -> None:
+        target = self._blob_path(key)
+        if os.path.exists(target):
+            # Keys are content hashes, so the blob is already there
+            return
+
+        # Written under a temporary name so readers never see partial blobs
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError as e:
+            raise ClaimCheckError(f"Blob {key} not found") from e
+
+    def _blob_path(self, key: str) -> str:
+        # Only content hashes, so a key can never point outside the directory
+        if not isinstance(key, str) or not _VALID_REF.match(key):
+            raise ClaimCheckError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.path, key)
+
+
+BLOB_STORE_FACTORIES = {
+    "local": lambda: LocalDirBlobStore(
+        os.environ.get("CLAIM_CHECK_DIR") or DEFAULT_BLOB_DIR
+    ),
+}
+
+
+class ClaimCheckStats:
+    """Thread-safe counters of payload sizes and timings."""
+
+    FIELDS = (
+        "sent",
+        "sent_raw_bytes",
+        "sent_bytes",
+        "compressed",
+        "offloaded",
+        "encode_ms",
+        "received",
+        "received_bytes",
+        "fetched",
+        "cache_hits",
+        "decode_ms",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add(self, **counters) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                self._counters[name] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        counters["encode_ms"] = round(counters["encode_ms"], 3)
+        counters["decode_ms"] = round(counters["decode_ms"], 3)
+        return counters
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = dict.fromkeys(self.FIELDS, 0)
+
+
+stats = ClaimCheckStats()
+
+# Fetched blobs, decompressed, keyed by their content hash
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def get_blob_store(name: str = None):
+    """
+    Returns the blob store named name, creating it on first use.
+
+    Args:
+        name (str | None): The backend name, CLAIM_CHECK_BACKEND by default.
+
+    Returns:
+        object | None: The blob store, or None when claim-check is disabled.
+    """
+
+    name = name or os.environ.get("CLAIM_CHECK_BACKEND")
+    if not name:
+        return None
+
+    store = _BLOB_STORES.get(name)
+    if store is None:
+        factory = BLOB_STORE_FACTORIES.get(name)
+        if factory is None:
+            raise ValueError(f"Unknown claim-check backend: {name}")
+
+        with _BLOB_STORES_LOCK:
+            store = _BLOB_STORES.get(name)
+            if store is None:
+                store = _BLOB_STORES[name] = factory()
+    return store
+
+
+def reset_claim_check() -> None:
+    """Drops the blob stores, cache and stats, e.g. after configuration changes."""
+
+    with _BLOB_STORES_LOCK:
+        _BLOB_STORES.clear()
+    with _CACHE_LOCK:
+        _CACHE.clear()
+    stats.reset()
+
+
+def encode_payload(payload):
+    """
+    Prepares a task payload for the SQS message body.
+
+    Payloads whose JSON is above CLAIM_CHECK_COMPRESS_THRESHOLD_BYTES are
+    compressed. When the compressed payload is still above
+    CLAIM_CHECK_MAX_INLINE_BYTES it is written to the blob store and only a
+    reference to it is enqueued. Without CLAIM_CHECK_BACKEND payloads are
+    always sent as they are.
+
+    The envelope is sent in the ENVELOPE_FIELD of the message body, in place
+    of the payload.
+
+    Args:
+        payload: The JSON-serializable task payload.
+
+    Returns:
+        dict | None: The claim-check envelope replacing the payload, or None
+            when the payload is sent as it is.
+    """
+
+    store = get_blob_store()
+    if store is None:
+        return None
+
+    start = time.perf_counter()
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+    threshold = int(
+        os.environ.get("CLAIM_CHECK_COMPRESS_THRESHOLD_BYTES")
+        or DEFAULT_COMPRESS_THRESHOLD_BYTES
+    )
+    if len(raw) <= threshold:
+        stats.add(
+            sent=1,
+            sent_raw_bytes=len(raw),
+            sent_bytes=len(raw),
+            encode_ms=(time.perf_counter() - start) * 1000,
+        )
+        return None
+
+    compressed = zlib.compress(raw)
+    max_inline = int(
+        os.environ.get("CLAIM_CHECK_MAX_INLINE_BYTES") or DEFAULT_MAX_INLINE_BYTES
+    )
+
+    # Base64 grows the data by a third, which is what SQS ends up carrying
+    if (len(compressed) + 2) // 3 * 4 <= max_inline:
+        data = base64.b64encode(compressed).decode("ascii")
+        envelope = {"encoding": ENCODING_INLINE, "data": data}
+        counters = {"compressed": 1, "sent_bytes": len(data)}
+    else:
+        key = hashlib.sha256(compressed).hexdigest()
+        store.put(key, compressed)
+        envelope = {"encoding": ENCODING_BLOB, "ref": key, "size": len(compressed)}
+        counters = {"offloaded": 1, "sent_bytes": len(json.dumps(envelope))}
+
+    stats.add(
+        sent=1,
+        sent_raw_bytes=len(raw),
+        encode_ms=(time.perf_counter() - start) * 1000,
+        **counters,
+    )
+    return envelope
+
+
+def decode_payload(envelope):
+    """
+    Restores a payload from an envelope built by encode_payload.
+
+    Offloaded payloads are fetched from the blob store configured by
+    CLAIM_CHECK_BACKEND; recently fetched ones are served from an in-process
+    cache of CLAIM_CHECK_CACHE_SIZE blobs.
+
+    Args:
+        envelope (dict): The ENVELOPE_FIELD of a message body.
+
+    Returns:
+        The original payload.
+
+    Raises:
+        ClaimCheckError: When the envelope is invalid or its blob is missing.
+    """
+
+    if not isinstance(envelope, dict):
+        raise ClaimCheckError("Claim-check envelope must be an object")
+
+    start = time.perf_counter()
+    encoding = envelope.get("encoding")
+
+    try:
+        if encoding == ENCODING_INLINE:
+            compressed = base64.b64decode(envelope["data"])
+            raw = zlib.decompress(compressed)
+            counters = {"received_bytes": len(envelope["data"])}
+
+        elif encoding == ENCODING_BLOB:
+            key = envelope.get("ref")
+            if not isinstance(key, str) or not _VALID_REF.match(key):
+                raise ClaimCheckError(f"Invalid claim-check ref: {key!r}")
+
+            with _CACHE_LOCK:
+                raw = _CACHE.get(key)
+                if raw is not None:
+                    _CACHE.move_to_end(key)
+
+            if raw is not None:
+                counters = {"cache_hits": 1}
+            else:
+                store = get_blob_store()
+                if store is None:
+                    raise ClaimCheckError("No claim-check backend configured")
+
+                compressed = store.get(key)
+                raw = zlib.decompress(compressed)
+                _cache_blob(key, raw)
+                counters = {"fetched": 1, "received_bytes": len(compressed)}
+
+        else:
+            raise ClaimCheckError(f"Unknown claim-check encoding: {encoding}")
+
+        result = json.loads(raw)
+    except (KeyError, TypeError, ValueError, zlib.error) as e:
+        raise ClaimCheckError(f"Invalid claim-check envelope: {e}") from e
+
+    stats.add(
+        received=1,
+        decode_ms=(time.perf_counter() - start) * 1000,
+        **counters,
+    )
+    return result
+
+
+def _cache_blob(key: str, raw: bytes) -> None:
+    cache_size = int(os.environ.get("CLAIM_CHECK_CACHE_SIZE") or DEFAULT_CACHE_SIZE)
+    if cache_size <= 0:
+        return
+
+    with _CACHE_LOCK:
+        _CACHE[key] = raw
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > cache_size:
+            _CACHE.popitem(last=False)
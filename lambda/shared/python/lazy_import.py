@@ -0,0 +1,65 @@
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    Attribute reads, writes and deletes are forwarded to the real module, so
+    unittest.mock.patch("sqs_clients.boto3.client") keeps working.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    # An import statement, unlike importlib.import_module,
+                    # shows up in -X importtime reports
+                    __import__(self.__name__)
+                    module = sys.modules[self.__name__]
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "lazy"
+        return f"<LazyModule {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str):
+    """
+    Returns a module that is imported the first time one of its attributes
+    is used, keeping heavy imports out of the Lambda cold start.
+
+    Args:
+        name (str): The module name, e.g. "boto3".
+
+    Returns:
+        module: The module itself when it is already imported, otherwise a
+            LazyModule standing in for it.
+    """
+
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
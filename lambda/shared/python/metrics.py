@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+
+from structured_logger import write_line
+
+DEFAULT_NAMESPACE = "TaskSystem"
+# Dimensions of per-task metrics, in this order
+DIMENSIONS = ("priority", "task_type")
+# An EMF metric holds at most 100 values
+MAX_VALUES_PER_METRIC = 100
+
+COUNT = "Count"
+MILLISECONDS = "Milliseconds"
+
+_METRICS = {}
+_METRICS_LOCK = threading.Lock()
+
+
+class Metrics:
+    """
+    Aggregates counters and latency histograms in memory and flushes them
+    as CloudWatch Embedded Metric Format (EMF) lines.
+
+    Recording a value is a dict update under a lock, so it costs about a
+    microsecond. Metrics are keyed by dimension values: () for metrics of
+    the whole service, or one value per name in dimension_names, e.g.
+    ("high", "email"). Latencies are rounded into buckets (0.1 ms under
+    100 ms, 1 ms above) and kept as counts per bucket.
+
+    A document carries a single value per dimension, so flush() writes one
+    EMF document per set of dimension values, all in a single write.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        namespace: str = None,
+        dimension_names: tuple = DIMENSIONS,
+        sink=write_line,
+        enabled: bool = True,
+        clock=time.time,
+    ):
+        self.service = service
+        self.namespace = namespace or DEFAULT_NAMESPACE
+        self.dimension_names = tuple(dimension_names)
+        self.enabled = enabled
+        self._sink = sink
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def count(self, name: str, value: float = 1, dimensions: tuple = ()) -> None:
+        """
+        Adds value to a counter.
+
+        Args:
+            name (str): The metric name.
+            value (float): The amount to add.
+            dimensions (tuple): () or one value per dimension name.
+        """
+
+        if not self.enabled:
+            return
+        key = (dimensions, name)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def timing(self, name: str, ms: float, dimensions: tuple = ()) -> None:
+        """
+        Records a latency in milliseconds into a histogram.
+
+        Args:
+            name (str): The metric name.
+            ms (float): The latency.
+            dimensions (tuple): () or one value per dimension name.
+        """
+
+        if not self.enabled:
+            return
+        bucket = round(ms, 1) if ms < 100 else round(ms)
+        key = (dimensions, name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {}
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def documents(self) -> list:
+        """
+        Builds the EMF documents of everything recorded so far.
+
+        Returns:
+            list: EMF documents (dicts), one or more per set of dimension
+                values.
+        """
+
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: dict(value) for key, value in self._histograms.items()}
+
+        return self._build_documents(counters, histograms)
+
+    def flush(self) -> int:
+        """
+        Writes the recorded metrics and starts aggregating afresh.
+
+        Returns:
+            int: The number of EMF lines written.
+        """
+
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+
+        documents = self._build_documents(counters, histograms)
+        if documents:
+            self._sink(
+                "\n".join(json.dumps(doc, separators=(",", ":")) for doc in documents)
+            )
+        return len(documents)
+
+    def _build_documents(self, counters: dict, histograms: dict) -> list:
+        groups = {}
+        for (dimensions, name), value in counters.items():
+            groups.setdefault(dimensions, ({}, {}))[0][name] = value
+        for (dimensions, name), histogram in histograms.items():
+            values = []
+            for bucket, bucket_count in sorted(histogram.items()):
+                values.extend([bucket] * bucket_count)
+            groups.setdefault(dimensions, ({}, {}))[1][name] = values
+
+        timestamp = int(self._clock() * 1000)
+        documents = []
+        for dimensions, (group_counters, group_histograms) in groups.items():
+            documents.extend(
+                self._documents_for(
+                    dimensions, group_counters, group_histograms, timestamp
+                )
+            )
+        return documents
+
+    def _documents_for(self, dimensions, counters, histograms, timestamp):
+        names = ["service", *self.dimension_names[: len(dimensions)]]
+        base = {"service": self.service, **dict(zip(names[1:], dimensions))}
+
+        # Histograms above 100 values are spread over further documents
+        chunk_index = 0
+        while True:
+            document = dict(base)
+            definitions = []
+
+            if chunk_index == 0:
+                for name, value in counters.items():
+                    document[name] = value
+                    definitions.append({"Name": name, "Unit": COUNT})
+
+            start = chunk_index * MAX_VALUES_PER_METRIC
+            for name, values in histograms.items():
+                chunk = values[start : start + MAX_VALUES_PER_METRIC]
+                if chunk:
+                    document[name] = chunk
+                    definitions.append({"Name": name, "Unit": MILLISECONDS})
+
+            if not definitions:
+                return
+
+            document["_aws"] = {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [names],
+                        "Metrics": definitions,
+                    }
+                ],
+            }
+            yield document
+            chunk_index += 1
+
+
+def get_metrics(service: str) -> Metrics:
+    """
+    Returns the shared metrics of a service, creating them on first use.
+
+    METRICS_NAMESPACE sets the CloudWatch namespace (default "TaskSystem").
+    METRICS_ENABLED=false turns recording and flushing into no-ops.
+
+    Args:
+        service (str): Service name, written as the "service" dimension.
+
+    Returns:
+        Metrics: The service's metrics.
+    """
+
+    metrics = _METRICS.get(service)
+    if metrics is None:
+        with _METRICS_LOCK:
+            metrics = _METRICS.get(service)
+            if metrics is None:
+                metrics = _METRICS[service] = Metrics(
+                    service,
+                    namespace=os.environ.get("METRICS_NAMESPACE"),
+                    enabled=(os.environ.get("METRICS_ENABLED") or "true").lower()
+                    not in ("0", "false", "no"),
+                )
+    return metrics
+
+
+def reset_metrics() -> None:
+    """Drops every service's metrics, unflushed values included."""
+
+    with _METRICS_LOCK:
+        _METRICS.clear()
@@ -0,0 +1,108 @@
+import os
+import threading
+
+from lazy_import import lazy_import
+from structured_logger import get_logger
+
+logger = get_logger("sqs_clients")
+
+# boto3 dominates the cold start, so it is only imported once a client is built
+boto3 = lazy_import("boto3")
+sqs_emulator = lazy_import("sqs_emulator")
+
+# SQS clients are cached per (endpoint, region, settings) so warm invocations
+# reuse the underlying connection pool and TLS sessions instead of rebuilding
+# them.
+_SQS_CLIENTS: dict = {}
+_SQS_CLIENTS_LOCK = threading.Lock()
+
+
+def resolve_sqs_config() -> dict:
+    """
+    Reads the endpoint, region and credentials of the current environment.
+
+    ENVIRONMENT=local talks to LocalStack. Staging and production take the
+    endpoint, region and credentials from the AWS_* variables.
+
+    Returns:
+        dict: boto3.client keyword arguments.
+    """
+
+    config = {}
+
+    if os.environ.get("ENVIRONMENT") == "local":
+        # Use LocalStack container hostname (from inside Docker network)
+        localstack_endpoint = os.environ.get(
+            "LOCALSTACK_ENDPOINT", "http://localstack:4566"
+        )
+        config["endpoint_url"] = localstack_endpoint
+        if os.environ.get("AWS_REGION"):
+            config["region_name"] = os.environ["AWS_REGION"]
+
+    if (
+        os.environ.get("ENVIRONMENT") == "staging"
+        or os.environ.get("ENVIRONMENT") == "production"
+    ):
+        config["endpoint_url"] = os.environ.get("AWS_SQS_ENDPOINT_URL")
+        config["region_name"] = os.environ.get("AWS_REGION")
+        config["aws_access_key_id"] = os.environ.get("AWS_ACCESS_KEY_ID")
+        config["aws_secret_access_key"] = os.environ.get("AWS_SECRET_ACCESS_KEY")
+
+    return config
+
+
+def get_sqs_client(settings: dict = None):
+    """
+    Returns a pooled SQS client for the current environment configuration.
+
+    Clients are created lazily and kept across warm invocations. A client is
+    rebuilt when its resolved configuration changes, e.g. after credentials
+    rotate or pool settings are tuned. With SQS_BACKEND=memory the
+    in-process SQS emulator is returned instead, for offline runs.
+
+    Args:
+        settings (dict | None): botocore Config keyword arguments, e.g. the
+            API handler's retry mode and timeouts.
+
+    Returns:
+        botocore.client.SQS: The SQS client.
+    """
+
+    if os.environ.get("SQS_BACKEND") == "memory":
+        return sqs_emulator.get_emulator()
+
+    config = resolve_sqs_config()
+    settings = settings or {}
+
+    slot = (
+        config.get("endpoint_url"),
+        config.get("region_name"),
+        repr(sorted(settings.items())),
+    )
+    fingerprint = tuple(sorted(config.items()))
+
+    cached = _SQS_CLIENTS.get(slot)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    with _SQS_CLIENTS_LOCK:
+        cached = _SQS_CLIENTS.get(slot)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        if config.get("endpoint_url"):
+            logger.debug("Creating SQS client for endpoint: %s", config["endpoint_url"])
+
+        from botocore.config import Config
+
+        client = boto3.client("sqs", config=Config(**settings), **config)
+        _SQS_CLIENTS[slot] = (fingerprint, client)
+
+    return client
+
+
+def reset_sqs_clients() -> None:
+    """Drops every cached SQS client, forcing the next call to rebuild."""
+
+    with _SQS_CLIENTS_LOCK:
+        _SQS_CLIENTS.clear()
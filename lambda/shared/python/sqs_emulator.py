@@ -0,0 +1,498 @@
+import hashlib
+import heapq
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# Matches lib/stacks/messaging-stack.ts and the SQS defaults it relies on
+DEFAULT_VISIBILITY_TIMEOUT = 30
+DEFAULT_MAX_RECEIVE_COUNT = 3
+DEFAULT_RETENTION_SECONDS = 4 * 24 * 3600
+DEFAULT_DLQ_RETENTION_SECONDS = 14 * 24 * 3600
+DEDUPLICATION_WINDOW_SECONDS = 300
+MAX_BATCH_ENTRIES = 10
+
+_EMULATOR = None
+_EMULATOR_LOCK = threading.Lock()
+
+
+class EmulatorError(Exception):
+    """Raised for requests SQS would reject, with the SQS error code."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+
+class _Message:
+    __slots__ = (
+        "message_id",
+        "body",
+        "group_id",
+        "deduplication_id",
+        "sequence_number",
+        "message_attributes",
+        "sent_timestamp",
+        "sent_at",
+        "visible_at",
+        "receive_count",
+        "first_receive_timestamp",
+        "receipt_handle",
+    )
+
+
+class _Queue:
+    def __init__(self, url: str, dlq_url: str = None, retention_seconds: int = None):
+        self.url = url
+        self.fifo = url.endswith(".fifo")
+        self.dlq_url = dlq_url
+        self.retention_seconds = retention_seconds
+        # FIFO: group id -> messages in order, in flight ones included
+        self.groups = OrderedDict()
+        # Groups whose first message may be visible, in the order they became
+        # so; receives only look at these instead of every group
+        self.ready = OrderedDict()
+        # (visible_at, group id) of groups locked by an in-flight message.
+        # Entries may be stale and are checked when they come due
+        self.locked = []
+        self.in_flight = {}
+        self.deduplication = {}
+        self.deduplication_expiry = deque()
+        self.sequence = 0
+
+
+def dlq_url_for(queue_url: str) -> str:
+    """Returns the URL of the dead-letter queue paired with queue_url."""
+
+    if queue_url.endswith(".fifo"):
+        return queue_url[: -len(".fifo")] + "-dlq.fifo"
+    return queue_url + "-dlq"
+
+
+class InMemorySQS:
+    """
+    In-process stand-in for the SQS client, for offline and load tests.
+
+    Implements the subset of the boto3 SQS client used by the handlers with
+    the semantics of the queues in messaging-stack.ts: FIFO ordering per
+    message group (a group is locked while one of its messages is in
+    flight), content-based or explicit deduplication within a five minute
+    window, visibility timeouts, and redrive to a "-dlq" queue once a
+    message was received max_receive_count times. Messages older than the
+    queue's retention period, retention_seconds or dlq_retention_seconds,
+    are dropped. Queues are created on first use.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT,
+        max_receive_count: int = DEFAULT_MAX_RECEIVE_COUNT,
+        retention_seconds: int = DEFAULT_RETENTION_SECONDS,
+        dlq_retention_seconds: int = DEFAULT_DLQ_RETENTION_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_receive_count = max_receive_count
+        self.retention_seconds = retention_seconds
+        self.dlq_retention_seconds = dlq_retention_seconds
+        self._clock = clock
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def send_message(
+        self,
+        QueueUrl: str,
+        MessageBody: str,
+        MessageGroupId: str = None,
+        MessageDeduplicationId: str = None,
+        MessageAttributes: dict = None,
+        **kwargs,
+    ) -> dict:
+        with self._lock:
+            return self._send(
+                self._queue(QueueUrl),
+                MessageBody,
+                MessageGroupId,
+                MessageDeduplicationId,
+                MessageAttributes,
+            )
+
+    def send_message_batch(self, QueueUrl: str, Entries: list) -> dict:
+        self._check_batch(Entries)
+        successful = []
+        failed = []
+
+        with self._lock:
+            queue = self._queue(QueueUrl)
+            for entry in Entries:
+                try:
+                    result = self._send(
+                        queue,
+                        entry["MessageBody"],
+                        entry.get("MessageGroupId"),
+                        entry.get("MessageDeduplicationId"),
+                        entry.get("MessageAttributes"),
+                    )
+                except EmulatorError as e:
+                    failed.append(
+                        {
+                            "Id": entry["Id"],
+                            "SenderFault": True,
+                            "Code": e.code,
+                            "Message": str(e),
+                        }
+                    )
+                else:
+                    successful.append({"Id": entry["Id"], **result})
+
+        response = {"Successful": successful}
+        if failed:
+            response["Failed"] = failed
+        return response
+
+    def receive_message(
+        self,
+        QueueUrl: str,
+        MaxNumberOfMessages: int = 1,
+        VisibilityTimeout: int = None,
+        WaitTimeSeconds: int = 0,
+        **kwargs,
+    ) -> dict:
+        if not 1 <= MaxNumberOfMessages <= MAX_BATCH_ENTRIES:
+            raise EmulatorError(
+                "InvalidParameterValue", "MaxNumberOfMessages must be 1 to 10"
+            )
+        if VisibilityTimeout is None:
+            VisibilityTimeout = self.visibility_timeout
+
+        # WaitTimeSeconds is accepted but never waits; the queue is local
+        with self._lock:
+            messages = self._receive(
+                self._queue(QueueUrl), MaxNumberOfMessages, VisibilityTimeout
+            )
+
+        response = {}
+        if messages:
+            response["Messages"] = messages
+        return response
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str) -> dict:
+        with self._lock:
+            self._delete(self._queue(QueueUrl), ReceiptHandle)
+        return {}
+
+    def delete_message_batch(self, QueueUrl: str, Entries: list) -> dict:
+        self._check_batch(Entries)
+        return self._for_each_handle(
+            QueueUrl,
+            Entries,
+            lambda queue, entry: self._delete(queue, entry["ReceiptHandle"]),
+        )
+
+    def change_message_visibility(
+        self, QueueUrl: str, ReceiptHandle: str, VisibilityTimeout: int
+    ) -> dict:
+        with self._lock:
+            self._change_visibility(
+                self._queue(QueueUrl), ReceiptHandle, VisibilityTimeout
+            )
+        return {}
+
+    def change_message_visibility_batch(self, QueueUrl: str, Entries: list) -> dict:
+        self._check_batch(Entries)
+        return self._for_each_handle(
+            QueueUrl,
+            Entries,
+            lambda queue, entry: self._change_visibility(
+                queue, entry["ReceiptHandle"], entry["VisibilityTimeout"]
+            ),
+        )
+
+    def get_queue_attributes(self, QueueUrl: str, AttributeNames=None) -> dict:
+        with self._lock:
+            queue = self._queue(QueueUrl)
+            total = sum(len(messages) for messages in queue.groups.values())
+            in_flight = len(queue.in_flight)
+
+        return {
+            "Attributes": {
+                "ApproximateNumberOfMessages": str(total - in_flight),
+                "ApproximateNumberOfMessagesNotVisible": str(in_flight),
+            }
+        }
+
+    def _queue(self, url: str) -> _Queue:
+        queue = self._queues.get(url)
+        if queue is None:
+            is_dlq = url.endswith("-dlq.fifo") or url.endswith("-dlq")
+            if is_dlq:
+                queue = _Queue(url, None, self.dlq_retention_seconds)
+            else:
+                queue = _Queue(url, dlq_url_for(url), self.retention_seconds)
+            self._queues[url] = queue
+        return queue
+
+    def _check_batch(self, entries: list) -> None:
+        if not entries:
+            raise EmulatorError("EmptyBatchRequest", "The batch request is empty")
+        if len(entries) > MAX_BATCH_ENTRIES:
+            raise EmulatorError(
+                "TooManyEntriesInBatchRequest", "A batch holds at most 10 entries"
+            )
+
+    def _for_each_handle(self, url: str, entries: list, action) -> dict:
+        successful = []
+        failed = []
+
+        with self._lock:
+            queue = self._queue(url)
+            for entry in entries:
+                try:
+                    action(queue, entry)
+                except EmulatorError as e:
+                    failed.append(
+                        {
+                            "Id": entry["Id"],
+                            "SenderFault": True,
+                            "Code": e.code,
+                            "Message": str(e),
+                        }
+                    )
+                else:
+                    successful.append({"Id": entry["Id"]})
+
+        response = {"Successful": successful}
+        if failed:
+            response["Failed"] = failed
+        return response
+
+    def _send(self, queue, body, group_id, deduplication_id, attributes) -> dict:
+        if queue.fifo and not group_id:
+            raise EmulatorError(
+                "MissingParameter", "MessageGroupId is required for FIFO queues"
+            )
+
+        now = self._clock()
+        self._expire_deduplication(queue, now)
+
+        if queue.fifo:
+            if deduplication_id is None:
+                # Content-based deduplication, as configured on both queues
+                deduplication_id = hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+            duplicate = queue.deduplication.get(deduplication_id)
+            if duplicate is not None:
+                return duplicate
+
+        message = _Message()
+        message.message_id = str(uuid.uuid4())
+        message.body = body
+        message.group_id = group_id if queue.fifo else message.message_id
+        message.deduplication_id = deduplication_id
+        message.message_attributes = attributes
+        message.sent_timestamp = int(time.time() * 1000)
+        message.sent_at = now
+        message.visible_at = now
+        message.receive_count = 0
+        message.first_receive_timestamp = None
+        message.receipt_handle = None
+
+        queue.sequence += 1
+        message.sequence_number = f"{queue.sequence:020d}"
+        self._append(queue, message)
+
+        result = {
+            "MessageId": message.message_id,
+            "MD5OfMessageBody": hashlib.md5(body.encode("utf-8")).hexdigest(),
+        }
+        if queue.fifo:
+            result["SequenceNumber"] = message.sequence_number
+            queue.deduplication[deduplication_id] = result
+            queue.deduplication_expiry.append(
+                (now + DEDUPLICATION_WINDOW_SECONDS, deduplication_id)
+            )
+        return result
+
+    def _expire_deduplication(self, queue, now: float) -> None:
+        expiry = queue.deduplication_expiry
+        while expiry and expiry[0][0] <= now:
+            _, deduplication_id = expiry.popleft()
+            queue.deduplication.pop(deduplication_id, None)
+
+    def _append(self, queue, message) -> None:
+        messages = queue.groups.get(message.group_id)
+        if messages is None:
+            messages = queue.groups[message.group_id] = deque()
+            queue.ready[message.group_id] = None
+        messages.append(message)
+
+    def _unlock_due_groups(self, queue, now: float) -> None:
+        locked = queue.locked
+        while locked and locked[0][0] <= now:
+            _, group_id = heapq.heappop(locked)
+            messages = queue.groups.get(group_id)
+            if not messages:
+                continue
+            if messages[0].visible_at > now:
+                # Its visibility was extended since
+                heapq.heappush(locked, (messages[0].visible_at, group_id))
+            else:
+                queue.ready[group_id] = None
+
+    def _receive(self, queue, max_messages: int, visibility_timeout: int) -> list:
+        now = self._clock()
+        received = []
+        self._unlock_due_groups(queue, now)
+
+        while queue.ready and len(received) < max_messages:
+            group_id, _ = queue.ready.popitem(last=False)
+            messages = queue.groups.get(group_id)
+            if not messages:
+                continue
+            # Delivered messages stay in their group, in order, until deleted
+            index = 0
+
+            while index < len(messages) and len(received) < max_messages:
+                message = messages[index]
+                if message.visible_at > now:
+                    # An in-flight message locks the rest of its group
+                    break
+
+                queue.in_flight.pop(message.receipt_handle, None)
+
+                if now - message.sent_at > queue.retention_seconds:
+                    del messages[index]
+                    continue
+
+                if (
+                    queue.dlq_url is not None
+                    and message.receive_count >= self.max_receive_count
+                ):
+                    del messages[index]
+                    self._redrive(queue, message)
+                    continue
+
+                received.append(self._deliver(queue, message, now, visibility_timeout))
+                index += 1
+
+            if not messages:
+                del queue.groups[group_id]
+            elif messages[0].visible_at > now:
+                heapq.heappush(queue.locked, (messages[0].visible_at, group_id))
+            else:
+                queue.ready[group_id] = None
+
+        return received
+
+    def _deliver(self, queue, message, now: float, visibility_timeout: int) -> dict:
+        message.receive_count += 1
+        message.visible_at = now + visibility_timeout
+        message.receipt_handle = uuid.uuid4().hex
+        if message.first_receive_timestamp is None:
+            message.first_receive_timestamp = int(time.time() * 1000)
+        queue.in_flight[message.receipt_handle] = message
+
+        attributes = {
+            "SentTimestamp": str(message.sent_timestamp),
+            "ApproximateReceiveCount": str(message.receive_count),
+            "ApproximateFirstReceiveTimestamp": str(message.first_receive_timestamp),
+        }
+        if queue.fifo:
+            attributes["MessageGroupId"] = message.group_id
+            attributes["MessageDeduplicationId"] = message.deduplication_id
+            attributes["SequenceNumber"] = message.sequence_number
+
+        delivered = {
+            "MessageId": message.message_id,
+            "ReceiptHandle": message.receipt_handle,
+            "MD5OfBody": hashlib.md5(message.body.encode("utf-8")).hexdigest(),
+            "Body": message.body,
+            "Attributes": attributes,
+        }
+        if message.message_attributes:
+            delivered["MessageAttributes"] = message.message_attributes
+        return delivered
+
+    def _redrive(self, queue, message) -> None:
+        dlq = self._queue(queue.dlq_url)
+
+        dlq.sequence += 1
+        message.sequence_number = f"{dlq.sequence:020d}"
+        message.visible_at = message.sent_at
+        message.receipt_handle = None
+        self._append(dlq, message)
+
+    def _delete(self, queue, receipt_handle: str) -> None:
+        message = queue.in_flight.pop(receipt_handle, None)
+        if message is None:
+            raise EmulatorError(
+                "ReceiptHandleIsInvalid", f"Unknown receipt handle {receipt_handle}"
+            )
+
+        messages = queue.groups.get(message.group_id)
+        if messages is not None:
+            messages.remove(message)
+            if not messages:
+                del queue.groups[message.group_id]
+                queue.ready.pop(message.group_id, None)
+            elif messages[0].visible_at <= self._clock():
+                queue.ready[message.group_id] = None
+
+    def _change_visibility(self, queue, receipt_handle: str, timeout: int) -> None:
+        message = queue.in_flight.get(receipt_handle)
+        if message is None:
+            raise EmulatorError(
+                "ReceiptHandleIsInvalid", f"Unknown receipt handle {receipt_handle}"
+            )
+        message.visible_at = self._clock() + timeout
+        # A shortened timeout unlocks the group sooner than its current entry
+        heapq.heappush(queue.locked, (message.visible_at, message.group_id))
+
+
+def get_emulator() -> InMemorySQS:
+    """
+    Returns the process-wide emulator, creating it on first use.
+
+    SQS_EMULATOR_VISIBILITY_TIMEOUT, SQS_EMULATOR_MAX_RECEIVE_COUNT,
+    SQS_EMULATOR_RETENTION_SECONDS and SQS_EMULATOR_DLQ_RETENTION_SECONDS
+    override the defaults of messaging-stack.ts.
+
+    Returns:
+        InMemorySQS: The emulator shared by every caller in the process.
+    """
+
+    global _EMULATOR
+
+    if _EMULATOR is None:
+        with _EMULATOR_LOCK:
+            if _EMULATOR is None:
+                _EMULATOR = InMemorySQS(
+                    visibility_timeout=int(
+                        os.environ.get("SQS_EMULATOR_VISIBILITY_TIMEOUT")
+                        or DEFAULT_VISIBILITY_TIMEOUT
+                    ),
+                    max_receive_count=int(
+                        os.environ.get("SQS_EMULATOR_MAX_RECEIVE_COUNT")
+                        or DEFAULT_MAX_RECEIVE_COUNT
+                    ),
+                    retention_seconds=int(
+                        os.environ.get("SQS_EMULATOR_RETENTION_SECONDS")
+                        or DEFAULT_RETENTION_SECONDS
+                    ),
+                    dlq_retention_seconds=int(
+                        os.environ.get("SQS_EMULATOR_DLQ_RETENTION_SECONDS")
+                        or DEFAULT_DLQ_RETENTION_SECONDS
+                    ),
+                )
+    return _EMULATOR
+
+
+def reset_emulator() -> None:
+    """Drops the process-wide emulator and every message it holds."""
+
+    global _EMULATOR
+
+    with _EMULATOR_LOCK:
+        _EMULATOR = None
@@ -0,0 +1,210 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+DEFAULT_LEVEL = "INFO"
+DEFAULT_SAMPLE_RATE = 1.0
+DEFAULT_BUFFER_MAX_LINES = 100
+BUFFER_MAX_LINES = int(
+    os.environ.get("LOG_BUFFER_MAX_LINES") or DEFAULT_BUFFER_MAX_LINES
+)
+
+_LOGGERS = {}
+_LOGGERS_LOCK = threading.Lock()
+
+# Lines are buffered while an invocation is running and written in one go
+_BUFFER = []
+_BUFFER_LOCK = threading.Lock()
+_BUFFER_DEPTH = 0
+
+
+class LazyJson:
+    """Serializes an object to JSON only when the log line is formatted."""
+
+    __slots__ = ("value", "indent")
+
+    def __init__(self, value, indent=None):
+        self.value = value
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.value, indent=self.indent, default=str)
+
+
+class StructuredLogger:
+    """
+    Leveled logger that writes one JSON object per line.
+
+    Messages use %-style arguments that are only formatted when the level is
+    enabled, so disabled debug lines cost a single comparison. Per-record
+    lines can be sampled with LOG_SAMPLE_RATE; warnings and errors never are.
+    """
+
+    def __init__(self, name: str, level=None, sample_rate=None):
+        self.name = name
+        self.level = INFO
+        self.sample_rate = DEFAULT_SAMPLE_RATE
+        # The constant part of every line is encoded once per level, as an
+        # object missing its closing brace
+        self._prefixes = {
+            value: json.dumps({"level": level_name, "logger": name})[:-1]
+            for value, level_name in LEVEL_NAMES.items()
+        }
+        self.configure(level, sample_rate)
+
+    def configure(self, level=None, sample_rate=None) -> None:
+        """
+        Sets the level and sample rate, defaulting to LOG_LEVEL and
+        LOG_SAMPLE_RATE from the environment.
+
+        Args:
+            level (str | int | None): Minimum level that is written.
+            sample_rate (float | None): Fraction of sampled lines written.
+        """
+
+        if level is None:
+            level = os.environ.get("LOG_LEVEL") or DEFAULT_LEVEL
+        if isinstance(level, str):
+            level = LEVELS.get(level.upper(), INFO)
+        self.level = level
+
+        if sample_rate is None:
+            sample_rate = float(
+                os.environ.get("LOG_SAMPLE_RATE") or DEFAULT_SAMPLE_RATE
+            )
+        self.sample_rate = sample_rate
+
+    def is_enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def debug(self, message: str, *args, **fields) -> None:
+        if DEBUG >= self.level:
+            self._emit(DEBUG, message, args, fields)
+
+    def info(self, message: str, *args, **fields) -> None:
+        if INFO >= self.level:
+            self._emit(INFO, message, args, fields)
+
+    def warning(self, message: str, *args, **fields) -> None:
+        if WARNING >= self.level:
+            self._emit(WARNING, message, args, fields)
+
+    def error(self, message: str, *args, **fields) -> None:
+        if ERROR >= self.level:
+            self._emit(ERROR, message, args, fields)
+
+    def sampled(self, level: int, message: str, *args, **fields) -> None:
+        """
+        Logs a noisy per-record line, keeping only a sample of them.
+
+        Args:
+            level (int): Level of the line. WARNING and above are never dropped.
+            message (str): %-style message.
+        """
+
+        if level < self.level:
+            return
+        if level < WARNING and self.sample_rate < 1.0:
+            if random.random() >= self.sample_rate:
+                return
+        self._emit(level, message, args, fields)
+
+    def _emit(self, level: int, message: str, args: tuple, fields: dict) -> None:
+        if args:
+            message = message % args
+
+        record = {"time": round(time.time(), 3), "message": message, **fields}
+        _write(self._prefixes[level] + ", " + json.dumps(record, default=str)[1:])
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """
+    Returns the shared logger for name, creating it on first use.
+
+    Args:
+        name (str): Logger name, written to every line.
+
+    Returns:
+        StructuredLogger: The logger.
+    """
+
+    logger = _LOGGERS.get(name)
+    if logger is None:
+        with _LOGGERS_LOCK:
+            logger = _LOGGERS.get(name)
+            if logger is None:
+                logger = _LOGGERS[name] = StructuredLogger(name)
+    return logger
+
+
+@contextmanager
+def buffered():
+    """
+    Buffers log lines until the block exits, then writes them at once.
+
+    Meant to wrap a whole invocation so CloudWatch receives one write instead
+    of one per line. The buffer is also flushed when it grows beyond
+    LOG_BUFFER_MAX_LINES.
+    """
+
+    global _BUFFER_DEPTH
+
+    with _BUFFER_LOCK:
+        _BUFFER_DEPTH += 1
+    try:
+        yield
+    finally:
+        with _BUFFER_LOCK:
+            _BUFFER_DEPTH -= 1
+        if _BUFFER_DEPTH == 0:
+            flush()
+
+
+def write_line(line: str) -> None:
+    """
+    Writes a preformatted line, e.g. an EMF metrics document, buffered like
+    the log lines around it.
+
+    Args:
+        line (str): The line, without its newline.
+    """
+
+    _write(line)
+
+
+def flush() -> None:
+    """Writes every buffered line to stdout."""
+
+    with _BUFFER_LOCK:
+        if not _BUFFER:
+            return
+        lines = "\n".join(_BUFFER)
+        _BUFFER.clear()
+
+    # Resolved on every write so redirected stdout is honoured
+    sys.stdout.write(lines + "\n")
+    sys.stdout.flush()
+
+
+def _write(line: str) -> None:
+    if _BUFFER_DEPTH:
+        with _BUFFER_LOCK:
+            _BUFFER.append(line)
+            full = len(_BUFFER) >= BUFFER_MAX_LINES
+        if full:
+            flush()
+        return
+
+    sys.stdout.write(line + "\n")
@@ -0,0 +1,549 @@
+import heapq
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable
+
+from lazy_import import lazy_import
+from structured_logger import get_logger
+from task_model import DEFAULT_PRIORITY, PRIORITY_ALIASES
+
+logger = get_logger("task_processor")
+
+# Only batches with async handlers need the event loop
+asyncio = lazy_import("asyncio")
+
+DEFAULT_MAX_WORKERS = 1
+# Stop starting (and cancel running) tasks this long before the Lambda times out
+DEFAULT_DEADLINE_MARGIN_MS = 1000
+
+EXECUTION_MODE_ASYNC = "async"
+
+SCHEDULING_STRICT = "strict"
+SCHEDULING_WEIGHTED = "weighted"
+SCHEDULING_FIFO = "fifo"
+DEFAULT_SCHEDULING = SCHEDULING_STRICT
+
+# Lower rank starts first
+PRIORITY_RANKS = {"high": 0, "medium": 1, "low": 2}
+DEFAULT_PRIORITY_WEIGHTS = {"high": 4, "medium": 2, "low": 1}
+
+
+def get_max_workers() -> int:
+    """
+    Reads the worker count for batch execution from the environment.
+
+    Returns:
+        int: PROCESSOR_MAX_WORKERS, at least 1. 1 means sequential execution.
+    """
+
+    return max(1, int(os.environ.get("PROCESSOR_MAX_WORKERS") or DEFAULT_MAX_WORKERS))
+
+
+def get_execution_mode() -> str:
+    """
+    Reads the execution mode from the environment.
+
+    Returns:
+        str: PROCESSOR_EXECUTION_MODE, "async" to drive records on an event
+            loop. Any other value runs records on threads.
+    """
+
+    return (os.environ.get("PROCESSOR_EXECUTION_MODE") or "").lower()
+
+
+def get_task_timeout():
+    """
+    Reads the per-task timeout from the environment.
+
+    Returns:
+        float | None: TASK_TIMEOUT_SECONDS, or None when not configured.
+    """
+
+    timeout = os.environ.get("TASK_TIMEOUT_SECONDS")
+    return float(timeout) if timeout else None
+
+
+def get_scheduling_policy() -> str:
+    """
+    Reads the cross-group scheduling policy from the environment.
+
+    Returns:
+        str: PROCESSOR_SCHEDULING, "strict" (default), "weighted" or "fifo".
+    """
+
+    policy = (os.environ.get("PROCESSOR_SCHEDULING") or DEFAULT_SCHEDULING).lower()
+    if policy not in (SCHEDULING_STRICT, SCHEDULING_WEIGHTED, SCHEDULING_FIFO):
+        raise ValueError(f"Unknown PROCESSOR_SCHEDULING: {policy}")
+    return policy
+
+
+def get_priority_weights() -> dict:
+    """
+    Reads the weighted-fair priority weights from the environment.
+
+    Returns:
+        dict: Weight per priority, from PROCESSOR_PRIORITY_WEIGHTS such as
+            "high:4,medium:2,low:1". "normal" is read as "medium".
+    """
+
+    raw = os.environ.get("PROCESSOR_PRIORITY_WEIGHTS")
+    if not raw:
+        return dict(DEFAULT_PRIORITY_WEIGHTS)
+
+    weights = {}
+    for entry in raw.split(","):
+        priority, _, weight = entry.partition(":")
+        priority = priority.strip().lower()
+        weights[PRIORITY_ALIASES.get(priority, priority)] = max(1, int(weight))
+    return weights
+
+
+def get_deadline(context):
+    """
+    Computes the monotonic time by which the batch must stop.
+
+    Args:
+        context (object): The Lambda context, may be None outside Lambda.
+
+    Returns:
+        float | None: A time.monotonic() deadline, or None without a context.
+    """
+
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+
+    margin_ms = int(
+        os.environ.get("PROCESSOR_DEADLINE_MARGIN_MS") or DEFAULT_DEADLINE_MARGIN_MS
+    )
+    remaining_ms = context.get_remaining_time_in_millis() - margin_ms
+    return time.monotonic() + remaining_ms / 1000
+
+
+def partition_by_group(records: list) -> list:
+    """
+    Partitions SQS records by attributes.MessageGroupId, keeping their order.
+
+    Records without a MessageGroupId (standard queues) are independent, so
+    each one gets a partition of its own.
+
+    Args:
+        records (list): The SQS records of a batch.
+
+    Returns:
+        list: Partitions in first-seen order, each a list of (index, record).
+    """
+
+    partitions = []
+    groups = {}
+
+    for index, record in enumerate(records):
+        group_id = record.get("attributes", {}).get("MessageGroupId")
+
+        if group_id is None:
+            partitions.append([(index, record)])
+            continue
+
+        partition = groups.get(group_id)
+        if partition is None:
+            partition = groups[group_id] = []
+            partitions.append(partition)
+        partition.append((index, record))
+
+    return partitions
+
+
+class BatchReport:
+    """Outcome of a batch: failed record indexes and start latencies."""
+
+    __slots__ = ("failed_indexes", "start_latencies")
+
+    def __init__(self, failed_indexes: list, start_latencies: dict):
+        self.failed_indexes = failed_indexes
+        self.start_latencies = start_latencies
+
+
+class PriorityScheduler:
+    """
+    Hands out the next record to run across the message groups of a batch.
+
+    A group is ready when none of its records is running. Among ready groups
+    the one whose next record has the best priority goes first ("strict"),
+    or priorities share the workers in proportion to their weights with a
+    smooth weighted round robin ("weighted"). Groups of equal priority take
+    turns. Records of a group are always handed out in order, and a failure
+    fails the rest of its group.
+
+    The scheduler itself is not thread-safe, callers hold a lock around it.
+    """
+
+    def __init__(
+        self,
+        partitions: list,
+        priorities=None,
+        policy: str = DEFAULT_SCHEDULING,
+        weights=None,
+    ):
+        self.partitions = partitions
+        self.policy = policy
+        self.failed_indexes = []
+        self.start_latencies = {}
+        self._labels = priorities
+        self._positions = [0] * len(partitions)
+        self._remaining = len(partitions)
+        self._running = set()
+        self._started_at = time.monotonic()
+        self._sequence = 0
+        # strict and fifo: heap of (rank, sequence, partition id)
+        self._heap = []
+        # weighted: ready partition ids and current credit per priority
+        self._queues = {}
+        self._credits = {}
+        self._weights = weights or DEFAULT_PRIORITY_WEIGHTS
+
+        for partition_id in range(len(partitions)):
+            self._push(partition_id)
+
+    @property
+    def finished(self) -> bool:
+        return self._remaining == 0
+
+    def acquire(self):
+        """
+        Takes the next record to run.
+
+        Returns:
+            tuple | None: (partition id, index, record), or None when no
+                group is ready.
+        """
+
+        partition_id = self._pop()
+        if partition_id is None:
+            return None
+
+        index, record = self.partitions[partition_id][self._positions[partition_id]]
+        self._running.add(partition_id)
+
+        wait = time.monotonic() - self._started_at
+        self.start_latencies.setdefault(self._label(index), []).append(wait)
+        return partition_id, index, record
+
+    def release(self, partition_id: int, succeeded: bool) -> None:
+        """
+        Returns a group after its record ran.
+
+        Args:
+            partition_id (int): The group handed out by acquire.
+            succeeded (bool): False fails the record and the rest of its group.
+        """
+
+        self._running.discard(partition_id)
+
+        if not succeeded:
+            self._fail(partition_id)
+            return
+
+        self._positions[partition_id] += 1
+        if self._positions[partition_id] < len(self.partitions[partition_id]):
+            self._push(partition_id)
+        else:
+            self._remaining -= 1
+
+    def fail_pending(self) -> None:
+        """Fails every running and waiting record, e.g. at the deadline."""
+
+        for partition_id in sorted(self._running):
+            index, record = self.partitions[partition_id][self._positions[partition_id]]
+            logger.warning(
+                "Cancelled message %s: remaining Lambda time is too low.",
+                record.get("messageId"),
+            )
+            self._fail(partition_id)
+        self._running.clear()
+
+        while True:
+            partition_id = self._pop()
+            if partition_id is None:
+                break
+            self._fail(partition_id)
+
+    def _fail(self, partition_id: int) -> None:
+        partition = self.partitions[partition_id]
+        self.failed_indexes.extend(_fail_from(partition, self._positions[partition_id]))
+        self._positions[partition_id] = len(partition)
+        self._remaining -= 1
+
+    def _label(self, index: int) -> str:
+        if self._labels is None:
+            return DEFAULT_PRIORITY
+        label = self._labels[index]
+        return label if label in PRIORITY_RANKS else DEFAULT_PRIORITY
+
+    def _push(self, partition_id: int) -> None:
+        index = self.partitions[partition_id][self._positions[partition_id]][0]
+        label = self._label(index)
+        self._sequence += 1
+
+        if self.policy == SCHEDULING_WEIGHTED:
+            self._queues.setdefault(label, deque()).append(partition_id)
+        elif self.policy == SCHEDULING_FIFO:
+            heapq.heappush(self._heap, (0, self._sequence, partition_id))
+        else:
+            rank = PRIORITY_RANKS[label]
+            heapq.heappush(self._heap, (rank, self._sequence, partition_id))
+
+    def _pop(self):
+        if self.policy != SCHEDULING_WEIGHTED:
+            return heapq.heappop(self._heap)[2] if self._heap else None
+
+        ready = [label for label, queue in self._queues.items() if queue]
+        if not ready:
+            return None
+
+        # Smooth weighted round robin over the priorities with ready groups
+        total = 0
+        for label in ready:
+            weight = self._weights.get(label, 1)
+            self._credits[label] = self._credits.get(label, 0) + weight
+            total += weight
+        chosen = max(ready, key=lambda label: self._credits[label])
+        self._credits[chosen] -= total
+
+        return self._queues[chosen].popleft()
+
+
+def run_batch(records: list, process_record, **options) -> list:
+    """
+    Runs a batch of SQS records, see execute_batch for the options.
+
+    Returns:
+        list: Indexes of the failed records, in batch order.
+    """
+
+    return execute_batch(records, process_record, **options).failed_indexes
+
+
+def execute_batch(
+    records: list,
+    process_record,
+    max_workers: int = 1,
+    mode: str = "",
+    task_timeout=None,
+    deadline=None,
+    priorities=None,
+    policy: str = DEFAULT_SCHEDULING,
+    weights=None,
+) -> BatchReport:
+    """
+    Runs a batch of SQS records, one message group at a time per worker.
+
+    Records of the same message group always run sequentially and in order.
+    Across groups, the scheduler starts higher priority records first. With
+    more than one worker, different groups run concurrently on a bounded set
+    of threads, which suits I/O-bound handlers. In "async" mode the workers
+    are tasks on a single event loop instead.
+
+    Args:
+        records (list): The SQS records of a batch.
+        process_record (callable): Processes one record, raises on failure.
+            May return an awaitable for async handlers.
+        max_workers (int): Number of records processed concurrently.
+        mode (str): "async" to run on an event loop, otherwise threads.
+        task_timeout (float | None): Per-record timeout in seconds.
+        deadline (float | None): time.monotonic() after which work is cancelled.
+        priorities (list | None): Priority label of each record.
+        policy (str): "strict", "weighted" or "fifo" scheduling across groups.
+        weights (dict | None): Weight per priority for "weighted" scheduling.
+
+    Returns:
+        BatchReport: Failed indexes in batch order, and the seconds each
+            record waited to start, per priority.
+    """
+
+    scheduler = PriorityScheduler(
+        partition_by_group(records), priorities, policy, weights
+    )
+    workers = max(1, min(max_workers, len(scheduler.partitions)))
+
+    if mode == EXECUTION_MODE_ASYNC:
+        asyncio.run(
+            _run_async_workers(
+                scheduler, process_record, workers, task_timeout, deadline
+            )
+        )
+    elif workers == 1:
+        _run_worker(
+            scheduler, threading.Condition(), process_record, task_timeout, deadline
+        )
+    else:
+        condition = threading.Condition()
+        threads = [
+            threading.Thread(
+                target=_run_worker,
+                args=(scheduler, condition, process_record, task_timeout, deadline),
+            )
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return BatchReport(sorted(scheduler.failed_indexes), scheduler.start_latencies)
+
+
+def summarize_latencies(start_latencies: dict) -> dict:
+    """
+    Summarizes queue-to-start latencies per priority.
+
+    Args:
+        start_latencies (dict): Seconds waited per record, keyed by priority.
+
+    Returns:
+        dict: count, p50_ms, p99_ms and max_ms per priority.
+    """
+
+    summary = {}
+    for label, waits in start_latencies.items():
+        waits = sorted(waits)
+        summary[label] = {
+            "count": len(waits),
+            "p50_ms": round(_percentile(waits, 50) * 1000, 3),
+            "p99_ms": round(_percentile(waits, 99) * 1000, 3),
+            "max_ms": round(waits[-1] * 1000, 3),
+        }
+    return summary
+
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    # Nearest-rank percentile
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _run_worker(scheduler, condition, process_record, task_timeout, deadline):
+    while True:
+        with condition:
+            item = scheduler.acquire()
+            while item is None:
+                if scheduler.finished:
+                    return
+                condition.wait()
+                item = scheduler.acquire()
+
+        partition_id, _, record = item
+        succeeded = _run_record(record, process_record, task_timeout, deadline)
+
+        with condition:
+            scheduler.release(partition_id, succeeded)
+            condition.notify_all()
+
+
+def _run_record(record, process_record, task_timeout, deadline) -> bool:
+    if deadline is not None and time.monotonic() >= deadline:
+        logger.warning(
+            "Stopping before message %s: remaining Lambda time is too low.",
+            record.get("messageId"),
+        )
+        return False
+
+    try:
+        result = process_record(record)
+        if result is not None and isinstance(result, Awaitable):
+            # Async handlers get a private event loop outside "async" mode
+            asyncio.run(
+                _await_with_timeout(result, _timeout_for(task_timeout, deadline))
+            )
+
+    except Exception as e:
+        logger.error("Error processing task due to: %s", e)
+        return False
+
+    return True
+
+
+async def _run_async_workers(
+    scheduler, process_record, workers, task_timeout, deadline
+):
+    condition = asyncio.Condition()
+    tasks = [
+        asyncio.ensure_future(
+            _run_async_worker(
+                scheduler, condition, process_record, task_timeout, deadline
+            )
+        )
+        for _ in range(workers)
+    ]
+
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+
+    if pending:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        # Only the batch deadline cancels workers, report what is left
+        scheduler.fail_pending()
+
+
+async def _run_async_worker(
+    scheduler, condition, process_record, task_timeout, deadline
+):
+    while True:
+        async with condition:
+            item = scheduler.acquire()
+            while item is None:
+                if scheduler.finished:
+                    return
+                await condition.wait()
+                item = scheduler.acquire()
+
+        partition_id, _, record = item
+        succeeded = True
+
+        try:
+            result = process_record(record)
+            if result is not None and isinstance(result, Awaitable):
+                await asyncio.wait_for(result, _timeout_for(task_timeout, deadline))
+
+        except Exception as e:
+            logger.error("Error processing task due to: %s", e)
+            succeeded = False
+
+        async with condition:
+            scheduler.release(partition_id, succeeded)
+            condition.notify_all()
+
+
+async def _await_with_timeout(awaitable, timeout):
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+def _timeout_for(task_timeout, deadline):
+    if deadline is None:
+        return task_timeout
+
+    remaining = max(0.0, deadline - time.monotonic())
+    return remaining if task_timeout is None else min(task_timeout, remaining)
+
+
+def _fail_from(partition: list, position: int) -> list:
+    """
+    Reports the record at position and every later record as failed.
+
+    Args:
+        partition (list): (index, record) pairs of a single message group.
+        position (int): Position of the first failed record.
+
+    Returns:
+        list: Indexes of the failed records.
+    """
+
+    for _, skipped_record in partition[position + 1 :]:
+        logger.warning(
+            "Skipping message %s: an earlier message in its group failed.",
+            skipped_record.get("messageId"),
+        )
+
+    return [index for index, _ in partition[position:]]
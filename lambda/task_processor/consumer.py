@@ -0,0 +1,276 @@
+"""
+Polling consumer running the task processor on a long-lived worker.
+
+The queue is long-polled with receive_message and every batch goes through
+task_handler.process, so decoding, handler dispatch, idempotency, priority
+scheduling and FIFO failure semantics are the same as under the Lambda SQS
+trigger. Messages that succeeded are deleted with delete_message_batch;
+failed ones are left to become visible again and be retried or redriven.
+
+Run it with:
+
+    QUEUE_URL=... python consumer.py
+"""
+
+import os
+import signal
+import threading
+import time
+
+import task_handler
+from sqs_client import to_lambda_event
+from sqs_clients import get_sqs_client
+from structured_logger import get_logger
+
+logger = get_logger("task_consumer")
+
+# receive_message and delete_message_batch take at most 10 messages
+MAX_MESSAGES = 10
+MAX_WAIT_TIME_SECONDS = 20
+DEFAULT_STATS_INTERVAL_SECONDS = 60
+
+
+class ConsumerStats:
+    """Counters of a consumer's polls and messages."""
+
+    FIELDS = (
+        "polls",
+        "empty_polls",
+        "received",
+        "succeeded",
+        "failed",
+        "deleted",
+        "delete_failures",
+    )
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started_at = clock()
+        self._counters = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **counters) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                self._counters[name] += value
+
+    def snapshot(self) -> dict:
+        """
+        Returns the counters with the derived rates.
+
+        Returns:
+            dict: The counters, messages_per_second (messages processed per
+                second since the consumer started) and idle_poll_ratio (the
+                share of polls that returned no message).
+        """
+
+        with self._lock:
+            snapshot = dict(self._counters)
+
+        elapsed = max(self._clock() - self.started_at, 1e-9)
+        processed = snapshot["succeeded"] + snapshot["failed"]
+        snapshot["messages_per_second"] = round(processed / elapsed, 3)
+        snapshot["idle_poll_ratio"] = (
+            round(snapshot["empty_polls"] / snapshot["polls"], 3)
+            if snapshot["polls"]
+            else 0.0
+        )
+        return snapshot
+
+
+class Consumer:
+    """
+    Long-polls a queue and processes what it receives until stopped.
+
+    Concurrency within a received batch follows PROCESSOR_MAX_WORKERS and
+    PROCESSOR_EXECUTION_MODE, as under Lambda.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        max_messages: int = MAX_MESSAGES,
+        wait_time_seconds: int = MAX_WAIT_TIME_SECONDS,
+        visibility_timeout: int = None,
+        stats_interval_seconds: float = DEFAULT_STATS_INTERVAL_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.max_messages = max(1, min(max_messages, MAX_MESSAGES))
+        self.wait_time_seconds = max(0, min(wait_time_seconds, MAX_WAIT_TIME_SECONDS))
+        self.visibility_timeout = visibility_timeout
+        self.stats_interval_seconds = stats_interval_seconds
+        self.stats = ConsumerStats(clock)
+        self._clock = clock
+        self._stopping = threading.Event()
+        self._stats_logged_at = clock()
+
+    def stop(self, *_) -> None:
+        """
+        Asks the consumer to stop once the batch in hand is finished.
+
+        Accepts and ignores signal handler arguments.
+        """
+
+        if not self._stopping.is_set():
+            logger.info("Stopping consumer after the current batch")
+        self._stopping.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def run(self, max_polls: int = None) -> dict:
+        """
+        Polls until stop() is called, or max_polls polls were made.
+
+        Args:
+            max_polls (int | None): Number of polls to make, unlimited when
+                None.
+
+        Returns:
+            dict: The final stats snapshot.
+        """
+
+        logger.info("Consumer started", queue_url=self.queue_url)
+
+        polls = 0
+        while not self.stopping and (max_polls is None or polls < max_polls):
+            try:
+                self.poll_once()
+            except Exception as e:
+                # Keep the worker alive through throttling or network errors
+                logger.error("Poll failed due to: %s", e)
+                self._stopping.wait(1)
+            polls += 1
+            self._log_stats()
+
+        snapshot = self.stats.snapshot()
+        logger.info("Consumer stopped", **snapshot)
+        return snapshot
+
+    def poll_once(self) -> int:
+        """
+        Receives one batch, processes it and deletes what succeeded.
+
+        Returns:
+            int: The number of messages received.
+        """
+
+        options = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": self.max_messages,
+            "WaitTimeSeconds": self.wait_time_seconds,
+            # MessageGroupId and SentTimestamp drive ordering and latencies
+            "AttributeNames": ["All"],
+            "MessageAttributeNames": ["All"],
+        }
+        if self.visibility_timeout is not None:
+            options["VisibilityTimeout"] = self.visibility_timeout
+
+        messages = self.sqs_client.receive_message(**options).get("Messages", [])
+        self.stats.add(polls=1, empty_polls=0 if messages else 1)
+        if not messages:
+            return 0
+
+        event = to_lambda_event(messages)
+        response = task_handler.process(event, None)
+
+        failed_ids = {
+            failure["itemIdentifier"] for failure in response["batchItemFailures"]
+        }
+        succeeded = [
+            record
+            for record in event["Records"]
+            if record["messageId"] not in failed_ids
+        ]
+        self.stats.add(
+            received=len(messages),
+            succeeded=len(succeeded),
+            failed=len(messages) - len(succeeded),
+        )
+
+        self._delete(succeeded)
+        return len(messages)
+
+    def _delete(self, records: list) -> None:
+        for start in range(0, len(records), MAX_MESSAGES):
+            chunk = records[start : start + MAX_MESSAGES]
+            entries = [
+                {"Id": str(index), "ReceiptHandle": record["receiptHandle"]}
+                for index, record in enumerate(chunk)
+            ]
+
+            try:
+                response = self.sqs_client.delete_message_batch(
+                    QueueUrl=self.queue_url, Entries=entries
+                )
+            except Exception as e:
+                # The messages reappear and are skipped by the idempotency store
+                logger.error("delete_message_batch failed due to: %s", e)
+                self.stats.add(delete_failures=len(entries))
+                continue
+
+            failures = response.get("Failed", [])
+            for failure in failures:
+                logger.warning(
+                    "Could not delete message: %s",
+                    failure.get("Message") or failure.get("Code", ""),
+                    message_id=chunk[int(failure["Id"])]["messageId"],
+                )
+            self.stats.add(
+                deleted=len(entries) - len(failures), delete_failures=len(failures)
+            )
+
+    def _log_stats(self) -> None:
+        now = self._clock()
+        if now - self._stats_logged_at >= self.stats_interval_seconds:
+            self._stats_logged_at = now
+            logger.info("Consumer stats", **self.stats.snapshot())
+
+
+def consumer_from_env(sqs_client=None) -> Consumer:
+    """
+    Builds a consumer for QUEUE_URL, tuned by the CONSUMER_* variables.
+
+    Args:
+        sqs_client (object | None): The SQS client, built from the
+            environment when None.
+
+    Returns:
+        Consumer: The consumer.
+    """
+
+    visibility_timeout = os.environ.get("CONSUMER_VISIBILITY_TIMEOUT")
+
+    return Consumer(
+        sqs_client or get_sqs_client(),
+        os.environ["QUEUE_URL"],
+        max_messages=int(os.environ.get("CONSUMER_MAX_MESSAGES") or MAX_MESSAGES),
+        wait_time_seconds=int(
+            os.environ.get("CONSUMER_WAIT_TIME_SECONDS") or MAX_WAIT_TIME_SECONDS
+        ),
+        visibility_timeout=int(visibility_timeout) if visibility_timeout else None,
+        stats_interval_seconds=float(
+            os.environ.get("CONSUMER_STATS_INTERVAL_SECONDS")
+            or DEFAULT_STATS_INTERVAL_SECONDS
+        ),
+    )
+
+
+def main() -> None:
+    """Runs a consumer until SIGTERM or SIGINT."""
+
+    consumer = consumer_from_env()
+
+    # ECS and Kubernetes send SIGTERM before killing the container
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+
+    consumer.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+from types import MappingProxyType
+
+from structured_logger import get_logger
+
+logger = get_logger("task_processor")
+
+# Matches any task_type or priority
+ANY = "*"
+
+
+class HandlerRegistry:
+    """
+    Maps (task_type, priority) to the handler that processes the task.
+
+    Handlers join through the register decorator while their module is
+    imported. freeze() then resolves every fallback up front into read-only
+    dispatch tables. Combinations nobody registered fall back to
+    (task_type, ANY), then (ANY, priority), then the default handler, so a
+    handler registered for a task type wins over the generic handler of a
+    priority.
+
+    Task types nobody registered resolve through the per-priority table, so
+    with only ANY task_type handlers (as in the task processor) every lookup
+    is a single dict hit whatever the task_type.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._default = None
+        self._table = None
+        self._by_priority = None
+        self._by_task_type = None
+        self._has_typed_handlers = False
+
+    def register(self, priority: str = ANY, task_type: str = ANY, default=False):
+        """
+        Decorator registering a handler for a task_type and priority.
+
+        Args:
+            priority (str): The priority handled, ANY for every priority.
+            task_type (str): The task type handled, ANY for every type.
+            default (bool): Use the handler for unknown combinations.
+
+        Returns:
+            callable: The decorator, which returns the handler unchanged.
+        """
+
+        def decorator(handler):
+            if self._table is not None:
+                raise RuntimeError("Handlers cannot be registered after freeze()")
+
+            key = (task_type, priority)
+            if key in self._handlers:
+                raise ValueError(
+                    f"A handler is already registered for task_type={task_type} priority={priority}"
+                )
+
+            self._handlers[key] = handler
+            if default:
+                self._default = handler
+            return handler
+
+        return decorator
+
+    def freeze(self):
+        """
+        Builds the read-only dispatch tables with every fallback resolved.
+
+        Besides the (task_type, priority) table of registered task types, the
+        any-priority handler of each registered task type and the handler of
+        each priority for every other task type are precomputed.
+
+        Returns:
+            MappingProxyType: The (task_type, priority) -> handler table.
+        """
+
+        if self._default is None:
+            raise RuntimeError("A default handler must be registered")
+
+        task_types = {task_type for task_type, _ in self._handlers} | {ANY}
+        priorities = {priority for _, priority in self._handlers} | {ANY}
+
+        table = {
+            (task_type, priority): self._fallback(task_type, priority)
+            for task_type in task_types
+            for priority in priorities
+        }
+
+        self._by_priority = MappingProxyType(
+            {priority: table[(ANY, priority)] for priority in priorities - {ANY}}
+        )
+        self._by_task_type = MappingProxyType(
+            {
+                task_type: handler
+                for (task_type, priority), handler in self._handlers.items()
+                if priority == ANY and task_type != ANY
+            }
+        )
+        self._has_typed_handlers = task_types != {ANY}
+        self._table = MappingProxyType(table)
+        return self._table
+
+    def resolve(self, task_type: str, priority: str):
+        """
+        Returns the handler for a task.
+
+        Args:
+            task_type (str): The type of the task.
+            priority (str): Priority level of the task.
+
+        Returns:
+            callable: The registered handler, or the default handler.
+        """
+
+        if self._has_typed_handlers:
+            handler = self._table.get((task_type, priority))
+            if handler is not None:
+                return handler
+
+            # A registered task type at a priority nobody registered
+            handler = self._by_task_type.get(task_type)
+            if handler is not None:
+                return handler
+
+        # Any other task type with a registered priority
+        handler = self._by_priority.get(priority)
+        if handler is None:
+            logger.warning(
+                "No handler for task_type=%s priority=%s. Defaulting to %s.",
+                task_type,
+                priority,
+                self._default.__name__,
+            )
+            handler = self._default
+        return handler
+
+    def list_handlers(self) -> list:
+        """
+        Lists the registered handlers.
+
+        Returns:
+            list: One dict per handler with task_type, priority, handler name
+                and whether it is the default.
+        """
+
+        return [
+            {
+                "task_type": task_type,
+                "priority": priority,
+                "handler": handler.__name__,
+                "default": handler is self._default,
+            }
+            for (task_type, priority), handler in sorted(self._handlers.items())
+        ]
+
+    def _fallback(self, task_type: str, priority: str):
+        for key in ((task_type, priority), (task_type, ANY), (ANY, priority)):
+            handler = self._handlers.get(key)
+            if handler is not None:
+                return handler
+        return self._default
+
+
+registry = HandlerRegistry()
+register_handler = registry.register
@@ -0,0 +1,200 @@
+import math
+import os
+import threading
+import time
+
+from sqs_clients import get_sqs_client
+from structured_logger import get_logger
+
+logger = get_logger("task_processor")
+
+# change_message_visibility_batch takes at most 10 entries
+MAX_BATCH_ENTRIES = 10
+DEFAULT_MAX_SECONDS = 900
+# Errors after which extending a message again can never succeed
+_GONE_CODES = {"ReceiptHandleIsInvalid", "MessageNotInflight"}
+
+
+class VisibilityHeartbeat:
+    """
+    Keeps a batch's messages invisible while the batch is processed.
+
+    Every interval_seconds a background thread resets the visibility timeout
+    of every message to extension_seconds, ten messages per
+    change_message_visibility_batch call. Messages stay covered until the
+    batch is acknowledged, because successes are only deleted once the whole
+    batch returns. The heartbeat stops at stop(), or once stop_at passes so
+    work abandoned at the deadline becomes visible for a retry again.
+
+    Without sqs_client the shared client is only built by the first beat, so
+    batches done within one interval never import boto3.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        receipt_handles: list,
+        interval_seconds: float,
+        extension_seconds: int,
+        stop_at: float = None,
+        clock=time.monotonic,
+    ):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.interval_seconds = interval_seconds
+        self.extension_seconds = extension_seconds
+        self.stop_at = stop_at
+        self._clock = clock
+        self._receipt_handles = list(dict.fromkeys(receipt_handles))
+        self._stopped = threading.Event()
+        self._thread = None
+        self.beats = 0
+        self.extended = 0
+        self.failed = 0
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="visibility-heartbeat", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops extending and waits for a beat in progress to finish."""
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def beat(self) -> None:
+        """Extends the visibility timeout of every message still covered."""
+
+        self.beats += 1
+        still_in_flight = []
+        if self.sqs_client is None:
+            self.sqs_client = get_sqs_client()
+
+        for start in range(0, len(self._receipt_handles), MAX_BATCH_ENTRIES):
+            chunk = self._receipt_handles[start : start + MAX_BATCH_ENTRIES]
+            entries = [
+                {
+                    "Id": str(index),
+                    "ReceiptHandle": receipt_handle,
+                    "VisibilityTimeout": self.extension_seconds,
+                }
+                for index, receipt_handle in enumerate(chunk)
+            ]
+
+            try:
+                response = self.sqs_client.change_message_visibility_batch(
+                    QueueUrl=self.queue_url, Entries=entries
+                )
+            except Exception as e:
+                logger.warning("change_message_visibility_batch failed due to: %s", e)
+                self.failed += len(entries)
+                still_in_flight.extend(chunk)
+                continue
+
+            gone = set()
+            for failure in response.get("Failed", []):
+                self.failed += 1
+                if failure.get("Code") in _GONE_CODES:
+                    gone.add(int(failure["Id"]))
+                else:
+                    logger.warning(
+                        "Could not extend visibility: %s",
+                        failure.get("Message") or failure.get("Code", ""),
+                    )
+
+            self.extended += len(entries) - len(response.get("Failed", []))
+            still_in_flight.extend(
+                handle for index, handle in enumerate(chunk) if index not in gone
+            )
+
+        self._receipt_handles = still_in_flight
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            if self.stop_at is not None and self._clock() >= self.stop_at:
+                logger.warning("Visibility heartbeat stopped at the deadline")
+                return
+            if not self._receipt_handles:
+                return
+            self.beat()
+
+
+def queue_url_from_arn(arn: str) -> str:
+    """
+    Builds a queue URL from the eventSourceARN of an SQS record.
+
+    Args:
+        arn (str): e.g. arn:aws:sqs:us-east-1:123456789012:tasks.fifo.
+
+    Returns:
+        str | None: The queue URL, or None when arn is not an SQS ARN.
+    """
+
+    parts = (arn or "").split(":")
+    if len(parts) != 6 or parts[2] != "sqs":
+        return None
+
+    _, _, _, region, account_id, name = parts
+    if os.environ.get("ENVIRONMENT") == "local":
+        endpoint = os.environ.get("LOCALSTACK_ENDPOINT", "http://localstack:4566")
+    else:
+        endpoint = f"https://sqs.{region}.amazonaws.com"
+    return f"{endpoint}/{account_id}/{name}"
+
+
+def start_heartbeat(records: list, deadline: float = None):
+    """
+    Starts a heartbeat for a batch when VISIBILITY_HEARTBEAT_SECONDS is set.
+
+    Each beat sets the visibility timeout to
+    VISIBILITY_HEARTBEAT_EXTENSION_SECONDS (default three intervals). Beats
+    stop at the deadline, and in any case after
+    VISIBILITY_HEARTBEAT_MAX_SECONDS. The queue is QUEUE_URL, or the one in
+    the records' eventSourceARN.
+
+    Args:
+        records (list): The SQS records of the batch.
+        deadline (float | None): time.monotonic() time the batch must stop by.
+
+    Returns:
+        VisibilityHeartbeat | None: The running heartbeat, or None when it is
+            disabled or the records cannot be extended.
+    """
+
+    interval = float(os.environ.get("VISIBILITY_HEARTBEAT_SECONDS") or 0)
+    if interval <= 0:
+        return None
+
+    receipt_handles = [
+        record["receiptHandle"] for record in records if record.get("receiptHandle")
+    ]
+    queue_url = os.environ.get("QUEUE_URL") or queue_url_from_arn(
+        records[0].get("eventSourceARN") if records else None
+    )
+    if not receipt_handles or not queue_url:
+        return None
+
+    extension = int(
+        os.environ.get("VISIBILITY_HEARTBEAT_EXTENSION_SECONDS")
+        or math.ceil(interval * 3)
+    )
+    stop_at = time.monotonic() + float(
+        os.environ.get("VISIBILITY_HEARTBEAT_MAX_SECONDS") or DEFAULT_MAX_SECONDS
+    )
+    if deadline is not None:
+        stop_at = min(stop_at, deadline)
+
+    return VisibilityHeartbeat(
+        None, queue_url, receipt_handles, interval, extension, stop_at
+    ).start()
@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from lazy_import import lazy_import
+
+# Only the sqlite backend needs it
+sqlite3 = lazy_import("sqlite3")
+
+STATUS_NEW = "NEW"
+STATUS_IN_PROGRESS = "IN_PROGRESS"
+STATUS_COMPLETED = "COMPLETED"
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_IN_PROGRESS_TTL_SECONDS = 120
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_DB_PATH = "/tmp/idempotency.sqlite3"
+
+_STORE = None
+_STORE_CONFIG = None
+_STORE_LOCK = threading.Lock()
+
+
+class TaskInProgressError(Exception):
+    """Raised when another delivery of the same task is still running."""
+
+
+class InMemoryBackend:
+    """
+    Idempotency records kept in a dict, for tests and single-process runs.
+
+    A persistent backend implements the same three methods: claim, complete
+    and release.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, expires_at: float, now: float):
+        """
+        Marks key as in progress unless an unexpired record exists.
+
+        Args:
+            key (str): The idempotency key.
+            expires_at (float): Expiry of the in-progress record.
+            now (float): Current time, records expiring before it are ignored.
+
+        Returns:
+            tuple | None: None when claimed, otherwise the existing
+                (status, expires_at) record.
+        """
+
+        with self._lock:
+            existing = self._records.get(key)
+            if existing is not None and existing[1] > now:
+                return existing
+            self._records[key] = (STATUS_IN_PROGRESS, expires_at)
+            return None
+
+    def complete(self, key: str, expires_at: float) -> None:
+        with self._lock:
+            self._records[key] = (STATUS_COMPLETED, expires_at)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class SQLiteBackend:
+    """
+    Idempotency records in a local SQLite file, the stand-in for a shared
+    table (e.g. DynamoDB) that all consumers can reach.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "key TEXT PRIMARY KEY, status TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def claim(self, key: str, expires_at: float, now: float):
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO idempotency (key, status, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET status = excluded.status, "
+                "expires_at = excluded.expires_at WHERE idempotency.expires_at <= ?",
+                (key, STATUS_IN_PROGRESS, expires_at, now),
+            )
+            if cursor.rowcount == 1:
+                return None
+
+            return self._connection.execute(
+                "SELECT status, expires_at FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+
+    def complete(self, key: str, expires_at: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO idempotency (key, status, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, STATUS_COMPLETED, expires_at),
+            )
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+
+
+class IdempotencyStore:
+    """
+    Tracks in-progress and completed tasks so duplicate deliveries are skipped.
+
+    Completed keys are cached in an in-process LRU in front of the backend, so
+    a redelivery to a warm container is answered without touching it.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        in_progress_ttl_seconds: float = DEFAULT_IN_PROGRESS_TTL_SECONDS,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.in_progress_ttl_seconds = in_progress_ttl_seconds
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key: str) -> str:
+        """
+        Claims key for processing.
+
+        Args:
+            key (str): The idempotency key (task_id or message id).
+
+        Returns:
+            str: STATUS_NEW when the caller should process the task,
+                STATUS_COMPLETED for a duplicate of a finished task, or
+                STATUS_IN_PROGRESS when another delivery is still running.
+        """
+
+        now = time.time()
+
+        with self._lock:
+            expires_at = self._cache.get(key)
+            if expires_at is not None:
+                if expires_at > now:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return STATUS_COMPLETED
+                del self._cache[key]
+
+        existing = self.backend.claim(key, now + self.in_progress_ttl_seconds, now)
+
+        with self._lock:
+            if existing is None:
+                self.misses += 1
+                return STATUS_NEW
+
+            self.hits += 1
+            status, expires_at = existing
+            if status == STATUS_COMPLETED:
+                self._remember(key, expires_at)
+            return status
+
+    def complete(self, key: str) -> None:
+        """Marks key as completed for the configured TTL."""
+
+        expires_at = time.time() + self.ttl_seconds
+        self.backend.complete(key, expires_at)
+
+        with self._lock:
+            self._remember(key, expires_at)
+
+    def release(self, key: str) -> None:
+        """Drops the in-progress claim on key so a retry can process it."""
+
+        self.backend.release(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _remember(self, key: str, expires_at: float) -> None:
+        self._cache[key] = expires_at
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def get_idempotency_store():
+    """
+    Returns the idempotency store configured by the environment.
+
+    IDEMPOTENCY_BACKEND selects "memory" or "sqlite" (IDEMPOTENCY_DB_PATH).
+    The store is kept across warm invocations and rebuilt when its
+    configuration changes.
+
+    Returns:
+        IdempotencyStore | None: The store, or None when idempotency is off.
+    """
+
+    global _STORE, _STORE_CONFIG
+
+    backend_name = (os.environ.get("IDEMPOTENCY_BACKEND") or "").lower()
+    if not backend_name:
+        return None
+
+    config = (
+        backend_name,
+        os.environ.get("IDEMPOTENCY_DB_PATH") or DEFAULT_DB_PATH,
+        float(os.environ.get("IDEMPOTENCY_TTL_SECONDS") or DEFAULT_TTL_SECONDS),
+        float(
+            os.environ.get("IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS")
+            or DEFAULT_IN_PROGRESS_TTL_SECONDS
+        ),
+        int(os.environ.get("IDEMPOTENCY_CACHE_SIZE") or DEFAULT_CACHE_SIZE),
+    )
+
+    if _STORE is not None and _STORE_CONFIG == config:
+        return _STORE
+
+    with _STORE_LOCK:
+        if _STORE is None or _STORE_CONFIG != config:
+            if backend_name == "sqlite":
+                backend = SQLiteBackend(config[1])
+            elif backend_name == "memory":
+                backend = InMemoryBackend()
+            else:
+                raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {backend_name}")
+
+            _STORE = IdempotencyStore(backend, *config[2:])
+            _STORE_CONFIG = config
+
+    return _STORE
+
+
+def reset_idempotency_store() -> None:
+    """Drops the cached store, forcing the next call to rebuild it."""
+
+    global _STORE, _STORE_CONFIG
+
+    with _STORE_LOCK:
+        _STORE = None
+        _STORE_CONFIG = None
@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+
+from lazy_import import lazy_import
+
+# Only the sqlite backend needs it
+sqlite3 = lazy_import("sqlite3")
+
+STATUS_SUCCEEDED = "SUCCEEDED"
+STATUS_FAILED = "FAILED"
+
+# Columns of a task result, in storage order
+FIELDS = (
+    "task_id",
+    "message_id",
+    "status",
+    "task_type",
+    "priority",
+    "attempts",
+    "error",
+    "queue_wait_ms",
+    "processing_ms",
+    "finished_at",
+    "trace_id",
+)
+
+DEFAULT_DB_PATH = "/tmp/task-results.sqlite3"
+DEFAULT_FILE_PATH = "/tmp/task-results.jsonl"
+# Results kept for the next flush when a write fails, the oldest are dropped
+DEFAULT_MAX_BUFFERED = 10000
+
+_STORE = None
+_STORE_CONFIG = None
+_STORE_LOCK = threading.Lock()
+
+
+class InMemoryBackend:
+    """
+    Task results kept in a dict, for tests and single-process runs.
+
+    A persistent backend implements the same two methods: write_many and
+    get.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.writes = 0
+
+    def write_many(self, results: list) -> None:
+        """
+        Stores results, replacing earlier results of the same tasks.
+
+        Args:
+            results (list): Result dicts with the keys in FIELDS.
+        """
+
+        with self._lock:
+            self.writes += 1
+            for result in results:
+                self._results[result["task_id"]] = dict(result)
+
+    def get(self, task_id: str):
+        with self._lock:
+            result = self._results.get(task_id)
+            return dict(result) if result is not None else None
+
+
+class SQLiteBackend:
+    """
+    Task results in a local SQLite file, the stand-in for a shared table
+    (e.g. DynamoDB) that status tooling can query.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS task_results ("
+            "task_id TEXT PRIMARY KEY, message_id TEXT, status TEXT NOT NULL, "
+            "task_type TEXT, priority TEXT, attempts INTEGER, error TEXT, "
+            "queue_wait_ms REAL, processing_ms REAL, finished_at REAL, "
+            "trace_id TEXT)"
+        )
+        self._insert = (
+            f"INSERT OR REPLACE INTO task_results ({', '.join(FIELDS)}) "
+            f"VALUES ({', '.join('?' * len(FIELDS))})"
+        )
+
+    def write_many(self, results: list) -> None:
+        rows = [tuple(result[field] for field in FIELDS) for result in results]
+        with self._lock:
+            # One transaction, so a batch costs a single commit
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(self._insert, rows)
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def get(self, task_id: str):
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {', '.join(FIELDS)} FROM task_results WHERE task_id = ?",
+                (task_id,),
+            ).fetchone()
+        return dict(zip(FIELDS, row)) if row is not None else None
+
+
+class FileBackend:
+    """
+    Task results appended to a local JSON lines file, the latest line of a
+    task being its current result.
+    """
+
+    def __init__(self, path: str = DEFAULT_FILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write_many(self, results: list) -> None:
+        data = "".join(
+            json.dumps(result, separators=(",", ":")) + "\n" for result in results
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+
+    def get(self, task_id: str):
+        found = None
+        with self._lock:
+            if not os.path.exists(self.path):
+                return None
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    result = json.loads(line)
+                    if result["task_id"] == task_id:
+                        found = result
+        return found
+
+
+class ResultStore:
+    """
+    Buffers task results in memory and writes them behind the hot path.
+
+    record() only appends to a list; flush() hands everything buffered to
+    the backend in one write. The task processor flushes once per
+    invocation (or consumer poll), so a batch costs one write instead of one
+    per record. Results of a failed write are kept for the next flush, up to
+    max_buffered.
+    """
+
+    def __init__(self, backend, max_buffered: int = DEFAULT_MAX_BUFFERED):
+        self.backend = backend
+        self.max_buffered = max_buffered
+        self.flushes = 0
+        self.written = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def record(self, **result) -> None:
+        """
+        Buffers a task's result.
+
+        Args:
+            **result: Values of FIELDS, task_id and status at least. Missing
+                fields are stored as None.
+        """
+
+        row = {field: result.get(field) for field in FIELDS}
+        with self._lock:
+            self._buffer.append(row)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self) -> int:
+        """
+        Writes the buffered results in a single backend call.
+
+        Returns:
+            int: The number of results written.
+
+        Raises:
+            Exception: Whatever the backend raised. The results stay
+                buffered for the next flush.
+        """
+
+        with self._lock:
+            results, self._buffer = self._buffer, []
+        if not results:
+            return 0
+
+        try:
+            self.backend.write_many(results)
+        except Exception:
+            with self._lock:
+                self._buffer[:0] = results
+                del self._buffer[: max(0, len(self._buffer) - self.max_buffered)]
+            raise
+
+        with self._lock:
+            self.flushes += 1
+            self.written += len(results)
+        return len(results)
+
+    def get(self, task_id: str):
+        """
+        Returns the latest written result of a task.
+
+        Args:
+            task_id (str): The task id (or message id of an undecodable
+                message).
+
+        Returns:
+            dict | None: The result, or None when none was written.
+        """
+
+        return self.backend.get(task_id)
+
+
+def get_result_store():
+    """
+    Returns the result store configured by the environment.
+
+    RESULT_STORE_BACKEND selects "memory", "sqlite" or "file", stored at
+    RESULT_STORE_PATH. The store is kept across warm invocations and rebuilt
+    when its configuration changes.
+
+    Returns:
+        ResultStore | None: The store, or None when results are not kept.
+    """
+
+    global _STORE, _STORE_CONFIG
+
+    backend_name = (os.environ.get("RESULT_STORE_BACKEND") or "").lower()
+    if not backend_name:
+        return None
+
+    config = (
+        backend_name,
+        os.environ.get("RESULT_STORE_PATH"),
+        int(os.environ.get("RESULT_STORE_MAX_BUFFERED") or DEFAULT_MAX_BUFFERED),
+    )
+
+    if _STORE is not None and _STORE_CONFIG == config:
+        return _STORE
+
+    with _STORE_LOCK:
+        if _STORE is None or _STORE_CONFIG != config:
+            if backend_name == "sqlite":
+                backend = SQLiteBackend(config[1] or DEFAULT_DB_PATH)
+            elif backend_name == "file":
+                backend = FileBackend(config[1] or DEFAULT_FILE_PATH)
+            elif backend_name == "memory":
+                backend = InMemoryBackend()
+            else:
+                raise ValueError(f"Unknown RESULT_STORE_BACKEND: {backend_name}")
+
+            _STORE = ResultStore(backend, config[2])
+            _STORE_CONFIG = config
+
+    return _STORE
+
+
+def reset_result_store() -> None:
+    """Drops the cached store, forcing the next call to rebuild it."""
+
+    global _STORE, _STORE_CONFIG
+
+    with _STORE_LOCK:
+        _STORE = None
+        _STORE_CONFIG = None
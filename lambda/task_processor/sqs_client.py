@@ -0,0 +1,47 @@
+def to_lambda_event(messages: list, queue_arn: str = "") -> dict:
+    """
+    Converts received messages into the event the SQS trigger passes to Lambda.
+
+    Lets the consumer mode run task_handler.process on messages it polled
+    itself.
+
+    Args:
+        messages (list): Messages returned by receive_message, with
+            AttributeNames and MessageAttributeNames set to "All".
+        queue_arn (str): ARN reported as eventSourceARN.
+
+    Returns:
+        dict: The SQS event with one record per message.
+    """
+
+    return {
+        "Records": [
+            {
+                "messageId": message["MessageId"],
+                "receiptHandle": message["ReceiptHandle"],
+                "body": message["Body"],
+                "attributes": message.get("Attributes") or {},
+                "messageAttributes": _lambda_message_attributes(
+                    message.get("MessageAttributes") or {}
+                ),
+                "md5OfBody": message.get("MD5OfBody"),
+                "eventSource": "aws:sqs",
+                "eventSourceARN": queue_arn,
+            }
+            for message in messages
+        ]
+    }
+
+
+def _lambda_message_attributes(attributes: dict) -> dict:
+    # The SQS trigger delivers attributes with camelCase keys
+    return {
+        name: {
+            "stringValue": value.get("StringValue"),
+            "binaryValue": value.get("BinaryValue"),
+            "stringListValues": [],
+            "binaryListValues": [],
+            "dataType": value.get("DataType"),
+        }
+        for name, value in attributes.items()
+    }
@@ -1,89 +1,509 @@
 import json
 import os
-from datetime import datetime, timedelta
+import time
+from collections.abc import Awaitable
 
-import boto3
+from batch_executor import (
+    execute_batch,
+    get_deadline,
+    get_execution_mode,
+    get_max_workers,
+    get_priority_weights,
+    get_scheduling_policy,
+    get_task_timeout,
+    summarize_latencies,
+)
+from claim_check import decode_payload
+from claim_check import stats as claim_check_stats
+from handler_registry import register_handler, registry
+from heartbeat import start_heartbeat
+from idempotency import (
+    STATUS_COMPLETED,
+    STATUS_IN_PROGRESS,
+    TaskInProgressError,
+    get_idempotency_store,
+)
+from metrics import get_metrics
+from result_store import STATUS_FAILED, STATUS_SUCCEEDED, get_result_store
+from structured_logger import INFO, LazyJson, buffered, get_logger
+from task_model import DEFAULT_PRIORITY, Task, decode_task
+
+logger = get_logger("task_processor")
+metrics = get_metrics("task_processor")
 
 
 def process(event, context):
     """
     Lamda handler for SQS messages.
 
+    Failed records are reported through batchItemFailures (the
+    ReportBatchItemFailures contract) so only they are retried. For FIFO
+    queues every later record of a failed message group is reported too,
+    which keeps the group's ordering on redelivery.
+
+    With PROCESSOR_MAX_WORKERS above 1, different message groups run
+    concurrently while each group's records still run in order. Handlers may
+    be async; with PROCESSOR_EXECUTION_MODE=async they share one event loop.
+    Work still running when the Lambda is about to time out is cancelled and
+    reported as failed. Across groups, higher priority tasks start first
+    (PROCESSOR_SCHEDULING) and the queue-to-start latency per priority is
+    logged. With VISIBILITY_HEARTBEAT_SECONDS set, the batch's messages are
+    kept invisible while it runs. Each record's ingest-to-enqueue, queue wait
+    and processing times are recorded and logged with its trace ID. With
+    RESULT_STORE_BACKEND set, every task's outcome is written to the result
+    store in one write at the end of the invocation.
+
     Args:
         event (dict): The event data from SQS.
         context (object): The runtime information of the Lambda function.
 
     Returns:
-        dict: A response indicating success or failure.
+        dict: A response indicating success or failure, with batchItemFailures.
     """
 
-    print("Received event:", json.dumps(event, indent=2))
+    records = event["Records"]
+    # Each body is decoded once, up front. Records are dicts (unhashable), so
+    # their decoded tasks are looked up by id()
+    tasks = [_decode_record(record) for record in records]
+    tasks_by_record = {id(record): task for record, task in zip(records, tasks)}
+    # (processing_ms, trace, error) of each record that ran, by id()
+    outcomes = {}
+
+    deadline = get_deadline(context)
 
-    for record in event["Records"]:
+    with buffered():
+        logger.info("Received event: %d records", len(records))
+        logger.debug("Event: %s", LazyJson(event))
+
+        # Keeps slow batches from being redelivered while they still run
+        heartbeat = start_heartbeat(records, deadline)
         try:
-            message_body = json.loads(record["body"])
+            report = execute_batch(
+                records,
+                lambda record: _timed_process_record(
+                    record, tasks_by_record[id(record)], outcomes
+                ),
+                max_workers=get_max_workers(),
+                mode=get_execution_mode(),
+                task_timeout=get_task_timeout(),
+                deadline=deadline,
+                priorities=[
+                    task.priority if isinstance(task, Task) else DEFAULT_PRIORITY
+                    for task in tasks
+                ],
+                policy=get_scheduling_policy(),
+                weights=get_priority_weights(),
+            )
+        finally:
+            if heartbeat is not None:
+                heartbeat.stop()
+
+        if heartbeat is not None and heartbeat.beats:
+            logger.info(
+                "Visibility heartbeat",
+                beats=heartbeat.beats,
+                extended=heartbeat.extended,
+                failed=heartbeat.failed,
+            )
 
-            # Task details
-            task_id = message_body["task_id"]
-            task_type = message_body["task_type"]
-            description = message_body.get("description", "No description provided")
-            priority = message_body.get("priority", "normal")
-            created_at = message_body.get("created_at", datetime.utcnow().isoformat())
+        logger.info(
+            "Queue-to-start latency by priority",
+            start_latency=summarize_latencies(report.start_latencies),
+        )
 
-            print(f"Processing task {task_id}:")
+        if any(isinstance(task, Task) and task.claim_check for task in tasks):
+            # Counters are cumulative for the lifetime of the container
+            logger.info("Claim-check payloads", **claim_check_stats.snapshot())
 
-            process_task(task_id, task_type, description, priority, created_at)
+        _record_batch_metrics(tasks, report.failed_indexes)
+        _record_results(records, tasks, report.failed_indexes, outcomes)
 
-            print(f"Task {task_id} processed successfully.")
+    batch_item_failures = [
+        {"itemIdentifier": records[index].get("messageId")}
+        for index in report.failed_indexes
+    ]
 
-        except Exception as e:
-            print(f"Error processing task due to: {str(e)}")
-            raise
+    if batch_item_failures:
+        message = f"{len(batch_item_failures)} of {len(records)} tasks failed"
+    else:
+        message = "Tasks processed successfully"
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps(message),
+        "batchItemFailures": batch_item_failures,
+    }
 
-    return {"statusCode": 200, "body": json.dumps("Tasks processed successfully")}
 
+def _metric_dimensions(task) -> tuple:
+    if isinstance(task, Task):
+        return (task.priority, task.task_type)
+    return (DEFAULT_PRIORITY, "invalid")
 
-def process_task(task_id, task_type, description, priority, created_at):
+
+def _timed_process_record(record, task, outcomes: dict = None):
+    """
+    Runs _process_record, recording its duration as TaskDuration and logging
+    it with the record's trace (see _trace_record).
+
+    Args:
+        record (dict): The SQS record.
+        task (Task | Exception): The record's decoded task or decoding error.
+        outcomes (dict | None): Receives (processing_ms, trace, error) under
+            id(record) once the record is done.
+
+    Returns:
+        Awaitable | None: As _process_record.
+    """
+
+    trace = _trace_record(record, task)
+    started = time.perf_counter()
+    try:
+        result = _process_record(record, task)
+    except BaseException as e:
+        _record_duration(record, task, started, trace, outcomes, e)
+        raise
+
+    if result is not None and isinstance(result, Awaitable):
+        return _timed_awaitable(record, task, started, trace, outcomes, result)
+
+    _record_duration(record, task, started, trace, outcomes)
+    return result
+
+
+async def _timed_awaitable(record, task, started, trace, outcomes, awaitable):
+    try:
+        result = await awaitable
+    except BaseException as e:
+        # Also covers timeouts and deadline cancellation
+        _record_duration(record, task, started, trace, outcomes, e)
+        raise
+
+    _record_duration(record, task, started, trace, outcomes)
+    return result
+
+
+def _trace_record(record, task) -> dict:
+    """
+    Measures where a record's time went before its processing starts.
+
+    The API sends the TraceId and IngestedAt (epoch ms) message attributes;
+    SQS stamps SentTimestamp. Ingest-to-enqueue is the time from the request
+    reaching the API until SQS accepted the message, queue wait the time
+    from then until processing starts. Both are recorded as metrics
+    (IngestToEnqueue, QueueWait) and are None when an attribute is missing.
+
+    Args:
+        record (dict): The SQS record.
+        task (Task | Exception): The record's decoded task or decoding error.
+
+    Returns:
+        dict: trace_id, ingest_to_enqueue_ms and queue_wait_ms.
+    """
+
+    now_ms = time.time() * 1000
+    ingested_at = _message_attribute(record, "IngestedAt")
+    sent_at = record.get("attributes", {}).get("SentTimestamp")
+
+    ingest_to_enqueue_ms = queue_wait_ms = None
+    dimensions = _metric_dimensions(task)
+    try:
+        if sent_at is not None:
+            # Clocks of SQS and the API differ slightly, so waits are clamped
+            queue_wait_ms = max(0.0, round(now_ms - int(sent_at), 3))
+            metrics.timing("QueueWait", queue_wait_ms, dimensions)
+            if ingested_at is not None:
+                ingest_to_enqueue_ms = max(0, int(sent_at) - int(ingested_at))
+                metrics.timing("IngestToEnqueue", ingest_to_enqueue_ms, dimensions)
+    except ValueError:
+        logger.warning(
+            "Invalid trace timestamps on message %s", record.get("messageId")
+        )
+
+    return {
+        "trace_id": _message_attribute(record, "TraceId"),
+        "ingest_to_enqueue_ms": ingest_to_enqueue_ms,
+        "queue_wait_ms": queue_wait_ms,
+    }
+
+
+def _message_attribute(record, name: str):
+    attribute = (record.get("messageAttributes") or {}).get(name)
+    if not attribute:
+        return None
+    return attribute.get("stringValue")
+
+
+def _record_duration(
+    record, task, started, trace, outcomes=None, error: BaseException = None
+) -> None:
+    processing_ms = (time.perf_counter() - started) * 1000
+    metrics.timing("TaskDuration", processing_ms, _metric_dimensions(task))
+    if outcomes is not None:
+        outcomes[id(record)] = (processing_ms, trace, error)
+    logger.sampled(
+        INFO,
+        "Task timings",
+        task_id=task.task_id if isinstance(task, Task) else None,
+        processing_ms=round(processing_ms, 3),
+        **trace,
+    )
+
+
+def _record_batch_metrics(tasks: list, failed_indexes: list) -> None:
+    """
+    Counts processed and failed tasks, then flushes the batch's metrics.
+
+    Args:
+        tasks (list): Decoded tasks (or decoding errors) of the batch.
+        failed_indexes (list): Indexes of the records that failed.
+    """
+
+    failed = set(failed_indexes)
+    for index, task in enumerate(tasks):
+        metrics.count(
+            "TasksFailed" if index in failed else "TasksProcessed",
+            dimensions=_metric_dimensions(task),
+        )
+
+    metrics.count("BatchSize", len(tasks))
+    metrics.count("BatchFailures", len(failed))
+    metrics.flush()
+
+
+def _record_results(
+    records: list, tasks: list, failed_indexes: list, outcomes: dict
+) -> None:
+    """
+    Buffers every task's outcome in the result store and flushes it once.
+
+    A failed write is logged rather than raised, as the batch itself was
+    processed; its results are kept for the next flush.
+
+    Args:
+        records (list): The batch's SQS records.
+        tasks (list): Decoded tasks (or decoding errors) of the records.
+        failed_indexes (list): Indexes of the records that failed.
+        outcomes (dict): (processing_ms, trace, error) by id() of the records
+            that ran.
+    """
+
+    store = get_result_store()
+    if store is None:
+        return
+
+    failed = set(failed_indexes)
+    finished_at = time.time()
+
+    for index, (record, task) in enumerate(zip(records, tasks)):
+        processing_ms, trace, error = outcomes.get(id(record), (None, None, None))
+        is_task = isinstance(task, Task)
+
+        if index not in failed:
+            status, message = STATUS_SUCCEEDED, None
+        elif error is not None:
+            status, message = STATUS_FAILED, str(error) or type(error).__name__
+        else:
+            # Skipped behind a failed record of its group, or past the deadline
+            status, message = STATUS_FAILED, "Not processed"
+
+        store.record(
+            task_id=task.task_id if is_task else record.get("messageId"),
+            message_id=record.get("messageId"),
+            status=status,
+            task_type=task.task_type if is_task else None,
+            priority=task.priority if is_task else None,
+            attempts=int(
+                record.get("attributes", {}).get("ApproximateReceiveCount") or 1
+            ),
+            error=message,
+            queue_wait_ms=trace["queue_wait_ms"] if trace else None,
+            processing_ms=(
+                round(processing_ms, 3) if processing_ms is not None else None
+            ),
+            finished_at=finished_at,
+            trace_id=(
+                trace["trace_id"] if trace else _message_attribute(record, "TraceId")
+            ),
+        )
+
+    try:
+        store.flush()
+    except Exception as e:
+        logger.error("Failed to write task results: %s", e, pending=store.pending())
+
+
+def _decode_record(record):
+    """
+    Decodes a record's body into a Task, keeping the error of a bad record.
+
+    Args:
+        record (dict): The SQS record.
+
+    Returns:
+        Task | Exception: The task, or the error raised while decoding it.
+    """
+
+    try:
+        return decode_task(record["body"])
+    except Exception as e:
+        return e
+
+
+def _process_record(record, task=None):
+    """
+    Decodes a single SQS record and processes its task.
+
+    When an idempotency store is configured, a delivery of an already
+    completed task is skipped, and one whose task is still in progress
+    elsewhere fails so it is retried later.
+
+    Args:
+        record (dict): The SQS record.
+        task (Task | Exception | None): The record's decoded task or decoding
+            error, decoded here when not given.
+
+    Returns:
+        Awaitable | None: An awaitable completing the task for async handlers.
+
+    Raises:
+        Exception: Any decoding or processing error, so the caller can report
+            the record as failed.
+    """
+
+    if task is None:
+        task = _decode_record(record)
+    if isinstance(task, Exception):
+        raise task
+
+    if task.claim_check is not None:
+        # Claim-checked payloads are fetched and decompressed transparently
+        task.payload = decode_payload(task.claim_check)
+
+    task_id = task.task_id
+
+    # Duplicate deliveries of a completed task are skipped
+    idempotency_store = get_idempotency_store()
+    idempotency_key = task_id or record.get("messageId")
+
+    if idempotency_store is not None:
+        status = idempotency_store.begin(idempotency_key)
+
+        if status == STATUS_COMPLETED:
+            logger.sampled(INFO, "Skipping duplicate delivery of task %s.", task_id)
+            return None
+
+        if status == STATUS_IN_PROGRESS:
+            raise TaskInProgressError(f"Task {task_id} is already being processed")
+
+    logger.sampled(INFO, "Processing task %s:", task_id)
+
+    try:
+        result = process_task(
+            task_id,
+            task.task_type,
+            task.description,
+            task.priority,
+            task.created_at,
+            task.payload,
+        )
+
+    except Exception:
+        if idempotency_store is not None:
+            idempotency_store.release(idempotency_key)
+        raise
+
+    if result is not None and isinstance(result, Awaitable):
+        return _complete_async_task(task_id, result, idempotency_store, idempotency_key)
+
+    if idempotency_store is not None:
+        idempotency_store.complete(idempotency_key)
+
+    logger.sampled(INFO, "Task %s processed successfully.", task_id)
+
+
+async def _complete_async_task(task_id, awaitable, idempotency_store, idempotency_key):
+    try:
+        await awaitable
+
+    except BaseException:
+        # Also covers timeouts and deadline cancellation
+        if idempotency_store is not None:
+            idempotency_store.release(idempotency_key)
+        raise
+
+    if idempotency_store is not None:
+        idempotency_store.complete(idempotency_key)
+
+    logger.sampled(INFO, "Task %s processed successfully.", task_id)
+
+
+def process_task(task_id, task_type, description, priority, created_at, payload=None):
     """
     Process individual task based on its type.
 
+    The handler is looked up by (task_type, priority) in the frozen handler
+    registry; unknown combinations go to the default handler. Handlers may be
+    sync or async functions.
+
     Args:
         task_id (str): The unique identifier for the task.
         task_type (str): The type of the task.
         description (str): Description of the task.
         priority (str): Priority level of the task.
         created_at (str): Timestamp when the task was created.
+        payload (dict | None): The task's payload, already fetched when it
+            was offloaded to the claim-check store.
+
+    Returns:
+        Awaitable | None: The coroutine of an async handler, for the caller to
+            await.
     """
 
-    priority_function_map = {
-        "high": handle_high_priority_task,
-        "normal": handle_normal_priority_task,
-        "low": handle_low_priority_task,
-    }
+    function_to_call = registry.resolve(task_type, priority)
 
-    try:
-        function_to_call = priority_function_map.get(priority)
+    return function_to_call(task_id, task_type, description, created_at, payload)
 
-    except KeyError:
-        print(f"Unknown priority level: {priority}. Defaulting to normal.")
-        function_to_call = handle_normal_priority_task
 
-    function_to_call(task_id, task_type, description, created_at)
+@register_handler(priority="high")
+def handle_high_priority_task(
+    task_id, task_type, description, created_at, payload=None
+):
+    logger.sampled(
+        INFO,
+        "[HIGH PRIORITY] Handling task %s of type %s created at %s. Description: %s",
+        task_id,
+        task_type,
+        created_at,
+        description,
+    )
 
 
-def handle_high_priority_task(task_id, task_type, description, created_at):
-    print(
-        f"[HIGH PRIORITY] Handling task {task_id} of type {task_type} created at {created_at}. Description: {description}"
+@register_handler(priority="medium", default=True)
+def handle_medium_priority_task(
+    task_id, task_type, description, created_at, payload=None
+):
+    logger.sampled(
+        INFO,
+        "[MEDIUM PRIORITY] Handling task %s of type %s created at %s. Description: %s",
+        task_id,
+        task_type,
+        created_at,
+        description,
     )
 
 
-def handle_normal_priority_task(task_id, task_type, description, created_at):
-    print(
-        f"[NORMAL PRIORITY] Handling task {task_id} of type {task_type} created at {created_at}. Description: {description}"
+@register_handler(priority="low")
+def handle_low_priority_task(task_id, task_type, description, created_at, payload=None):
+    logger.sampled(
+        INFO,
+        "[LOW PRIORITY] Handling task %s of type %s created at %s. Description: %s",
+        task_id,
+        task_type,
+        created_at,
+        description,
     )
 
 
-def handle_low_priority_task(task_id, task_type, description, created_at):
-    print(
-        f"[LOW PRIORITY] Handling task {task_id} of type {task_type} created at {created_at}. Description: {description}"
-    )
+# Every handler above is registered, build the dispatch table once
+registry.freeze()
@@ -0,0 +1,133 @@
+import json
+from datetime import datetime
+
+try:
+    # Optional faster JSON backend, the stdlib is used when it is missing
+    import orjson
+
+    _loads = orjson.loads
+    _DECODE_ERRORS = (orjson.JSONDecodeError,)
+    JSON_BACKEND = "orjson"
+except ImportError:  # pragma: no cover - depends on the environment
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+    JSON_BACKEND = "json"
+
+DEFAULT_DESCRIPTION = "No description provided"
+DEFAULT_PRIORITY = "medium"
+# "normal" is what the API sent before the spec's "medium", still in flight
+PRIORITY_ALIASES = {"normal": "medium"}
+
+REQUIRED_FIELDS = ("task_id", "task_type")
+# Fields written by the API handler, accepted in place of the canonical ones
+FIELD_ALIASES = {"task_id": "id", "created_at": "timestamp"}
+STRING_FIELDS = ("task_id", "task_type", "description", "priority", "created_at")
+# Carries a compressed or offloaded payload, see claim_check.ENVELOPE_FIELD
+CLAIM_CHECK_FIELD = "payload_claim_check"
+
+
+class TaskSchemaError(ValueError):
+    """Raised when a message body is not a valid task."""
+
+
+class Task:
+    """A task decoded from an SQS message body."""
+
+    __slots__ = (
+        "task_id",
+        "task_type",
+        "description",
+        "priority",
+        "created_at",
+        "payload",
+        "claim_check",
+    )
+
+    def __init__(
+        self,
+        task_id: str,
+        task_type: str,
+        description: str = DEFAULT_DESCRIPTION,
+        priority: str = DEFAULT_PRIORITY,
+        created_at: str = None,
+        payload=None,
+        claim_check=None,
+    ):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.description = description
+        self.priority = priority
+        self.created_at = created_at
+        self.payload = payload
+        # The claim-check envelope of the payload, until it is fetched
+        self.claim_check = claim_check
+
+    def __repr__(self):
+        return (
+            f"Task(task_id={self.task_id!r}, task_type={self.task_type!r}, "
+            f"priority={self.priority!r})"
+        )
+
+
+def decode_task(body) -> Task:
+    """
+    Decodes an SQS message body into a Task in a single pass.
+
+    Every schema problem is collected and reported in one error. created_at
+    defaults to the current time only when the body does not carry it, and a
+    "normal" priority is read as "medium".
+
+    Args:
+        body (str | bytes): The JSON message body.
+
+    Returns:
+        Task: The decoded task.
+
+    Raises:
+        TaskSchemaError: When the body is not valid JSON or not a valid task.
+    """
+
+    try:
+        data = _loads(body)
+    except _DECODE_ERRORS as e:
+        raise TaskSchemaError(f"Invalid JSON in message body: {e}") from e
+
+    if not isinstance(data, dict):
+        raise TaskSchemaError("Message body must be a JSON object")
+
+    values = {}
+    errors = []
+
+    for field in STRING_FIELDS:
+        value = data.get(field)
+        if value is None and field in FIELD_ALIASES:
+            value = data.get(FIELD_ALIASES[field])
+
+        if value is None:
+            if field in REQUIRED_FIELDS:
+                errors.append(f"{field} is required")
+            continue
+
+        if not isinstance(value, str):
+            errors.append(f"{field} must be a string")
+            continue
+
+        values[field] = value
+
+    if errors:
+        raise TaskSchemaError("Invalid task: " + "; ".join(errors))
+
+    priority = values.get("priority", DEFAULT_PRIORITY)
+    created_at = values.get("created_at")
+    if created_at is None:
+        created_at = datetime.utcnow().isoformat()
+
+    return Task(
+        values["task_id"],
+        values["task_type"],
+        values.get("description", DEFAULT_DESCRIPTION),
+        PRIORITY_ALIASES.get(priority, priority),
+        created_at,
+        data.get("payload"),
+        data.get(CLAIM_CHECK_FIELD),
+    )
@@ -11,6 +11,8 @@ import pytest
 lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(lambda_root, "api_handler"))
 sys.path.insert(0, os.path.join(lambda_root, "task_processor"))
+# Shared layer modules (deployed under /opt/python in Lambda)
+sys.path.insert(0, os.path.join(lambda_root, "shared", "python"))
 
 
 @pytest.fixture(autouse=True)
@@ -25,6 +27,114 @@ def reset_env_vars():
     os.environ.update(original_env)
 
 
+@pytest.fixture(autouse=True)
+def reset_sqs_client_cache():
+    """
+    Fixture to drop pooled SQS clients after each test
+    This prevents a mocked client leaking into the next test
+    """
+    yield
+    import sqs_clients
+
+    sqs_clients.reset_sqs_clients()
+
+
+@pytest.fixture(autouse=True)
+def reset_api_key_store():
+    """
+    Fixture to drop the cached API key store after each test
+    This prevents keys loaded from one test's environment leaking into the next
+    """
+    yield
+    import auth
+
+    auth.reset_key_store()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """
+    Fixture to drop the rate limiter after each test
+    This prevents drained buckets leaking into the next test
+    """
+    yield
+    import rate_limit
+
+    rate_limit.reset_rate_limiter()
+
+
+@pytest.fixture(autouse=True)
+def reset_resilience():
+    """
+    Fixture to drop the SQS circuit breaker and its counters after each test
+    This prevents a breaker opened by one test failing the next
+    """
+    yield
+    import resilience
+
+    resilience.reset_resilience()
+
+
+@pytest.fixture(autouse=True)
+def reset_idempotency_store():
+    """
+    Fixture to drop the cached idempotency store after each test
+    This prevents completed task ids leaking into the next test
+    """
+    yield
+    import idempotency
+
+    idempotency.reset_idempotency_store()
+
+
+@pytest.fixture(autouse=True)
+def reset_result_store():
+    """
+    Fixture to drop the cached result store after each test
+    This prevents buffered results leaking into the next test
+    """
+    yield
+    import result_store
+
+    result_store.reset_result_store()
+
+
+@pytest.fixture(autouse=True)
+def reset_claim_check():
+    """
+    Fixture to drop the claim-check blob stores, cache and stats after each test
+    This prevents cached payloads leaking into the next test
+    """
+    yield
+    import claim_check
+
+    claim_check.reset_claim_check()
+
+
+@pytest.fixture(autouse=True)
+def reset_sqs_emulator():
+    """
+    Fixture to drop the in-memory SQS emulator after each test
+    This prevents queued messages leaking into the next test
+    """
+    yield
+    import sqs_emulator
+
+    sqs_emulator.reset_emulator()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """
+    Fixture to drop the cached metrics after each test
+    This prevents unflushed values leaking into the next test
+    """
+    yield
+    import metrics
+
+    metrics.reset_metrics()
+
+
 @pytest.fixture
 def mock_env_local():
     """Fixture providing local environment variables"""
@@ -1,14 +1,15 @@
 import json
 import os
 import sys
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import ANY, MagicMock, call, patch
 
 import pytest
 
 # Add the lambda directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_handler"))
 
-from handler import (_get_data_from_body, get_sqs_client, main,
+from handler import (_get_data_from_body, _resolve_message_group_id,
+                     get_sqs_client, main, trace_attributes,
                      validate_api_token)
 
 
@@ -41,6 +42,13 @@ class TestValidateApiToken:
             # Test mixed case
             assert validate_api_token({"X-API-KEY": "valid-token"}) is True
 
+    def test_invalid_token_does_not_log_expected_token(self, capsys):
+        """Test that the configured token never ends up in the logs"""
+        with patch.dict(os.environ, {"API_TOKEN": "secret-token"}):
+            validate_api_token({"X-Api-Key": "wrong-token"})
+
+        assert "secret-token" not in capsys.readouterr().out
+
     def test_validation_fails_when_api_token_not_configured(self):
         """Test that validation fails when API_TOKEN env var is not set"""
         with patch.dict(os.environ, {}, clear=True):
@@ -51,7 +59,7 @@ class TestValidateApiToken:
 class TestGetSqsClient:
     """Tests for the get_sqs_client function"""
 
-    @patch("handler.boto3.client")
+    @patch("sqs_clients.boto3.client")
     def test_local_environment_uses_localstack_endpoint(self, mock_boto_client):
         """Test that local environment configures LocalStack endpoint"""
         with patch.dict(
@@ -60,10 +68,10 @@ class TestGetSqsClient:
         ):
             get_sqs_client()
             mock_boto_client.assert_called_once_with(
-                "sqs", endpoint_url="http://localstack:4566"
+                "sqs", endpoint_url="http://localstack:4566", config=ANY
             )
 
-    @patch("handler.boto3.client")
+    @patch("sqs_clients.boto3.client")
     def test_staging_environment_uses_aws_config(self, mock_boto_client):
         """Test that staging environment uses AWS credentials"""
         with patch.dict(
@@ -83,9 +91,10 @@ class TestGetSqsClient:
                 region_name="us-east-1",
                 aws_access_key_id="test-key",
                 aws_secret_access_key="test-secret",
+                config=ANY,
             )
 
-    @patch("handler.boto3.client")
+    @patch("sqs_clients.boto3.client")
     def test_production_environment_uses_aws_config(self, mock_boto_client):
         """Test that production environment uses AWS credentials"""
         with patch.dict(
@@ -105,8 +114,88 @@ class TestGetSqsClient:
                 region_name="us-west-2",
                 aws_access_key_id="prod-key",
                 aws_secret_access_key="prod-secret",
+                config=ANY,
             )
 
+    @patch("sqs_clients.boto3.client")
+    def test_client_is_reused_across_invocations(self, mock_boto_client):
+        """Test that warm invocations reuse the pooled client"""
+        with patch.dict(
+            os.environ,
+            {"ENVIRONMENT": "local", "LOCALSTACK_ENDPOINT": "http://localstack:4566"},
+        ):
+            first = get_sqs_client()
+            second = get_sqs_client()
+
+            assert first is second
+            mock_boto_client.assert_called_once()
+
+    @patch("sqs_clients.boto3.client")
+    def test_client_is_rebuilt_when_credentials_rotate(self, mock_boto_client):
+        """Test that a changed configuration rebuilds the client"""
+        mock_boto_client.side_effect = [MagicMock(), MagicMock()]
+        env = {
+            "ENVIRONMENT": "production",
+            "AWS_SQS_ENDPOINT_URL": "https://sqs.us-east-1.amazonaws.com",
+            "AWS_REGION": "us-east-1",
+            "AWS_ACCESS_KEY_ID": "old-key",
+            "AWS_SECRET_ACCESS_KEY": "old-secret",
+        }
+        with patch.dict(os.environ, env):
+            first = get_sqs_client()
+
+        env.update(
+            {"AWS_ACCESS_KEY_ID": "new-key", "AWS_SECRET_ACCESS_KEY": "new-secret"}
+        )
+        with patch.dict(os.environ, env):
+            second = get_sqs_client()
+            assert get_sqs_client() is second
+
+        assert first is not second
+        assert mock_boto_client.call_count == 2
+        assert mock_boto_client.call_args[1]["aws_access_key_id"] == "new-key"
+
+    @patch("sqs_clients.boto3.client")
+    def test_pool_settings_are_applied(self, mock_boto_client):
+        """Test that pool size and keep-alive tuning reach botocore"""
+        with patch.dict(
+            os.environ,
+            {
+                "ENVIRONMENT": "local",
+                "SQS_MAX_POOL_CONNECTIONS": "25",
+                "SQS_TCP_KEEPALIVE": "true",
+            },
+        ):
+            get_sqs_client()
+
+            config = mock_boto_client.call_args[1]["config"]
+            assert config.max_pool_connections == 25
+            assert config.tcp_keepalive is True
+
+    @patch("sqs_clients.boto3.client")
+    def test_client_rate_limits_adaptively(self, mock_boto_client):
+        """Test that botocore rate limits adaptively and leaves retries to us"""
+        with patch.dict(os.environ, {"ENVIRONMENT": "local"}):
+            get_sqs_client()
+
+            config = mock_boto_client.call_args[1]["config"]
+            assert config.retries == {"mode": "adaptive", "total_max_attempts": 1}
+
+    @patch("sqs_clients.boto3.client")
+    def test_attempts_are_bounded_by_the_budget(self, mock_boto_client):
+        """Test that connect and read timeouts split the call budget"""
+        env = {
+            "ENVIRONMENT": "local",
+            "SQS_CALL_BUDGET_MS": "3000",
+            "SQS_MAX_ATTEMPTS": "3",
+        }
+        with patch.dict(os.environ, env):
+            get_sqs_client()
+
+            config = mock_boto_client.call_args[1]["config"]
+            assert config.connect_timeout == 0.5
+            assert config.read_timeout == 0.5
+
 
 class TestGetDataFromBody:
     """Tests for the _get_data_from_body function"""
@@ -118,10 +207,15 @@ class TestGetDataFromBody:
         assert result["payload"] == {"key": "value"}
 
     def test_uses_default_priority_when_missing(self):
-        """Test that default priority is 'normal' when not provided"""
+        """Test that default priority is 'medium' when not provided"""
         body = {"payload": {}, "description": "test"}
         result = _get_data_from_body(body)
-        assert result["priority"] == "normal"
+        assert result["priority"] == "medium"
+
+    def test_uses_default_task_type_when_missing(self):
+        """Test that tasks without a task_type get the default one"""
+        assert _get_data_from_body({})["task_type"] == "default"
+        assert _get_data_from_body({"task_type": "email"})["task_type"] == "email"
 
     def test_uses_empty_string_for_missing_description(self):
         """Test that description defaults to empty string"""
@@ -138,6 +232,63 @@ class TestGetDataFromBody:
         assert len(result["id"]) > 0
         assert len(result["timestamp"]) > 0
 
+    def test_uses_the_given_task_id(self):
+        """Test that the task id returned to the client is sent as the id"""
+        assert _get_data_from_body({"title": "t"}, "task-1")["id"] == "task-1"
+
+
+class TestResolveMessageGroupId:
+    """Tests for the _resolve_message_group_id function"""
+
+    def test_defaults_to_tasks_group_without_key(self):
+        """Test that tasks without an ordering key share the default group"""
+        assert _resolve_message_group_id({"description": "test"}) == "tasks"
+
+    def test_uses_ordering_key_from_body(self):
+        """Test that the ordering key becomes the MessageGroupId"""
+        assert _resolve_message_group_id({"ordering_key": "tenant-42"}) == "tenant-42"
+
+    def test_uses_configured_field_path(self):
+        """Test that a dotted field path is resolved against the body"""
+        with patch.dict(os.environ, {"ORDERING_KEY_FIELD": "payload.tenant_id"}):
+            body = {"payload": {"tenant_id": "acme"}}
+            assert _resolve_message_group_id(body) == "acme"
+            assert _resolve_message_group_id({"payload": "flat"}) == "tasks"
+
+    def test_hashes_keys_into_shards(self):
+        """Test that keys are hashed into a stable, bounded set of groups"""
+        with patch.dict(os.environ, {"ORDERING_KEY_SHARDS": "4"}):
+            groups = {
+                _resolve_message_group_id({"ordering_key": f"tenant-{i}"})
+                for i in range(100)
+            }
+            assert groups <= {"tasks-0", "tasks-1", "tasks-2", "tasks-3"}
+            assert _resolve_message_group_id(
+                {"ordering_key": "tenant-1"}
+            ) == _resolve_message_group_id({"ordering_key": "tenant-1"})
+
+    @pytest.mark.parametrize("shards", ["four", "-2", "1.5"])
+    def test_invalid_shard_counts_are_ignored(self, shards, capsys):
+        """Test that a bad ORDERING_KEY_SHARDS turns sharding off with one warning"""
+        with patch.dict(os.environ, {"ORDERING_KEY_SHARDS": shards}):
+            assert _resolve_message_group_id({"ordering_key": "tenant-1"}) == (
+                "tenant-1"
+            )
+            assert _resolve_message_group_id({"ordering_key": "tenant-2"}) == (
+                "tenant-2"
+            )
+
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line)["message"] for line in lines] == [
+            f"Ignoring ORDERING_KEY_SHARDS {shards}"
+        ]
+
+    def test_invalid_group_characters_are_hashed(self):
+        """Test that keys SQS would reject are mapped to a valid group id"""
+        group_id = _resolve_message_group_id({"ordering_key": "tenant with spaces"})
+        assert group_id.startswith("key-")
+        assert " " not in group_id
+
 
 class TestMainHandler:
     """Tests for the main Lambda handler function"""
@@ -228,9 +379,11 @@ class TestMainHandler:
                 "headers": {"X-Api-Key": "valid-token"},
                 "body": json.dumps(
                     {
+                        "title": "Full",
                         "payload": {"data": "test"},
                         "priority": "low",
                         "description": "Full test",
+                        "due_date": "2025-12-01T09:00:00Z",
                     }
                 ),
             }
@@ -242,15 +395,32 @@ class TestMainHandler:
             call_args = mock_sqs.send_message.call_args
             message_body = json.loads(call_args[1]["MessageBody"])
 
+            assert message_body["title"] == "Full"
             assert message_body["priority"] == "low"
             assert message_body["description"] == "Full test"
+            assert message_body["due_date"] == "2025-12-01T09:00:00Z"
             assert message_body["payload"] == {"data": "test"}
             assert "id" in message_body
             assert "timestamp" in message_body
 
     @patch("handler.get_sqs_client")
-    def test_empty_body_uses_defaults(self, mock_get_sqs):
-        """Test that empty body still works with default values"""
+    def test_ordering_key_sets_message_group(self, mock_get_sqs):
+        """Test that the request's ordering key is sent as MessageGroupId"""
+        mock_sqs = MagicMock()
+        mock_get_sqs.return_value = mock_sqs
+
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            event = {
+                "headers": {"X-Api-Key": "valid-token"},
+                "body": json.dumps({"title": "Test", "ordering_key": "tenant-7"}),
+            }
+            main(event, None)
+
+        assert mock_sqs.send_message.call_args[1]["MessageGroupId"] == "tenant-7"
+
+    @patch("handler.get_sqs_client")
+    def test_title_only_body_uses_defaults(self, mock_get_sqs):
+        """Test that a body with only a title works with default values"""
         mock_sqs = MagicMock()
         mock_get_sqs.return_value = mock_sqs
 
@@ -261,7 +431,10 @@ class TestMainHandler:
                 "QUEUE_URL": "http://localhost:4566/000000000000/test-queue.fifo",
             },
         ):
-            event = {"headers": {"X-Api-Key": "valid-token"}, "body": json.dumps({})}
+            event = {
+                "headers": {"X-Api-Key": "valid-token"},
+                "body": json.dumps({"title": "Test"}),
+            }
             result = main(event, None)
 
             assert result["statusCode"] == 200
@@ -270,6 +443,186 @@ class TestMainHandler:
             call_args = mock_sqs.send_message.call_args
             message_body = json.loads(call_args[1]["MessageBody"])
 
-            assert message_body["priority"] == "normal"
+            assert message_body["priority"] == "medium"
             assert message_body["description"] == ""
             assert message_body["payload"] == {}
+
+
+class TestTaskValidation:
+    """Tests for rejecting invalid tasks in the API handler"""
+
+    @patch("handler.get_sqs_client")
+    def test_every_field_error_is_reported(self, mock_get_sqs):
+        """Test that one 400 lists the errors of every invalid field"""
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token"}):
+            event = {
+                "headers": {"X-Api-Key": "valid-token"},
+                "body": json.dumps(
+                    {"priority": "urgent", "due_date": "next week", "payload": "x"}
+                ),
+            }
+            result = main(event, None)
+
+        assert result["statusCode"] == 400
+        body = json.loads(result["body"])
+        assert body["message"] == "Invalid task"
+        assert [error["field"] for error in body["errors"]] == [
+            "title",
+            "due_date",
+            "priority",
+            "payload",
+        ]
+        mock_get_sqs.assert_not_called()
+
+    @patch("handler.get_sqs_client")
+    def test_normal_priority_is_sent_as_medium(self, mock_get_sqs):
+        """Test that the former normal priority is accepted as medium"""
+        mock_sqs = MagicMock()
+        mock_get_sqs.return_value = mock_sqs
+
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            event = {
+                "headers": {"X-Api-Key": "valid-token"},
+                "body": json.dumps({"title": "Test", "priority": "normal"}),
+            }
+            main(event, None)
+
+        message_body = json.loads(mock_sqs.send_message.call_args[1]["MessageBody"])
+        assert message_body["priority"] == "medium"
+
+
+class TestBatchHandler:
+    """Tests for the POST /tasks/batch endpoint"""
+
+    def _batch_event(self, tasks):
+        return {
+            "resource": "/tasks/batch",
+            "headers": {"X-Api-Key": "valid-token"},
+            "body": json.dumps(tasks),
+        }
+
+    @patch("handler.get_sqs_client")
+    def test_batch_is_chunked_into_groups_of_ten(self, mock_get_sqs):
+        """Test that 25 tasks are sent with three send_message_batch calls"""
+        mock_sqs = MagicMock()
+        mock_sqs.send_message_batch.return_value = {"Successful": [], "Failed": []}
+        mock_get_sqs.return_value = mock_sqs
+
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            tasks = [{"title": f"task {i}"} for i in range(25)]
+            result = main(self._batch_event(tasks), None)
+
+        assert result["statusCode"] == 200
+        body = json.loads(result["body"])
+        assert body["succeeded"] == 25
+        assert len({item["task_id"] for item in body["results"]}) == 25
+
+        chunk_sizes = [
+            len(c[1]["Entries"]) for c in mock_sqs.send_message_batch.call_args_list
+        ]
+        assert chunk_sizes == [10, 10, 5]
+        mock_sqs.send_message.assert_not_called()
+
+    @patch("handler.get_sqs_client")
+    def test_batch_reports_per_item_failures(self, mock_get_sqs):
+        """Test that SQS and validation failures are reported per item"""
+        mock_sqs = MagicMock()
+        mock_sqs.send_message_batch.return_value = {
+            "Successful": [{"Id": "0"}],
+            "Failed": [{"Id": "2", "Code": "InternalError", "Message": "boom"}],
+        }
+        mock_get_sqs.return_value = mock_sqs
+
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            tasks = [{"title": "ok"}, "not-a-task", {"title": "fails"}]
+            result = main(self._batch_event(tasks), None)
+
+        assert result["statusCode"] == 207
+        results = json.loads(result["body"])["results"]
+        assert [item["status"] for item in results] == ["queued", "failed", "failed"]
+        assert "task_id" in results[0]
+        assert results[1]["errors"] == [
+            {"field": None, "message": "must be a JSON object"}
+        ]
+        assert results[2]["error"] == "boom"
+
+    @patch("handler.get_sqs_client")
+    def test_batch_of_invalid_tasks_answers_400(self, mock_get_sqs):
+        """Test that a batch where no task is valid is not sent"""
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            tasks = [{"title": "ok", "priority": "urgent"}, {"description": "x"}]
+            result = main(self._batch_event(tasks), None)
+
+        assert result["statusCode"] == 400
+        results = json.loads(result["body"])["results"]
+        assert results[0]["errors"][0]["field"] == "priority"
+        assert results[1]["errors"][0]["field"] == "title"
+        mock_get_sqs.return_value.send_message_batch.assert_not_called()
+
+    @patch("handler.get_sqs_client")
+    def test_batch_tasks_share_the_request_trace(self, mock_get_sqs):
+        """Test that every entry of a batch carries the request's trace"""
+        mock_sqs = MagicMock()
+        mock_sqs.send_message_batch.return_value = {"Successful": [], "Failed": []}
+        mock_get_sqs.return_value = mock_sqs
+        event = self._batch_event([{"title": "a"}, {"title": "b"}])
+        event["headers"]["X-Trace-Id"] = "trace-1"
+
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            main(event, None)
+
+        entries = mock_sqs.send_message_batch.call_args[1]["Entries"]
+        assert [
+            entry["MessageAttributes"]["TraceId"]["StringValue"] for entry in entries
+        ] == ["trace-1", "trace-1"]
+
+    @patch("handler.get_sqs_client")
+    def test_batch_rejects_non_array_body(self, mock_get_sqs):
+        """Test that a non-array body returns 400 without calling SQS"""
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token"}):
+            result = main(self._batch_event({"description": "single"}), None)
+
+        assert result["statusCode"] == 400
+        mock_get_sqs.assert_not_called()
+
+
+class TestTraceAttributes:
+    """Tests for the trace_attributes function"""
+
+    def test_uses_trace_header_and_request_time(self):
+        """Test that the trace ID and ingest time come from the request"""
+        event = {
+            "headers": {"X-Amzn-Trace-Id": "Root=1-abc"},
+            "requestContext": {"requestTimeEpoch": 1700000000123},
+        }
+
+        attributes = trace_attributes(event)
+
+        assert attributes == {
+            "TraceId": {"DataType": "String", "StringValue": "Root=1-abc"},
+            "IngestedAt": {"DataType": "Number", "StringValue": "1700000000123"},
+        }
+
+    def test_generates_missing_values(self):
+        """Test that a trace ID is generated and the receive time is used"""
+        attributes = trace_attributes({"headers": {}}, received_at=1700000000.5)
+
+        assert len(attributes["TraceId"]["StringValue"]) == 32
+        assert attributes["IngestedAt"]["StringValue"] == "1700000000500"
+
+    @patch("handler.get_sqs_client")
+    def test_single_task_is_sent_with_trace(self, mock_get_sqs):
+        """Test that send_message carries the trace attributes"""
+        mock_sqs = MagicMock()
+        mock_get_sqs.return_value = mock_sqs
+        event = {
+            "headers": {"x-api-key": "valid-token", "x-trace-id": "trace-1"},
+            "body": json.dumps({"title": "Test"}),
+        }
+
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            main(event, None)
+
+        attributes = mock_sqs.send_message.call_args[1]["MessageAttributes"]
+        assert attributes["TraceId"]["StringValue"] == "trace-1"
+        assert attributes["IngestedAt"]["DataType"] == "Number"
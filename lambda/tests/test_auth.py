@@ -0,0 +1,199 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_handler"))
+
+from auth import (MAX_API_KEY_LENGTH, ApiKeyStore, EnvKeySource, FileKeySource,
+                  authenticate, get_api_key, get_key_store)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StaticKeySource:
+    """Key source returning fixed keys and counting loads"""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return dict(self.keys)
+
+
+class TestGetApiKey:
+    """Tests for the get_api_key function"""
+
+    @pytest.mark.parametrize("name", ["x-api-key", "X-Api-Key", "X-API-KEY", "x-API-key"])
+    def test_header_name_is_case_insensitive(self, name):
+        """Test that any spelling of the header is found"""
+        assert get_api_key({"Content-Type": "application/json", name: "key"}) == "key"
+
+    def test_missing_header(self):
+        """Test that missing headers yield None"""
+        assert get_api_key({"Content-Type": "application/json"}) is None
+        assert get_api_key(None) is None
+
+
+class TestKeySources:
+    """Tests for the environment and file key sources"""
+
+    def test_env_source_reads_token_and_keys(self):
+        """Test that API_TOKEN and API_KEYS are both loaded"""
+        env = {"API_TOKEN": "legacy", "API_KEYS": "acme:k1, acme:k2,globex:k3"}
+        with patch.dict(os.environ, env):
+            keys = EnvKeySource().load()
+
+        assert keys == {"legacy": "default", "k1": "acme", "k2": "acme", "k3": "globex"}
+
+    def test_file_source_reads_clients(self, tmp_path):
+        """Test that a client may have one key or a list of keys"""
+        path = tmp_path / "keys.json"
+        path.write_text(json.dumps({"acme": ["k1", "k2"], "globex": "k3"}))
+
+        keys = FileKeySource(str(path)).load()
+
+        assert keys == {"k1": "acme", "k2": "acme", "k3": "globex"}
+
+
+class TestApiKeyStore:
+    """Tests for the ApiKeyStore class"""
+
+    def test_authenticates_known_keys(self):
+        """Test that keys map to their client ids"""
+        store = ApiKeyStore(StaticKeySource({"k1": "acme", "k2": "globex"}))
+
+        assert store.authenticate("k1") == "acme"
+        assert store.authenticate("k2") == "globex"
+        assert store.authenticate("k3") is None
+
+    def test_keys_are_not_kept_in_clear(self):
+        """Test that only digests of the keys are stored"""
+        store = ApiKeyStore(StaticKeySource({"secret-key": "acme"}))
+        store.refresh()
+
+        assert "secret-key" not in repr(store._digests)
+
+    def test_keys_are_loaded_once_per_refresh_interval(self):
+        """Test that the source is only read again after the TTL"""
+        clock = FakeClock()
+        source = StaticKeySource({"k1": "acme"})
+        store = ApiKeyStore(source, refresh_seconds=60, clock=clock)
+
+        for _ in range(10):
+            store.authenticate("k1")
+        assert source.loads == 1
+
+        clock.now += 61
+        source.keys = {"k2": "acme"}
+
+        assert store.authenticate("k2") == "acme"
+        assert store.authenticate("k1") is None
+        assert source.loads == 2
+
+    def test_failed_refresh_keeps_old_keys(self):
+        """Test that keys survive a source that fails to load"""
+        clock = FakeClock()
+        source = StaticKeySource({"k1": "acme"})
+        store = ApiKeyStore(source, refresh_seconds=60, clock=clock)
+        store.authenticate("k1")
+
+        clock.now += 61
+        with patch.object(source, "load", side_effect=OSError("unreadable")):
+            assert store.authenticate("k1") == "acme"
+
+    def test_rejected_keys_are_remembered_by_digest(self):
+        """Test that a repeated bad key is flagged without keeping it in clear"""
+        clock = FakeClock()
+        store = ApiKeyStore(
+            StaticKeySource({"k1": "acme"}), negative_cache_seconds=5, clock=clock
+        )
+
+        assert store.check("bad-key") == (None, False)
+        assert store.check("bad-key") == (None, True)
+        assert "bad-key" not in repr(store._negative)
+
+        clock.now += 6
+        assert store.check("bad-key") == (None, False)
+
+    def test_over_long_keys_are_not_hashed_or_cached(self):
+        """Test that keys above MAX_API_KEY_LENGTH are rejected up front"""
+        long_key = "k" * (MAX_API_KEY_LENGTH + 1)
+        store = ApiKeyStore(StaticKeySource({long_key: "acme"}))
+        store.refresh()
+
+        with patch("auth._digest") as mock_digest:
+            assert store.check(long_key) == (None, False)
+        mock_digest.assert_not_called()
+        assert not store._negative
+
+    def test_refresh_clears_rejected_keys(self):
+        """Test that a newly added key is accepted after the next refresh"""
+        clock = FakeClock()
+        source = StaticKeySource({})
+        store = ApiKeyStore(source, refresh_seconds=1, clock=clock)
+        assert store.authenticate("new") is None
+
+        source.keys = {"new": "acme"}
+        clock.now += 2
+
+        assert store.authenticate("new") == "acme"
+
+
+class TestAuthenticate:
+    """Tests for the authenticate function"""
+
+    def test_returns_client_id(self):
+        """Test that the client of a valid key is returned"""
+        with patch.dict(os.environ, {"API_KEYS": "acme:k1"}):
+            assert authenticate({"X-Api-Key": "k1"}) == "acme"
+
+    def test_uses_file_source(self, tmp_path):
+        """Test that API_KEYS_SOURCE=file reads API_KEYS_FILE"""
+        path = tmp_path / "keys.json"
+        path.write_text(json.dumps({"acme": "k1"}))
+        env = {"API_KEYS_SOURCE": "file", "API_KEYS_FILE": str(path)}
+
+        with patch.dict(os.environ, env):
+            assert authenticate({"x-api-key": "k1"}) == "acme"
+
+    def test_store_is_rebuilt_when_configuration_changes(self, tmp_path):
+        """Test that switching the source builds a new store"""
+        with patch.dict(os.environ, {"API_TOKEN": "t"}):
+            env_store = get_key_store()
+            assert get_key_store() is env_store
+
+        path = tmp_path / "keys.json"
+        path.write_text("{}")
+        with patch.dict(
+            os.environ, {"API_KEYS_SOURCE": "file", "API_KEYS_FILE": str(path)}
+        ):
+            assert get_key_store() is not env_store
+
+    def test_repeated_bad_key_is_logged_once(self, capsys):
+        """Test that a flood of the same bad key logs a single warning"""
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token"}):
+            for _ in range(5):
+                assert authenticate({"x-api-key": "wrong"}) is None
+
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line)["message"] for line in lines] == ["Invalid API token"]
+
+    def test_unknown_source(self):
+        """Test that an unknown API_KEYS_SOURCE is rejected"""
+        with patch.dict(os.environ, {"API_KEYS_SOURCE": "vault"}):
+            with pytest.raises(ValueError, match="Unknown API key source"):
+                get_key_store()
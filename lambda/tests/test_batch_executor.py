@@ -0,0 +1,312 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from batch_executor import (PriorityScheduler, execute_batch, get_deadline,
+                            get_max_workers, get_priority_weights,
+                            partition_by_group, run_batch, summarize_latencies)
+
+
+def _record(message_id, group_id=None):
+    """Builds a minimal SQS record"""
+    record = {"messageId": message_id, "attributes": {}}
+    if group_id is not None:
+        record["attributes"]["MessageGroupId"] = group_id
+    return record
+
+
+class TestPartitionByGroup:
+    """Tests for the partition_by_group function"""
+
+    def test_groups_records_in_first_seen_order(self):
+        """Test that records are grouped and keep their relative order"""
+        records = [
+            _record("1", "a"),
+            _record("2", "b"),
+            _record("3", "a"),
+            _record("4", "b"),
+        ]
+
+        partitions = partition_by_group(records)
+
+        assert [[index for index, _ in p] for p in partitions] == [[0, 2], [1, 3]]
+
+    def test_records_without_group_are_independent(self):
+        """Test that standard queue records each get their own partition"""
+        partitions = partition_by_group([_record("1"), _record("2")])
+
+        assert len(partitions) == 2
+
+
+class TestRunGroup:
+    """Tests for the sequential execution of a single message group"""
+
+    def test_stops_at_first_failure(self):
+        """Test that records after a failure are reported, not processed"""
+        processed = []
+
+        def process_record(record):
+            processed.append(record["messageId"])
+            if record["messageId"] == "2":
+                raise ValueError("boom")
+
+        records = [_record("1", "a"), _record("2", "a"), _record("3", "a")]
+
+        assert run_batch(records, process_record) == [1, 2]
+        assert processed == ["1", "2"]
+
+
+class TestRunBatch:
+    """Tests for the run_batch function"""
+
+    def test_groups_run_concurrently_with_workers(self):
+        """Test that different groups overlap when workers are available"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def process_record(record):
+            # Deadlocks (and times out) unless both groups run at once
+            barrier.wait()
+
+        records = [_record("1", "a"), _record("2", "b")]
+
+        assert run_batch(records, process_record, max_workers=2) == []
+
+    def test_order_is_kept_within_a_group(self):
+        """Test that a group's records run in order under concurrency"""
+        processed = {"a": [], "b": []}
+
+        def process_record(record):
+            time.sleep(0.001)
+            processed[record["attributes"]["MessageGroupId"]].append(
+                record["messageId"]
+            )
+
+        records = [_record(str(i), "a" if i % 2 else "b") for i in range(20)]
+        run_batch(records, process_record, max_workers=4)
+
+        assert processed["a"] == [str(i) for i in range(1, 20, 2)]
+        assert processed["b"] == [str(i) for i in range(0, 20, 2)]
+
+    def test_failures_are_merged_in_batch_order(self):
+        """Test that failed indexes from all groups are merged and sorted"""
+
+        def process_record(record):
+            if record["messageId"] in ("2", "3"):
+                raise ValueError("boom")
+
+        records = [
+            _record("1", "a"),
+            _record("2", "b"),
+            _record("3", "a"),
+            _record("4", "b"),
+            _record("5", "c"),
+        ]
+
+        assert run_batch(records, process_record, max_workers=3) == [1, 2, 3]
+
+    def test_max_workers_is_read_from_environment(self):
+        """Test that PROCESSOR_MAX_WORKERS configures the worker count"""
+        with patch.dict(os.environ, {"PROCESSOR_MAX_WORKERS": "8"}):
+            assert get_max_workers() == 8
+        with patch.dict(os.environ, {"PROCESSOR_MAX_WORKERS": "0"}):
+            assert get_max_workers() == 1
+
+
+class TestAsyncExecution:
+    """Tests for async handlers, timeouts and deadline cancellation"""
+
+    def test_async_handler_is_awaited_in_thread_mode(self):
+        """Test that awaitables returned by handlers are driven to completion"""
+        completed = []
+
+        async def handle(message_id):
+            await asyncio.sleep(0)
+            completed.append(message_id)
+
+        records = [_record("1", "a"), _record("2", "b")]
+        run_batch(records, lambda r: handle(r["messageId"]), max_workers=2)
+
+        assert sorted(completed) == ["1", "2"]
+
+    def test_groups_share_one_event_loop_in_async_mode(self):
+        """Test that async handlers of different groups overlap on the loop"""
+        started = []
+
+        async def handle(record):
+            started.append(record["messageId"])
+            # Both groups must be in flight before either can finish
+            while len(started) < 2:
+                await asyncio.sleep(0.001)
+
+        records = [_record("1", "a"), _record("2", "b")]
+        failed = run_batch(records, handle, max_workers=2, mode="async", task_timeout=2)
+
+        assert failed == []
+
+    def test_sync_handlers_work_in_async_mode(self):
+        """Test that sync handlers keep working unchanged in async mode"""
+        processed = []
+
+        records = [_record("1", "a"), _record("2", "a")]
+        run_batch(records, lambda r: processed.append(r["messageId"]), mode="async")
+
+        assert processed == ["1", "2"]
+
+    def test_timed_out_task_fails_its_group(self):
+        """Test that a task over TASK_TIMEOUT_SECONDS fails with later records"""
+
+        async def handle(record):
+            if record["messageId"] == "1":
+                await asyncio.sleep(5)
+
+        records = [_record("1", "a"), _record("2", "a"), _record("3", "b")]
+        failed = run_batch(
+            records, handle, max_workers=2, mode="async", task_timeout=0.05
+        )
+
+        assert failed == [0, 1]
+
+    def test_running_tasks_are_cancelled_at_deadline(self):
+        """Test that work still running at the deadline is reported as failed"""
+
+        async def handle(record):
+            await asyncio.sleep(5)
+
+        deadline = time.monotonic() + 0.05
+        failed = run_batch(
+            [_record("1", "a"), _record("2", "a")],
+            handle,
+            mode="async",
+            deadline=deadline,
+        )
+
+        assert failed == [0, 1]
+
+    def test_no_record_starts_after_deadline(self):
+        """Test that sequential execution stops once the deadline has passed"""
+        processed = []
+
+        failed = run_batch(
+            [_record("1"), _record("2")],
+            lambda r: processed.append(r),
+            deadline=time.monotonic() - 1,
+        )
+
+        assert failed == [0, 1]
+        assert processed == []
+
+    def test_deadline_is_derived_from_lambda_context(self):
+        """Test that the deadline keeps a safety margin from the remaining time"""
+
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 10000
+
+        with patch.dict(os.environ, {"PROCESSOR_DEADLINE_MARGIN_MS": "2000"}):
+            deadline = get_deadline(Context())
+
+        assert 7.9 < deadline - time.monotonic() <= 8.0
+        assert get_deadline(None) is None
+
+
+class TestPriorityScheduling:
+    """Tests for priority-aware scheduling across message groups"""
+
+    def _started_order(self, records, priorities, **options):
+        started = []
+        execute_batch(
+            records,
+            lambda record: started.append(record["messageId"]),
+            priorities=priorities,
+            **options,
+        )
+        return started
+
+    def test_strict_policy_starts_high_priority_first(self):
+        """Test that high priority groups run before low priority ones"""
+        records = [_record("low", "a"), _record("medium", "b"), _record("high", "c")]
+
+        started = self._started_order(
+            records, ["low", "medium", "high"], policy="strict"
+        )
+
+        assert started == ["high", "medium", "low"]
+
+    def test_order_within_group_beats_priority(self):
+        """Test that a high priority record never overtakes its own group"""
+        records = [_record("a-low", "a"), _record("a-high", "a"), _record("b", "b")]
+
+        started = self._started_order(records, ["low", "high", "medium"])
+
+        assert started.index("a-low") < started.index("a-high")
+        assert started[0] == "b"
+
+    def test_fifo_policy_keeps_arrival_order(self):
+        """Test that fifo scheduling ignores priorities"""
+        records = [_record("1", "a"), _record("2", "b")]
+
+        assert self._started_order(records, ["low", "high"], policy="fifo") == [
+            "1",
+            "2",
+        ]
+
+    def test_weighted_policy_shares_by_weight(self):
+        """Test that weighted-fair scheduling interleaves priorities by weight"""
+        records = [_record(f"h{i}", f"h{i}") for i in range(6)] + [
+            _record(f"l{i}", f"l{i}") for i in range(6)
+        ]
+        priorities = ["high"] * 6 + ["low"] * 6
+
+        started = self._started_order(
+            records,
+            priorities,
+            policy="weighted",
+            weights={"high": 2, "low": 1},
+        )
+
+        # Low priority is not starved: it gets one slot for every two high
+        assert [name[0] for name in started[:6]] == ["h", "l", "h", "h", "l", "h"]
+
+    def test_scheduler_reports_start_latency_per_priority(self):
+        """Test that queue-to-start waits are recorded per priority"""
+        records = [_record("1", "a"), _record("2", "b"), _record("3", "c")]
+
+        report = execute_batch(
+            records, lambda record: time.sleep(0.01), priorities=["low", "high", "low"]
+        )
+        summary = summarize_latencies(report.start_latencies)
+
+        assert summary["high"]["count"] == 1
+        assert summary["low"]["count"] == 2
+        assert summary["high"]["p50_ms"] < summary["low"]["p99_ms"]
+
+    def test_unknown_priorities_are_scheduled_as_medium(self):
+        """Test that unknown priority labels do not break scheduling"""
+        scheduler = PriorityScheduler(
+            partition_by_group([_record("1", "a")]), ["urgent"]
+        )
+
+        assert scheduler.acquire()[1] == 0
+        assert "medium" in scheduler.start_latencies
+
+    def test_priority_weights_are_read_from_environment(self):
+        """Test that PROCESSOR_PRIORITY_WEIGHTS configures the weights"""
+        with patch.dict(os.environ, {"PROCESSOR_PRIORITY_WEIGHTS": "high:8,low:1"}):
+            assert get_priority_weights() == {"high": 8, "low": 1}
+
+    def test_default_weights_rank_medium_above_low(self):
+        """Test that medium outweighs low, also when configured as normal"""
+        assert get_priority_weights()["medium"] > get_priority_weights()["low"]
+
+        with patch.dict(
+            os.environ, {"PROCESSOR_PRIORITY_WEIGHTS": "high:4,normal:2,low:1"}
+        ):
+            assert get_priority_weights() == {"high": 4, "medium": 2, "low": 1}
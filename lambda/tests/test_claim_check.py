@@ -0,0 +1,258 @@
+import json
+import os
+import sys
+import zlib
+from unittest.mock import patch
+
+import pytest
+
+# Add the shared layer directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared", "python"))
+
+import claim_check
+from claim_check import (ENCODING_BLOB, ENCODING_INLINE, ENVELOPE_FIELD,
+                         ClaimCheckError, LocalDirBlobStore, decode_payload,
+                         encode_payload, get_blob_store)
+
+
+@pytest.fixture
+def claim_check_env(tmp_path):
+    """Fixture enabling claim-check with a local blob directory"""
+    env = {
+        "CLAIM_CHECK_BACKEND": "local",
+        "CLAIM_CHECK_DIR": str(tmp_path / "blobs"),
+        "CLAIM_CHECK_COMPRESS_THRESHOLD_BYTES": "1024",
+        "CLAIM_CHECK_MAX_INLINE_BYTES": "4096",
+    }
+    with patch.dict(os.environ, env):
+        yield env
+
+
+def _incompressible(size):
+    """Returns a string that zlib cannot shrink much"""
+    return os.urandom(size).hex()
+
+
+class TestEncodePayload:
+    """Tests for the encode_payload function"""
+
+    def test_disabled_without_backend(self):
+        """Test that payloads are untouched when claim-check is disabled"""
+        payload = {"data": "x" * 100000}
+
+        assert encode_payload(payload) is None
+
+    def test_small_payload_is_inline(self, claim_check_env):
+        """Test that payloads under the threshold are sent as they are"""
+        payload = {"to": "user@example.com"}
+
+        assert encode_payload(payload) is None
+
+    def test_large_payload_is_compressed(self, claim_check_env):
+        """Test that payloads above the threshold are compressed inline"""
+        payload = {"data": "x" * 10000}
+
+        envelope = encode_payload(payload)
+
+        assert envelope["encoding"] == ENCODING_INLINE
+        assert decode_payload(envelope) == payload
+
+    def test_oversized_payload_is_offloaded(self, claim_check_env):
+        """Test that payloads still too large after compression go to the blob store"""
+        payload = {"data": _incompressible(8192)}
+
+        envelope = encode_payload(payload)
+
+        assert envelope["encoding"] == ENCODING_BLOB
+        assert "data" not in envelope
+        assert os.path.exists(
+            os.path.join(claim_check_env["CLAIM_CHECK_DIR"], envelope["ref"])
+        )
+        assert len(json.dumps(envelope)) < 1024
+        assert decode_payload(envelope) == payload
+
+    def test_records_sizes(self, claim_check_env):
+        """Test that sent sizes are counted"""
+        encode_payload({"data": "x" * 10000})
+        encode_payload({"data": _incompressible(8192)})
+
+        counters = claim_check.stats.snapshot()
+        assert counters["sent"] == 2
+        assert counters["compressed"] == 1
+        assert counters["offloaded"] == 1
+        assert counters["sent_bytes"] < counters["sent_raw_bytes"]
+
+
+class TestDecodePayload:
+    """Tests for the decode_payload function"""
+
+    def test_fetched_blobs_are_cached(self, claim_check_env):
+        """Test that a blob is read from the store only once"""
+        payload = {"data": _incompressible(8192)}
+        envelope = encode_payload(payload)
+        store = get_blob_store()
+
+        with patch.object(store, "get", wraps=store.get) as mock_get:
+            assert decode_payload(envelope) == payload
+            assert decode_payload(envelope) == payload
+
+        mock_get.assert_called_once_with(envelope["ref"])
+        counters = claim_check.stats.snapshot()
+        assert counters["fetched"] == 1
+        assert counters["cache_hits"] == 1
+
+    def test_missing_blob(self, claim_check_env):
+        """Test that a missing blob raises a ClaimCheckError"""
+        envelope = {"encoding": ENCODING_BLOB, "ref": "0" * 64}
+
+        with pytest.raises(ClaimCheckError, match="not found"):
+            decode_payload(envelope)
+
+    @pytest.mark.parametrize(
+        "ref", ["/etc/passwd", "../../etc/passwd", "A" * 64, "0" * 63, None]
+    )
+    def test_refs_must_be_content_hashes(self, claim_check_env, ref):
+        """Test that a ref other than a sha256 is rejected before any read"""
+        store = get_blob_store()
+
+        with patch.object(store, "get") as mock_get:
+            with pytest.raises(ClaimCheckError, match="Invalid claim-check ref"):
+                decode_payload({"encoding": ENCODING_BLOB, "ref": ref})
+
+        mock_get.assert_not_called()
+
+    def test_store_comes_from_the_configuration(self, claim_check_env):
+        """Test that the envelope cannot pick the blob store"""
+        envelope = encode_payload({"data": _incompressible(8192)})
+
+        with patch.dict(os.environ, {"CLAIM_CHECK_BACKEND": ""}):
+            with pytest.raises(ClaimCheckError, match="No claim-check backend"):
+                decode_payload({**envelope, "store": "local"})
+
+    def test_unknown_encoding(self):
+        """Test that an unknown encoding raises a ClaimCheckError"""
+        with pytest.raises(ClaimCheckError, match="encoding"):
+            decode_payload({"encoding": "brotli"})
+
+    def test_corrupt_data(self):
+        """Test that inline data that does not decompress raises a ClaimCheckError"""
+        with pytest.raises(ClaimCheckError, match="Invalid claim-check envelope"):
+            decode_payload({"encoding": ENCODING_INLINE, "data": "bm90IHpsaWI="})
+
+
+class TestLocalDirBlobStore:
+    """Tests for the LocalDirBlobStore class"""
+
+    def test_put_and_get(self, tmp_path):
+        """Test that stored blobs are read back"""
+        store = LocalDirBlobStore(str(tmp_path))
+        key = "a" * 64
+
+        store.put(key, b"data")
+
+        assert store.get(key) == b"data"
+        assert os.listdir(tmp_path) == [key]
+
+    def test_keys_stay_inside_the_directory(self, tmp_path):
+        """Test that keys other than content hashes are rejected"""
+        store = LocalDirBlobStore(str(tmp_path / "blobs"))
+        (tmp_path / "secret").write_bytes(b"secret")
+
+        with pytest.raises(ClaimCheckError, match="Invalid blob key"):
+            store.get("../secret")
+        with pytest.raises(ClaimCheckError, match="Invalid blob key"):
+            store.put(str(tmp_path / "written"), b"data")
+        assert not (tmp_path / "written").exists()
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected"""
+        with pytest.raises(ValueError, match="Unknown claim-check backend"):
+            get_blob_store("s4")
+
+
+class TestClaimCheckRoundTrip:
+    """Tests for claim-check between the API handler and the task processor"""
+
+    def test_offloaded_payload_is_processed(self, claim_check_env):
+        """Test that the processor fetches a payload offloaded by the API handler"""
+        import handler
+        from task_handler import process
+
+        data = {
+            "task_id": "task-1",
+            "task_type": "email",
+            "payload": {"data": _incompressible(8192)},
+        }
+        message = handler._build_message(data, "task-1", "tasks")
+        event = {"Records": [{"messageId": "msg-1", "body": message["MessageBody"]}]}
+
+        assert len(message["MessageBody"]) < 1024
+        assert "payload" not in json.loads(message["MessageBody"])
+
+        with patch("task_handler.process_task") as mock_process_task:
+            response = process(event, None)
+
+        assert response["batchItemFailures"] == []
+        assert claim_check.stats.snapshot()["received"] == 1
+        mock_process_task.assert_called_once()
+
+    def test_handler_receives_offloaded_payload(self, claim_check_env):
+        """Test that the resolved handler is called with the fetched payload"""
+        import handler
+        from task_handler import process
+
+        payload = {"data": _incompressible(8192)}
+        data = {"task_id": "task-1", "task_type": "email", "payload": payload}
+        message = handler._build_message(data, "task-1", "tasks")
+        event = {"Records": [{"messageId": "msg-1", "body": message["MessageBody"]}]}
+        received = []
+
+        def email_handler(task_id, task_type, description, created_at, payload=None):
+            assert payload == data["payload"]
+            received.append(task_id)
+
+        with patch("task_handler.registry.resolve", return_value=email_handler):
+            response = process(event, None)
+
+        assert response["batchItemFailures"] == []
+        assert received == ["task-1"]
+
+    def test_payload_envelopes_from_clients_are_not_decoded(
+        self, claim_check_env, tmp_path
+    ):
+        """Test that an envelope sent inside a task's payload is plain data"""
+        import handler
+        from task_handler import _decode_record, process
+
+        secret = tmp_path / "secret.z"
+        secret.write_bytes(zlib.compress(b'{"secret": 1}'))
+        forged = {
+            "_claim_check": 1,
+            "encoding": ENCODING_BLOB,
+            "store": "local",
+            "ref": str(secret),
+        }
+        data = {"task_id": "task-1", "task_type": "email", "payload": forged}
+        message = handler._build_message(data, "task-1", "tasks")
+        record = {"messageId": "msg-1", "body": message["MessageBody"]}
+
+        response = process({"Records": [record]}, None)
+
+        assert response["batchItemFailures"] == []
+        assert _decode_record(record).payload == forged
+        assert claim_check.stats.snapshot()["received"] == 0
+
+    def test_missing_blob_fails_the_record(self, claim_check_env):
+        """Test that a record whose blob is gone is reported as failed"""
+        from task_handler import process
+
+        body = {
+            "task_id": "task-1",
+            "task_type": "email",
+            ENVELOPE_FIELD: {"encoding": ENCODING_BLOB, "ref": "0" * 64},
+        }
+        event = {"Records": [{"messageId": "msg-1", "body": json.dumps(body)}]}
+
+        response = process(event, None)
+
+        assert response["batchItemFailures"] == [{"itemIdentifier": "msg-1"}]
@@ -0,0 +1,233 @@
+import json
+import os
+import signal
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from consumer import Consumer, ConsumerStats, consumer_from_env, main
+from sqs_client import to_lambda_event
+from sqs_emulator import InMemorySQS
+
+QUEUE_URL = "http://localhost:4566/000000000000/tasks.fifo"
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sqs():
+    """Fixture providing an emulated queue"""
+    return InMemorySQS()
+
+
+def _send(sqs, task_id, group_id="tasks"):
+    body = {"id": task_id, "task_type": "default", "priority": "normal"}
+    sqs.send_message(
+        QueueUrl=QUEUE_URL,
+        MessageBody=json.dumps(body),
+        MessageGroupId=group_id,
+        MessageDeduplicationId=task_id,
+    )
+
+
+def _queued(sqs):
+    attributes = sqs.get_queue_attributes(QueueUrl=QUEUE_URL)["Attributes"]
+    return int(attributes["ApproximateNumberOfMessages"]) + int(
+        attributes["ApproximateNumberOfMessagesNotVisible"]
+    )
+
+
+class TestConsumer:
+    """Tests for the Consumer class"""
+
+    def test_processes_and_deletes_messages(self, sqs):
+        """Test that processed messages are deleted from the queue"""
+        for i in range(3):
+            _send(sqs, f"task-{i}", group_id=f"group-{i}")
+        consumer = Consumer(sqs, QUEUE_URL, wait_time_seconds=0)
+
+        with patch("task_handler.process_task") as mock_process_task:
+            assert consumer.poll_once() == 3
+
+        assert mock_process_task.call_count == 3
+        assert _queued(sqs) == 0
+        assert consumer.stats.snapshot()["deleted"] == 3
+
+    def test_deletes_in_batches(self):
+        """Test that successes are deleted with one delete_message_batch call"""
+        client = MagicMock()
+        client.receive_message.return_value = {
+            "Messages": [
+                {
+                    "MessageId": f"m{i}",
+                    "ReceiptHandle": f"r{i}",
+                    "Body": json.dumps({"id": f"t{i}", "task_type": "default"}),
+                    "Attributes": {},
+                    "MD5OfBody": "",
+                }
+                for i in range(4)
+            ]
+        }
+        client.delete_message_batch.return_value = {"Failed": []}
+
+        with patch("task_handler.process_task"):
+            Consumer(client, QUEUE_URL).poll_once()
+
+        client.delete_message_batch.assert_called_once()
+        entries = client.delete_message_batch.call_args.kwargs["Entries"]
+        assert [entry["ReceiptHandle"] for entry in entries] == ["r0", "r1", "r2", "r3"]
+        assert client.receive_message.call_args.kwargs["WaitTimeSeconds"] == 20
+
+    def test_failed_messages_are_left_on_the_queue(self, sqs):
+        """Test that a failed message and its group's later messages stay queued"""
+        _send(sqs, "ok", group_id="a")
+        _send(sqs, "bad", group_id="b")
+        _send(sqs, "after-bad", group_id="b")
+
+        def process_task(task_id, *args):
+            if task_id == "bad":
+                raise RuntimeError("boom")
+
+        consumer = Consumer(sqs, QUEUE_URL, wait_time_seconds=0)
+        with patch("task_handler.process_task", side_effect=process_task):
+            consumer.poll_once()
+
+        snapshot = consumer.stats.snapshot()
+        assert snapshot["succeeded"] == 1
+        assert snapshot["failed"] == 2
+        assert _queued(sqs) == 2
+
+    def test_delete_failures_are_counted(self):
+        """Test that entries SQS could not delete are counted, not raised"""
+        client = MagicMock()
+        client.receive_message.return_value = {
+            "Messages": [
+                {
+                    "MessageId": "m0",
+                    "ReceiptHandle": "r0",
+                    "Body": json.dumps({"id": "t0", "task_type": "default"}),
+                    "Attributes": {},
+                    "MD5OfBody": "",
+                }
+            ]
+        }
+        client.delete_message_batch.return_value = {
+            "Failed": [{"Id": "0", "Code": "ReceiptHandleIsInvalid"}]
+        }
+        consumer = Consumer(client, QUEUE_URL)
+
+        with patch("task_handler.process_task"):
+            consumer.poll_once()
+
+        assert consumer.stats.snapshot()["delete_failures"] == 1
+
+    def test_run_stops_after_the_current_batch(self, sqs):
+        """Test that stop() ends the loop once the batch in hand is done"""
+        _send(sqs, "task-0")
+        consumer = Consumer(sqs, QUEUE_URL, wait_time_seconds=0)
+
+        with patch("task_handler.process_task", side_effect=consumer.stop):
+            snapshot = consumer.run()
+
+        assert snapshot["polls"] == 1
+        assert snapshot["deleted"] == 1
+
+    def test_poll_errors_do_not_stop_the_consumer(self):
+        """Test that a failed receive is logged and polling continues"""
+        client = MagicMock()
+        client.receive_message.side_effect = [RuntimeError("throttled"), {}]
+        consumer = Consumer(client, QUEUE_URL)
+
+        with patch.object(consumer._stopping, "wait"):
+            snapshot = consumer.run(max_polls=2)
+
+        assert client.receive_message.call_count == 2
+        assert snapshot["empty_polls"] == 1
+
+
+class TestToLambdaEvent:
+    """Tests for the to_lambda_event function"""
+
+    def test_converts_received_messages(self):
+        """Test that a receive_message response becomes Lambda SQS records"""
+        message = {
+            "MessageId": "msg-1",
+            "ReceiptHandle": "rh-1",
+            "Body": "{}",
+            "Attributes": {"MessageGroupId": "tasks"},
+            "MessageAttributes": {
+                "TraceId": {"DataType": "String", "StringValue": "trace-1"}
+            },
+            "MD5OfBody": "md5",
+        }
+
+        record = to_lambda_event([message], "arn")["Records"][0]
+
+        assert record["messageId"] == "msg-1"
+        assert record["receiptHandle"] == "rh-1"
+        assert record["attributes"] == {"MessageGroupId": "tasks"}
+        assert record["messageAttributes"]["TraceId"]["stringValue"] == "trace-1"
+        assert record["eventSourceARN"] == "arn"
+
+
+class TestConsumerStats:
+    """Tests for the ConsumerStats class"""
+
+    def test_rates(self):
+        """Test messages_per_second and idle_poll_ratio"""
+        clock = FakeClock()
+        stats = ConsumerStats(clock)
+        stats.add(polls=4, empty_polls=1, succeeded=18, failed=2)
+        clock.now += 10
+
+        snapshot = stats.snapshot()
+
+        assert snapshot["messages_per_second"] == 2.0
+        assert snapshot["idle_poll_ratio"] == 0.25
+
+    def test_no_polls(self):
+        """Test that a consumer that never polled has no idle ratio"""
+        assert ConsumerStats().snapshot()["idle_poll_ratio"] == 0.0
+
+
+class TestConsumerFromEnv:
+    """Tests for building the consumer from the environment"""
+
+    def test_reads_settings(self):
+        """Test that the CONSUMER_* variables tune the consumer"""
+        env = {
+            "QUEUE_URL": QUEUE_URL,
+            "SQS_BACKEND": "memory",
+            "CONSUMER_MAX_MESSAGES": "25",
+            "CONSUMER_WAIT_TIME_SECONDS": "5",
+            "CONSUMER_VISIBILITY_TIMEOUT": "120",
+        }
+        with patch.dict(os.environ, env):
+            consumer = consumer_from_env()
+
+        assert consumer.max_messages == 10
+        assert consumer.wait_time_seconds == 5
+        assert consumer.visibility_timeout == 120
+
+    def test_main_handles_sigterm(self):
+        """Test that main installs SIGTERM and SIGINT handlers that stop the loop"""
+        with patch.dict(os.environ, {"QUEUE_URL": QUEUE_URL, "SQS_BACKEND": "memory"}):
+            with patch("consumer.signal.signal") as mock_signal, patch(
+                "consumer.Consumer.run"
+            ):
+                main()
+
+        handled = {call.args[0] for call in mock_signal.call_args_list}
+        assert handled == {signal.SIGTERM, signal.SIGINT}
@@ -0,0 +1,108 @@
+import os
+import sys
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from handler_registry import ANY, HandlerRegistry
+from task_handler import registry
+
+
+def _handler(name):
+    """Builds a named handler function"""
+
+    def handler(task_id, task_type, description, created_at, payload=None):
+        return name
+
+    handler.__name__ = name
+    return handler
+
+
+class TestHandlerRegistry:
+    """Tests for the HandlerRegistry class"""
+
+    def _registry(self):
+        registry = HandlerRegistry()
+        registry.register(priority="high")(_handler("any_high"))
+        registry.register(priority="normal", default=True)(_handler("any_normal"))
+        registry.register(task_type="email", priority="high")(_handler("email_high"))
+        registry.register(task_type="report")(_handler("report_any"))
+        registry.freeze()
+        return registry
+
+    def test_exact_match_wins(self):
+        """Test that a (task_type, priority) registration is preferred"""
+        assert self._registry().resolve("email", "high").__name__ == "email_high"
+
+    def test_falls_back_to_any_task_type(self):
+        """Test that unregistered task types use the priority's handler"""
+        assert self._registry().resolve("sms", "high").__name__ == "any_high"
+
+    def test_falls_back_to_any_priority(self):
+        """Test that a task type registered for any priority is used"""
+        assert self._registry().resolve("report", "low").__name__ == "report_any"
+
+    def test_unknown_combination_routes_to_default(self):
+        """Test that nothing registered falls back to the default handler"""
+        assert self._registry().resolve("sms", "urgent").__name__ == "any_normal"
+
+    def test_task_type_handler_beats_priority_handlers(self, capsys):
+        """Test that a task type's handler wins over every priority's handler"""
+        registry = HandlerRegistry()
+        registry.register(priority="high")(_handler("any_high"))
+        registry.register(priority="medium", default=True)(_handler("any_medium"))
+        registry.register(priority="low")(_handler("any_low"))
+        registry.register(task_type="email")(_handler("email_any"))
+        registry.register(task_type="email", priority="low")(_handler("email_low"))
+        registry.freeze()
+
+        for priority in ("high", "medium", "urgent"):
+            assert registry.resolve("email", priority).__name__ == "email_any"
+        assert registry.resolve("email", "low").__name__ == "email_low"
+        assert registry.resolve("invoice", "high").__name__ == "any_high"
+        assert registry.resolve("invoice", "medium").__name__ == "any_medium"
+        assert "No handler" not in capsys.readouterr().out
+
+    def test_processor_resolves_unregistered_task_types(self, capsys):
+        """Test that the processor's handlers serve task types nobody registered"""
+        assert registry.resolve("invoice", "low").__name__ == (
+            "handle_low_priority_task"
+        )
+        assert "No handler" not in capsys.readouterr().out
+
+    def test_dispatch_table_is_frozen(self):
+        """Test that the table is read-only and registration is closed"""
+        registry = HandlerRegistry()
+        registry.register(priority="high", default=True)(_handler("any_high"))
+        table = registry.freeze()
+
+        with pytest.raises(TypeError):
+            table[("sms", "high")] = _handler("sneaky")
+        with pytest.raises(RuntimeError):
+            registry.register(priority="low")(_handler("late"))
+
+    def test_duplicate_registration_is_rejected(self):
+        """Test that two handlers cannot claim the same combination"""
+        registry = HandlerRegistry()
+        registry.register(priority="high")(_handler("first"))
+
+        with pytest.raises(ValueError):
+            registry.register(priority="high")(_handler("second"))
+
+    def test_freeze_requires_default_handler(self):
+        """Test that a registry without default cannot be frozen"""
+        registry = HandlerRegistry()
+        registry.register(priority="high")(_handler("only"))
+
+        with pytest.raises(RuntimeError):
+            registry.freeze()
+
+    def test_lists_task_processor_handlers(self):
+        """Test that the processor's handlers are registered at import"""
+        handlers = {entry["priority"]: entry for entry in registry.list_handlers()}
+
+        assert handlers["high"]["handler"] == "handle_high_priority_task"
+        assert handlers["medium"]["default"] is True
+        assert handlers["low"]["task_type"] == ANY
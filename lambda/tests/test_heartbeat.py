@@ -0,0 +1,238 @@
+import json
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from heartbeat import VisibilityHeartbeat, queue_url_from_arn, start_heartbeat
+from sqs_client import to_lambda_event
+from sqs_emulator import InMemorySQS
+from task_handler import process
+
+QUEUE_URL = "http://localhost:4566/000000000000/tasks.fifo"
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Fixture providing a manually advanced clock"""
+    return FakeClock()
+
+
+@pytest.fixture
+def sqs(clock):
+    """Fixture providing an emulated queue on the fake clock"""
+    return InMemorySQS(clock=clock)
+
+
+def _receive(sqs, count, visibility_timeout=5):
+    for i in range(count):
+        sqs.send_message(
+            QueueUrl=QUEUE_URL,
+            MessageBody=json.dumps({"id": f"t{i}", "task_type": "default"}),
+            MessageGroupId=f"group-{i}",
+            MessageDeduplicationId=f"t{i}",
+        )
+    return sqs.receive_message(
+        QueueUrl=QUEUE_URL,
+        MaxNumberOfMessages=10,
+        VisibilityTimeout=visibility_timeout,
+    )["Messages"]
+
+
+def _visible(sqs):
+    return len(
+        sqs.receive_message(QueueUrl=QUEUE_URL, MaxNumberOfMessages=10).get(
+            "Messages", []
+        )
+    )
+
+
+class TestVisibilityHeartbeat:
+    """Tests for the VisibilityHeartbeat class"""
+
+    def test_beat_keeps_messages_invisible(self, sqs, clock):
+        """Test that a beat pushes the visibility timeout out"""
+        messages = _receive(sqs, 3)
+        heartbeat = VisibilityHeartbeat(
+            sqs, QUEUE_URL, [m["ReceiptHandle"] for m in messages], 1, 30
+        )
+
+        clock.now += 4
+        heartbeat.beat()
+        clock.now += 10
+
+        assert _visible(sqs) == 0
+        assert heartbeat.extended == 3
+
+    def test_messages_reappear_without_a_beat(self, sqs, clock):
+        """Test the redelivery the heartbeat prevents"""
+        _receive(sqs, 3)
+
+        clock.now += 10
+
+        assert _visible(sqs) == 3
+
+    def test_extensions_are_batched(self):
+        """Test that at most ten messages are extended per call"""
+        client = MagicMock()
+        client.change_message_visibility_batch.return_value = {"Failed": []}
+        heartbeat = VisibilityHeartbeat(
+            client, QUEUE_URL, [f"r{i}" for i in range(23)], 1, 30
+        )
+
+        heartbeat.beat()
+
+        sizes = [
+            len(call.kwargs["Entries"])
+            for call in client.change_message_visibility_batch.call_args_list
+        ]
+        assert sizes == [10, 10, 3]
+
+    def test_deleted_messages_are_dropped(self, sqs):
+        """Test that a message whose receipt handle is gone is not extended again"""
+        messages = _receive(sqs, 2)
+        sqs.delete_message(
+            QueueUrl=QUEUE_URL, ReceiptHandle=messages[0]["ReceiptHandle"]
+        )
+        heartbeat = VisibilityHeartbeat(
+            sqs, QUEUE_URL, [m["ReceiptHandle"] for m in messages], 1, 30
+        )
+
+        heartbeat.beat()
+        heartbeat.beat()
+
+        assert heartbeat.extended == 2
+        assert heartbeat.failed == 1
+
+    def test_client_errors_are_retried_next_beat(self):
+        """Test that a failed call keeps its messages for the next beat"""
+        client = MagicMock()
+        client.change_message_visibility_batch.side_effect = [
+            RuntimeError("throttled"),
+            {"Failed": []},
+        ]
+        heartbeat = VisibilityHeartbeat(client, QUEUE_URL, ["r0"], 1, 30)
+
+        heartbeat.beat()
+        heartbeat.beat()
+
+        assert heartbeat.failed == 1
+        assert heartbeat.extended == 1
+
+    def test_stops_at_the_deadline(self, clock):
+        """Test that no beat is sent once stop_at has passed"""
+        client = MagicMock()
+        heartbeat = VisibilityHeartbeat(
+            client, QUEUE_URL, ["r0"], 0.001, 30, stop_at=clock.now, clock=clock
+        )
+
+        heartbeat.start()
+        heartbeat._thread.join(timeout=1)
+
+        assert not heartbeat._thread.is_alive()
+        client.change_message_visibility_batch.assert_not_called()
+
+    def test_beats_until_stopped(self):
+        """Test that the thread beats periodically until stop()"""
+        client = MagicMock()
+        client.change_message_visibility_batch.return_value = {"Failed": []}
+
+        with VisibilityHeartbeat(client, QUEUE_URL, ["r0"], 0.005, 30) as heartbeat:
+            time.sleep(0.05)
+
+        beats = heartbeat.beats
+        time.sleep(0.02)
+
+        assert beats >= 2
+        assert heartbeat.beats == beats
+
+
+class TestStartHeartbeat:
+    """Tests for the start_heartbeat function"""
+
+    def test_disabled_by_default(self):
+        """Test that no heartbeat runs without VISIBILITY_HEARTBEAT_SECONDS"""
+        assert start_heartbeat([{"receiptHandle": "r0"}]) is None
+
+    def test_reads_configuration(self):
+        """Test the extension default and the queue URL from the ARN"""
+        records = [
+            {
+                "receiptHandle": "r0",
+                "eventSourceARN": "arn:aws:sqs:us-east-1:123456789012:tasks.fifo",
+            }
+        ]
+        with patch.dict(os.environ, {"VISIBILITY_HEARTBEAT_SECONDS": "10"}), patch(
+            "heartbeat.get_sqs_client"
+        ):
+            heartbeat = start_heartbeat(records, deadline=time.monotonic() + 5)
+        heartbeat.stop()
+
+        assert heartbeat.extension_seconds == 30
+        assert (
+            heartbeat.queue_url
+            == "https://sqs.us-east-1.amazonaws.com/123456789012/tasks.fifo"
+        )
+        assert heartbeat.stop_at <= time.monotonic() + 5
+
+    def test_client_is_built_by_the_first_beat(self):
+        """Test that a batch done within one interval never builds a client"""
+        env = {"VISIBILITY_HEARTBEAT_SECONDS": "10", "QUEUE_URL": QUEUE_URL}
+        with patch.dict(os.environ, env), patch(
+            "heartbeat.get_sqs_client"
+        ) as mock_get_client:
+            start_heartbeat([{"receiptHandle": "r0"}]).stop()
+
+        mock_get_client.assert_not_called()
+
+    def test_queue_url_from_arn(self, mock_env_local):
+        """Test that ARNs map to LocalStack URLs locally"""
+        with patch.dict(os.environ, mock_env_local):
+            url = queue_url_from_arn("arn:aws:sqs:us-east-1:000000000000:tasks.fifo")
+
+        assert url == "http://localstack:4566/000000000000/tasks.fifo"
+        assert queue_url_from_arn("not-an-arn") is None
+
+
+class TestProcessHeartbeat:
+    """Tests for the heartbeat in the task processor"""
+
+    def test_slow_batch_is_kept_invisible(self):
+        """Test that process extends its messages while a slow handler runs"""
+        sqs = InMemorySQS()
+        messages = _receive(sqs, 2, visibility_timeout=1)
+        env = {
+            "QUEUE_URL": QUEUE_URL,
+            "SQS_BACKEND": "memory",
+            "VISIBILITY_HEARTBEAT_SECONDS": "0.01",
+        }
+
+        with patch.dict(os.environ, env), patch(
+            "heartbeat.get_sqs_client", return_value=sqs
+        ), patch.object(
+            sqs,
+            "change_message_visibility_batch",
+            wraps=sqs.change_message_visibility_batch,
+        ) as mock_extend, patch(
+            "task_handler.process_task", side_effect=lambda *args: time.sleep(0.05)
+        ):
+            response = process(to_lambda_event(messages), None)
+
+        assert response["batchItemFailures"] == []
+        assert mock_extend.call_count >= 2
+        assert mock_extend.call_args.kwargs["Entries"][0]["VisibilityTimeout"] == 1
@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from idempotency import (STATUS_COMPLETED, STATUS_IN_PROGRESS, STATUS_NEW,
+                         IdempotencyStore, InMemoryBackend, SQLiteBackend,
+                         get_idempotency_store)
+from task_handler import process
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    """Fixture providing each idempotency backend"""
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "idempotency.sqlite3"))
+    return InMemoryBackend()
+
+
+class TestIdempotencyStore:
+    """Tests for the IdempotencyStore class"""
+
+    def test_first_delivery_is_new_and_duplicate_is_completed(self, backend):
+        """Test that a completed key short-circuits later deliveries"""
+        store = IdempotencyStore(backend)
+
+        assert store.begin("task-1") == STATUS_NEW
+        store.complete("task-1")
+        assert store.begin("task-1") == STATUS_COMPLETED
+        assert store.stats() == {"hits": 1, "misses": 1}
+
+    def test_concurrent_delivery_sees_in_progress(self, backend):
+        """Test that a second delivery of a running task is not processed"""
+        store = IdempotencyStore(backend)
+
+        assert store.begin("task-1") == STATUS_NEW
+        assert store.begin("task-1") == STATUS_IN_PROGRESS
+
+    def test_released_key_can_be_claimed_again(self, backend):
+        """Test that a failed task is processed again on retry"""
+        store = IdempotencyStore(backend)
+
+        store.begin("task-1")
+        store.release("task-1")
+
+        assert store.begin("task-1") == STATUS_NEW
+
+    def test_expired_records_are_ignored(self, backend):
+        """Test that records past their TTL no longer block processing"""
+        store = IdempotencyStore(backend, ttl_seconds=0.01, in_progress_ttl_seconds=0)
+
+        store.begin("task-1")
+        assert store.begin("task-1") == STATUS_NEW
+        store.complete("task-1")
+        time.sleep(0.02)
+
+        assert store.begin("task-1") == STATUS_NEW
+
+    def test_completed_keys_are_served_from_the_lru(self):
+        """Test that the LRU answers duplicates without the backend"""
+        store = IdempotencyStore(InMemoryBackend(), cache_size=1)
+        store.begin("task-1")
+        store.complete("task-1")
+
+        with patch.object(store.backend, "claim") as mock_claim:
+            assert store.begin("task-1") == STATUS_COMPLETED
+            mock_claim.assert_not_called()
+
+        store.begin("task-2")
+        store.complete("task-2")
+        assert "task-1" not in store._cache
+
+    def test_store_is_disabled_without_backend(self):
+        """Test that idempotency is off unless IDEMPOTENCY_BACKEND is set"""
+        with patch.dict(os.environ, {}, clear=True):
+            assert get_idempotency_store() is None
+
+        with patch.dict(os.environ, {"IDEMPOTENCY_BACKEND": "memory"}):
+            assert get_idempotency_store() is get_idempotency_store()
+
+
+class TestProcessIdempotency:
+    """Tests for duplicate handling in the process Lambda handler"""
+
+    def _event(self, *message_ids):
+        return {
+            "Records": [
+                {
+                    "messageId": message_id,
+                    "body": json.dumps(
+                        {"task_id": "task-1", "task_type": "email", "priority": "high"}
+                    ),
+                }
+                for message_id in message_ids
+            ]
+        }
+
+    @patch("task_handler.process_task")
+    def test_duplicate_delivery_is_skipped(self, mock_process_task):
+        """Test that a redelivered task is not processed twice"""
+        with patch.dict(os.environ, {"IDEMPOTENCY_BACKEND": "memory"}):
+            process(self._event("msg-1"), None)
+            result = process(self._event("msg-2"), None)
+
+        assert result["batchItemFailures"] == []
+        mock_process_task.assert_called_once()
+
+    @patch("task_handler.process_task")
+    def test_failed_task_is_processed_on_retry(self, mock_process_task):
+        """Test that a failure releases the key for the redelivery"""
+        mock_process_task.side_effect = [ValueError("boom"), None]
+
+        with patch.dict(os.environ, {"IDEMPOTENCY_BACKEND": "memory"}):
+            failed = process(self._event("msg-1"), None)
+            retried = process(self._event("msg-1"), None)
+
+        assert failed["batchItemFailures"] == [{"itemIdentifier": "msg-1"}]
+        assert retried["batchItemFailures"] == []
+        assert mock_process_task.call_count == 2
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the shared layer directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared", "python"))
+
+from lazy_import import LazyModule, lazy_import
+
+lambda_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _modules_after_import(handler_dir, module):
+    """Imports a handler in a fresh interpreter and returns sys.modules"""
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            [
+                os.path.join(lambda_root, handler_dir),
+                os.path.join(lambda_root, "shared", "python"),
+            ]
+        ),
+    }
+    env.pop("SQS_CLIENT_PREWARM", None)
+    code = f"import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True
+    )
+    return set(json.loads(result.stdout))
+
+
+class TestLazyImport:
+    """Tests for the lazy_import function"""
+
+    def test_returns_imported_module(self):
+        """Test that an already imported module is returned as it is"""
+        assert lazy_import("json") is json
+
+    def test_defers_import_until_attribute_access(self):
+        """Test that the module is only imported on first use"""
+        with patch.dict(sys.modules):
+            sys.modules.pop("colorsys", None)
+
+            module = lazy_import("colorsys")
+
+            assert isinstance(module, LazyModule)
+            assert "colorsys" not in sys.modules
+            assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+            assert "colorsys" in sys.modules
+
+    def test_patch_reaches_the_real_module(self):
+        """Test that mock.patch through the proxy patches and restores the module"""
+        with patch.dict(sys.modules):
+            sys.modules.pop("colorsys", None)
+            module = lazy_import("colorsys")
+
+            with patch.object(module, "rgb_to_hsv", return_value="patched"):
+                assert sys.modules["colorsys"].rgb_to_hsv(0, 0, 0) == "patched"
+
+            assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+
+    def test_missing_module_fails_on_use(self):
+        """Test that an import error surfaces on first use"""
+        module = lazy_import("no_such_module_anywhere")
+
+        with pytest.raises(ImportError):
+            module.anything
+
+
+class TestColdStart:
+    """Tests that the handlers keep heavy imports out of the cold start"""
+
+    def test_api_handler_does_not_import_boto3(self):
+        """Test that importing the API handler leaves boto3 unimported"""
+        modules = _modules_after_import("api_handler", "handler")
+
+        assert "handler" in modules
+        assert "boto3" not in modules
+        assert "botocore" not in modules
+
+    def test_task_processor_does_not_import_heavy_modules(self):
+        """Test that importing the task processor leaves boto3, asyncio, sqlite3 and inspect unimported"""
+        modules = _modules_after_import("task_processor", "task_handler")
+
+        assert "task_handler" in modules
+        assert not {"boto3", "asyncio", "sqlite3", "inspect"} & modules
+
+    @patch("sqs_clients.boto3.client")
+    def test_client_is_built_on_first_use(self, mock_boto_client, mock_env_local):
+        """Test that the lazily imported boto3 still builds the SQS client"""
+        import handler
+
+        with patch.dict(os.environ, mock_env_local):
+            assert handler.get_sqs_client() is mock_boto_client.return_value
+
+        mock_boto_client.assert_called_once()
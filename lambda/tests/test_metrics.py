@@ -0,0 +1,193 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from handler import main
+from metrics import MAX_VALUES_PER_METRIC, Metrics, get_metrics
+from sqs_client import to_lambda_event
+from sqs_emulator import InMemorySQS
+from task_handler import process
+
+
+def _metrics(sink=None, **kwargs):
+    return Metrics("svc", sink=sink or MagicMock(), clock=lambda: 1700000000, **kwargs)
+
+
+def _by_dimensions(documents):
+    return {
+        tuple(
+            document[name]
+            for name in document["_aws"]["CloudWatchMetrics"][0]["Dimensions"][0][1:]
+        ): document
+        for document in documents
+    }
+
+
+class TestMetrics:
+    """Tests for the Metrics class"""
+
+    def test_counters_are_aggregated(self):
+        """Test that counts of the same metric and dimensions are summed"""
+        metrics = _metrics()
+        metrics.count("TasksProcessed", dimensions=("high", "email"))
+        metrics.count("TasksProcessed", 2, dimensions=("high", "email"))
+        metrics.count("TasksProcessed", dimensions=("low", "email"))
+
+        documents = _by_dimensions(metrics.documents())
+
+        assert documents[("high", "email")]["TasksProcessed"] == 3
+        assert documents[("low", "email")]["TasksProcessed"] == 1
+
+    def test_document_is_emf(self):
+        """Test the EMF metadata of a document"""
+        metrics = _metrics(namespace="Tests")
+        metrics.count("TasksProcessed", dimensions=("high", "email"))
+        metrics.timing("TaskDuration", 12.34, dimensions=("high", "email"))
+
+        (document,) = metrics.documents()
+
+        assert document["service"] == "svc"
+        assert document["priority"] == "high"
+        assert document["task_type"] == "email"
+        assert document["TaskDuration"] == [12.3]
+        assert document["_aws"] == {
+            "Timestamp": 1700000000000,
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": "Tests",
+                    "Dimensions": [["service", "priority", "task_type"]],
+                    "Metrics": [
+                        {"Name": "TasksProcessed", "Unit": "Count"},
+                        {"Name": "TaskDuration", "Unit": "Milliseconds"},
+                    ],
+                }
+            ],
+        }
+
+    def test_service_metrics_have_no_task_dimensions(self):
+        """Test that metrics recorded without dimensions only carry the service"""
+        metrics = _metrics()
+        metrics.count("BatchSize", 4)
+
+        (document,) = metrics.documents()
+
+        assert document["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["service"]]
+        assert "priority" not in document
+
+    def test_timings_are_bucketed(self):
+        """Test that equal latencies share a bucket instead of a value each"""
+        metrics = _metrics()
+        for ms in (1.01, 1.04, 250.4, 250.2):
+            metrics.timing("TaskDuration", ms)
+
+        assert metrics._histograms[((), "TaskDuration")] == {1.0: 2, 250: 2}
+
+    def test_large_histograms_are_split(self):
+        """Test that no document holds more than 100 values of a metric"""
+        metrics = _metrics()
+        metrics.count("BatchSize", 1)
+        for ms in range(MAX_VALUES_PER_METRIC + 20):
+            metrics.timing("TaskDuration", ms)
+
+        first, second = metrics.documents()
+
+        assert len(first["TaskDuration"]) == MAX_VALUES_PER_METRIC
+        assert len(second["TaskDuration"]) == 20
+        assert "BatchSize" not in second
+
+    def test_flush_writes_once_and_resets(self):
+        """Test that a flush is a single write and empties the aggregates"""
+        sink = MagicMock()
+        metrics = _metrics(sink=sink)
+        metrics.count("TasksProcessed", dimensions=("high", "email"))
+        metrics.count("TasksProcessed", dimensions=("low", "email"))
+
+        assert metrics.flush() == 2
+        assert metrics.flush() == 0
+
+        sink.assert_called_once()
+        lines = sink.call_args.args[0].split("\n")
+        assert [json.loads(line)["priority"] for line in lines] == ["high", "low"]
+
+    def test_disabled_metrics_record_nothing(self):
+        """Test that disabled metrics neither aggregate nor write"""
+        sink = MagicMock()
+        metrics = _metrics(sink=sink, enabled=False)
+        metrics.count("TasksProcessed")
+        metrics.timing("TaskDuration", 1)
+
+        assert metrics.flush() == 0
+        sink.assert_not_called()
+
+
+class TestGetMetrics:
+    """Tests for the get_metrics function"""
+
+    def test_reads_configuration(self):
+        """Test the namespace and the switch from the environment"""
+        env = {"METRICS_NAMESPACE": "Custom", "METRICS_ENABLED": "false"}
+        with patch.dict(os.environ, env):
+            metrics = get_metrics("configured")
+
+        assert metrics.namespace == "Custom"
+        assert not metrics.enabled
+        assert get_metrics("configured") is metrics
+
+
+def _emf_lines(output):
+    return [
+        json.loads(line)
+        for line in output.splitlines()
+        if line.startswith("{") and '"_aws"' in line
+    ]
+
+
+class TestHandlerMetrics:
+    """Tests for the metrics emitted by the handlers"""
+
+    def test_process_emits_task_metrics(self, capsys):
+        """Test that a batch emits counts and durations per priority and type"""
+        queue_url = "http://localhost:4566/000000000000/tasks.fifo"
+        sqs = InMemorySQS()
+        for i, priority in enumerate(("high", "high", "low")):
+            sqs.send_message(
+                QueueUrl=queue_url,
+                MessageBody=json.dumps(
+                    {"id": f"t{i}", "task_type": "default", "priority": priority}
+                ),
+                MessageGroupId=f"group-{i}",
+                MessageDeduplicationId=f"t{i}",
+            )
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)
+
+        with patch("task_handler.process_task"):
+            process(to_lambda_event(messages["Messages"]), None)
+
+        documents = _by_dimensions(_emf_lines(capsys.readouterr().out))
+        assert documents[("high", "default")]["TasksProcessed"] == 2
+        assert len(documents[("high", "default")]["TaskDuration"]) == 2
+        assert documents[("low", "default")]["TasksProcessed"] == 1
+        assert documents[()]["BatchSize"] == 3
+
+    @patch("handler.get_sqs_client")
+    def test_api_emits_request_metrics(self, mock_get_client, capsys):
+        """Test that the API handler emits its queued tasks and status class"""
+        mock_get_client.return_value = MagicMock()
+        event = {
+            "headers": {"x-api-key": "valid-token"},
+            "body": json.dumps(
+                {"title": "Test", "task_type": "email", "priority": "high"}
+            ),
+        }
+
+        with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+            assert main(event, None)["statusCode"] == 200
+
+        documents = _by_dimensions(_emf_lines(capsys.readouterr().out))
+        assert documents[("high", "email")]["TasksQueued"] == 1
+        assert documents[()]["Status2xx"] == 1
+        assert len(documents[()]["RequestDuration"]) == 1
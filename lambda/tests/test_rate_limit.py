@@ -0,0 +1,191 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_handler"))
+
+from handler import main
+from rate_limit import (InMemoryBucketBackend, RateLimiter,
+                        SQLiteBucketBackend, get_rate_limiter)
+
+
+class FakeClock:
+    """Manually advanced wall clock"""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    """Fixture providing each token bucket backend"""
+    if request.param == "sqlite":
+        return SQLiteBucketBackend(str(tmp_path / "rate_limit.sqlite3"))
+    return InMemoryBucketBackend()
+
+
+class TestRateLimiter:
+    """Tests for the RateLimiter class"""
+
+    def test_admits_up_to_burst(self, backend):
+        """Test that a full bucket admits burst requests, then throttles"""
+        limiter = RateLimiter(backend, rate=1, burst=3, clock=FakeClock())
+
+        assert [limiter.acquire("acme") for _ in range(3)] == [0, 0, 0]
+        assert limiter.acquire("acme") == pytest.approx(1.0)
+
+    def test_refills_over_time(self, backend):
+        """Test that tokens come back at the configured rate"""
+        clock = FakeClock()
+        limiter = RateLimiter(backend, rate=2, burst=2, clock=clock)
+        limiter.acquire("acme", cost=2)
+
+        assert limiter.acquire("acme") == pytest.approx(0.5)
+
+        clock.now += 0.5
+        assert limiter.acquire("acme") == 0
+
+    def test_clients_have_separate_buckets(self, backend):
+        """Test that one client draining its bucket does not affect another"""
+        limiter = RateLimiter(backend, rate=1, burst=1, clock=FakeClock())
+
+        assert limiter.acquire("noisy") == 0
+        assert limiter.acquire("noisy") > 0
+        assert limiter.acquire("quiet") == 0
+
+    def test_cost_above_burst_is_never_admitted(self, backend):
+        """Test that a request larger than the bucket is rejected outright"""
+        limiter = RateLimiter(backend, rate=1, burst=5, clock=FakeClock())
+
+        assert limiter.acquire("acme", cost=6) is None
+
+    def test_per_client_overrides(self, backend):
+        """Test that overridden clients get their own limits"""
+        limiter = RateLimiter(
+            backend, rate=1, burst=1, overrides={"big": (10, 10)}, clock=FakeClock()
+        )
+
+        assert limiter.acquire("big", cost=10) == 0
+        assert limiter.acquire("small", cost=2) is None
+
+    def test_sqlite_buckets_are_shared(self, tmp_path):
+        """Test that two backends on the same file share their buckets"""
+        path = str(tmp_path / "shared.sqlite3")
+        clock = FakeClock()
+        first = RateLimiter(SQLiteBucketBackend(path), rate=1, burst=1, clock=clock)
+        second = RateLimiter(SQLiteBucketBackend(path), rate=1, burst=1, clock=clock)
+
+        assert first.acquire("acme") == 0
+        assert second.acquire("acme") > 0
+
+
+class TestGetRateLimiter:
+    """Tests for the get_rate_limiter function"""
+
+    def test_disabled_by_default(self):
+        """Test that no limiter exists without RATE_LIMIT_RATE"""
+        assert get_rate_limiter() is None
+
+    def test_reads_configuration(self):
+        """Test that rate, burst and overrides come from the environment"""
+        env = {
+            "RATE_LIMIT_RATE": "5",
+            "RATE_LIMIT_BURST": "20",
+            "RATE_LIMITS": "acme:50/100,globex:2",
+        }
+        with patch.dict(os.environ, env):
+            limiter = get_rate_limiter()
+
+            assert get_rate_limiter() is limiter
+            assert limiter.limits_for("other") == (5.0, 20.0)
+            assert limiter.limits_for("acme") == (50.0, 100.0)
+            assert limiter.limits_for("globex") == (2.0, 2.0)
+
+    def test_non_positive_overrides_are_ignored(self):
+        """Test that a zero rate or burst override keeps the default limit"""
+        env = {"RATE_LIMIT_RATE": "5", "RATE_LIMITS": "acme:0,globex:2/0,initech:-1"}
+        with patch.dict(os.environ, env):
+            limiter = get_rate_limiter()
+
+            for client_id in ("acme", "globex", "initech"):
+                assert limiter.limits_for(client_id) == (5.0, 5.0)
+            assert limiter.acquire("acme", 5) == 0
+            assert limiter.acquire("acme") > 0
+
+    def test_non_positive_rate_is_rejected(self):
+        """Test that RATE_LIMIT_RATE must be positive"""
+        with patch.dict(os.environ, {"RATE_LIMIT_RATE": "0"}):
+            with pytest.raises(ValueError, match="must be positive"):
+                get_rate_limiter()
+
+    @pytest.mark.parametrize("burst", ["0", "-1"])
+    def test_non_positive_burst_is_rejected(self, burst):
+        """Test that RATE_LIMIT_BURST must be positive when set"""
+        with patch.dict(
+            os.environ, {"RATE_LIMIT_RATE": "5", "RATE_LIMIT_BURST": burst}
+        ):
+            with pytest.raises(ValueError, match="RATE_LIMIT_BURST must be positive"):
+                get_rate_limiter()
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected"""
+        with patch.dict(
+            os.environ, {"RATE_LIMIT_RATE": "5", "RATE_LIMIT_BACKEND": "redis"}
+        ):
+            with pytest.raises(ValueError, match="Unknown RATE_LIMIT_BACKEND"):
+                get_rate_limiter()
+
+
+class TestHandlerRateLimiting:
+    """Tests for rate limiting in the API handler"""
+
+    @patch("handler.get_sqs_client")
+    def test_returns_429_with_retry_after(self, mock_get_client):
+        """Test that requests over the limit are shed before reaching SQS"""
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        env = {
+            "API_TOKEN": "valid-token",
+            "QUEUE_URL": "q",
+            "RATE_LIMIT_RATE": "0.5",
+            "RATE_LIMIT_BURST": "1",
+        }
+        event = {"headers": {"X-Api-Key": "valid-token"}, "body": json.dumps({"title": "Test"})}
+
+        with patch.dict(os.environ, env):
+            first = main(event, None)
+            second = main(event, None)
+
+        assert first["statusCode"] == 200
+        assert second["statusCode"] == 429
+        assert second["headers"]["Retry-After"] == "2"
+        assert mock_client.send_message.call_count == 1
+
+    @patch("handler.get_sqs_client")
+    def test_batch_costs_one_token_per_task(self, mock_get_client):
+        """Test that a batch larger than the burst is rejected without Retry-After"""
+        env = {
+            "API_TOKEN": "valid-token",
+            "QUEUE_URL": "q",
+            "RATE_LIMIT_RATE": "1",
+            "RATE_LIMIT_BURST": "2",
+        }
+        event = {
+            "resource": "/tasks/batch",
+            "headers": {"X-Api-Key": "valid-token"},
+            "body": json.dumps([{}, {}, {}]),
+        }
+
+        with patch.dict(os.environ, env):
+            response = main(event, None)
+
+        assert response["statusCode"] == 429
+        assert "headers" not in response
+        mock_get_client.assert_not_called()
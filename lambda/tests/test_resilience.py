@@ -0,0 +1,310 @@
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_handler"))
+
+from handler import main
+from resilience import (STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN,
+                        CircuitBreaker, QueueUnavailableError,
+                        attempt_timeouts, budget_deadline, call_sqs,
+                        error_kind, get_circuit_breaker, snapshot, stats)
+from server import SendCoalescer, TaskApiServer
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "SendMessage")
+
+
+THROTTLED = _client_error("ThrottlingException")
+
+
+class TestErrorKind:
+    """Tests for the error_kind function"""
+
+    def test_classifies_errors(self):
+        """Test that throttling, transient and permanent errors are told apart"""
+        assert error_kind(THROTTLED) == "throttled"
+        assert error_kind(_client_error("ServiceUnavailable")) == "transient"
+        assert error_kind(EndpointConnectionError(endpoint_url="x")) == "transient"
+        assert error_kind(_client_error("AccessDenied")) is None
+        assert error_kind(ValueError("bad")) is None
+
+
+class TestCircuitBreaker:
+    """Tests for the CircuitBreaker class"""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the threshold of consecutive failures opens the breaker"""
+        breaker = CircuitBreaker(failure_threshold=3, clock=FakeClock())
+
+        assert not breaker.record_failure()
+        breaker.record_success()
+        assert not breaker.record_failure()
+        assert not breaker.record_failure()
+        assert breaker.record_failure()
+
+        assert breaker.state == STATE_OPEN
+        assert not breaker.allow()
+
+    def test_half_open_lets_one_probe_through(self):
+        """Test that a single probe goes out once the reset time passed"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+        breaker.record_failure()
+
+        assert breaker.retry_after() == 10
+        clock.now += 10
+
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+
+    def test_probe_outcome_closes_or_reopens(self):
+        """Test that the probe's success closes and its failure reopens"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+        breaker.allow()
+
+        assert breaker.record_failure()
+        assert breaker.state == STATE_OPEN
+
+        clock.now += 10
+        breaker.allow()
+        breaker.record_success()
+        assert breaker.state == STATE_CLOSED
+
+
+class TestCallSqs:
+    """Tests for the call_sqs function"""
+
+    def test_retries_throttling_with_jittered_backoff(self):
+        """Test that throttled calls are retried with bounded, growing delays"""
+        clock = FakeClock()
+        operation = MagicMock(side_effect=[THROTTLED, THROTTLED, {"MessageId": "m"}])
+        delays = []
+
+        with patch.dict(
+            os.environ, {"SQS_BACKOFF_BASE_MS": "100", "SQS_BACKOFF_MAX_MS": "150"}
+        ):
+            response = call_sqs(
+                operation,
+                breaker=CircuitBreaker(clock=clock),
+                sleep=delays.append,
+                QueueUrl="q",
+            )
+
+        assert response == {"MessageId": "m"}
+        assert operation.call_count == 3
+        assert 0 <= delays[0] <= 0.1 and 0 <= delays[1] <= 0.15
+        assert stats.snapshot()["retries"] == 2
+        assert stats.snapshot()["throttled"] == 2
+
+    def test_gives_up_after_max_attempts(self):
+        """Test that persistent throttling becomes a QueueUnavailableError"""
+        operation = MagicMock(side_effect=THROTTLED)
+
+        with patch.dict(os.environ, {"SQS_MAX_ATTEMPTS": "4"}):
+            with pytest.raises(QueueUnavailableError):
+                call_sqs(operation, breaker=CircuitBreaker(), sleep=lambda _: None)
+
+        assert operation.call_count == 4
+        assert stats.snapshot()["failures"] == 1
+
+    def test_permanent_errors_are_not_retried(self):
+        """Test that errors retrying cannot fix are raised at once"""
+        operation = MagicMock(side_effect=_client_error("AccessDenied"))
+        breaker = CircuitBreaker(failure_threshold=1)
+
+        with pytest.raises(ClientError):
+            call_sqs(operation, breaker=breaker, sleep=lambda _: None)
+
+        assert operation.call_count == 1
+        assert breaker.state == STATE_CLOSED
+
+    def test_permanent_errors_do_not_reset_failures(self):
+        """Test that a bad request neither counts as a success nor a failure"""
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+
+        with pytest.raises(ClientError):
+            call_sqs(
+                MagicMock(side_effect=_client_error("AccessDenied")),
+                breaker=breaker,
+                sleep=lambda _: None,
+            )
+
+        assert breaker.record_failure()
+
+    def test_permanent_error_on_probe_keeps_breaker_half_open(self):
+        """Test that a bad request as the probe lets the next probe through"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+
+        with pytest.raises(ClientError):
+            call_sqs(
+                MagicMock(side_effect=_client_error("AccessDenied")),
+                breaker=breaker,
+                sleep=lambda _: None,
+            )
+
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow()
+
+    def test_stops_within_the_latency_budget(self):
+        """Test that no retry is made that would end after the deadline"""
+        clock = FakeClock()
+        operation = MagicMock(side_effect=THROTTLED)
+
+        with patch("resilience.random.uniform", return_value=200):
+            with pytest.raises(QueueUnavailableError, match="budget"):
+                call_sqs(
+                    operation,
+                    deadline=clock.now + 0.1,
+                    breaker=CircuitBreaker(clock=clock),
+                    sleep=clock.sleep,
+                    clock=clock,
+                )
+
+        assert operation.call_count == 1
+        assert stats.snapshot()["budget_exhausted"] == 1
+
+    def test_open_breaker_fails_fast(self):
+        """Test that calls are refused without reaching SQS once the breaker opened"""
+        operation = MagicMock(side_effect=THROTTLED)
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+
+        with patch.dict(os.environ, {"SQS_MAX_ATTEMPTS": "5"}):
+            with pytest.raises(QueueUnavailableError):
+                call_sqs(operation, breaker=breaker, sleep=lambda _: None)
+            with pytest.raises(QueueUnavailableError) as excinfo:
+                call_sqs(operation, breaker=breaker, sleep=lambda _: None)
+
+        assert operation.call_count == 2
+        assert excinfo.value.retry_after > 0
+        assert stats.snapshot()["breaker_opened"] == 1
+        assert stats.snapshot()["short_circuited"] == 2
+
+    def test_attempt_timeouts_split_the_budget(self):
+        """Test that each attempt gets an equal share of SQS_CALL_BUDGET_MS"""
+        env = {"SQS_CALL_BUDGET_MS": "4000", "SQS_MAX_ATTEMPTS": "2"}
+        with patch.dict(os.environ, env):
+            assert attempt_timeouts() == {"connect_timeout": 1.0, "read_timeout": 1.0}
+
+    def test_budget_deadline(self):
+        """Test that the budget leaves the margin of the remaining Lambda time"""
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 3000
+
+        with patch("resilience.time.monotonic", return_value=100.0):
+            assert budget_deadline(context) == pytest.approx(102.5)
+        assert budget_deadline(None) is None
+
+    def test_snapshot_includes_breaker_state(self):
+        """Test that the exposed counters include the breaker state"""
+        get_circuit_breaker()
+
+        assert snapshot()["breaker_state"] == STATE_CLOSED
+        assert "retries" in snapshot()
+
+
+@pytest.fixture
+def api_env():
+    """Fixture providing the API environment with quick retries"""
+    env = {
+        "API_TOKEN": "valid-token",
+        "QUEUE_URL": "q",
+        "SQS_MAX_ATTEMPTS": "2",
+        "SQS_BACKOFF_BASE_MS": "1",
+        "SQS_BREAKER_FAILURE_THRESHOLD": "2",
+    }
+    with patch.dict(os.environ, env):
+        yield
+
+
+class TestHandlerResilience:
+    """Tests for resilient SQS sends in the API handler"""
+
+    @patch("handler.get_sqs_client")
+    def test_throttling_storm_answers_503(self, mock_get_client, api_env):
+        """Test that throttling answers 503, then fails fast with Retry-After"""
+        mock_client = MagicMock()
+        mock_client.send_message.side_effect = THROTTLED
+        mock_get_client.return_value = mock_client
+        event = {"headers": {"x-api-key": "valid-token"}, "body": json.dumps({"title": "Test"})}
+
+        first = main(event, None)
+        second = main(event, None)
+
+        assert first["statusCode"] == 503
+        assert second["statusCode"] == 503
+        assert second["headers"]["Retry-After"] == "30"
+        assert mock_client.send_message.call_count == 2
+
+    @patch("handler.get_sqs_client")
+    def test_transient_error_is_retried(self, mock_get_client, api_env):
+        """Test that a single throttle does not fail the request"""
+        mock_client = MagicMock()
+        mock_client.send_message.side_effect = [THROTTLED, {"MessageId": "m"}]
+        mock_get_client.return_value = mock_client
+        event = {"headers": {"x-api-key": "valid-token"}, "body": json.dumps({"title": "Test"})}
+
+        assert main(event, None)["statusCode"] == 200
+
+    @patch("handler.get_sqs_client")
+    def test_unavailable_batch_answers_503(self, mock_get_client, api_env):
+        """Test that a batch that could not reach SQS answers 503"""
+        mock_client = MagicMock()
+        mock_client.send_message_batch.side_effect = THROTTLED
+        mock_get_client.return_value = mock_client
+        event = {
+            "resource": "/tasks/batch",
+            "headers": {"x-api-key": "valid-token"},
+            "body": json.dumps([{"title": "a"}, {"title": "b"}]),
+        }
+
+        response = main(event, None)
+
+        assert response["statusCode"] == 503
+        assert json.loads(response["body"])["failed"] == 2
+
+    @patch("handler.get_sqs_client")
+    def test_server_answers_503(self, mock_get_client, api_env):
+        """Test that the container server also answers 503"""
+        mock_client = MagicMock()
+        mock_client.send_message_batch.side_effect = THROTTLED
+        mock_get_client.return_value = mock_client
+        event = {
+            "httpMethod": "POST",
+            "path": "/tasks",
+            "headers": {"x-api-key": "valid-token"},
+            "body": json.dumps({"title": "Test"}),
+        }
+
+        server = TaskApiServer(SendCoalescer(window_seconds=0))
+        response = asyncio.run(server.handle(event))
+
+        assert response["statusCode"] == 503
@@ -0,0 +1,198 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from result_store import (STATUS_FAILED, STATUS_SUCCEEDED, FileBackend,
+                          InMemoryBackend, ResultStore, SQLiteBackend,
+                          get_result_store)
+from sqs_client import to_lambda_event
+from sqs_emulator import get_emulator
+from task_handler import process
+
+QUEUE_URL = "http://localhost:4566/000000000000/tasks.fifo"
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def backend(request, tmp_path):
+    """Fixture providing each result store backend"""
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "results.sqlite3"))
+    if request.param == "file":
+        return FileBackend(str(tmp_path / "results.jsonl"))
+    return InMemoryBackend()
+
+
+class TestResultStore:
+    """Tests for the ResultStore class"""
+
+    def test_results_are_written_on_flush(self, backend):
+        """Test that results are only written by flush, all at once"""
+        store = ResultStore(backend)
+        store.record(task_id="task-1", status=STATUS_SUCCEEDED, attempts=1)
+        store.record(task_id="task-2", status=STATUS_FAILED, error="boom")
+
+        assert store.get("task-1") is None
+        assert store.flush() == 2
+        assert store.flush() == 0
+
+        assert store.get("task-1")["status"] == STATUS_SUCCEEDED
+        assert store.get("task-2")["error"] == "boom"
+        assert store.get("task-2")["processing_ms"] is None
+
+    def test_latest_result_wins(self, backend):
+        """Test that a redelivery's result replaces the earlier one"""
+        store = ResultStore(backend)
+        store.record(task_id="task-1", status=STATUS_FAILED, attempts=1)
+        store.flush()
+        store.record(task_id="task-1", status=STATUS_SUCCEEDED, attempts=2)
+        store.flush()
+
+        result = store.get("task-1")
+        assert result["status"] == STATUS_SUCCEEDED
+        assert result["attempts"] == 2
+
+    def test_failed_write_keeps_results(self):
+        """Test that results of a failed write are retried on the next flush"""
+        backend = MagicMock()
+        backend.write_many.side_effect = [OSError("disk full"), None]
+        store = ResultStore(backend, max_buffered=2)
+        for i in range(3):
+            store.record(task_id=f"task-{i}", status=STATUS_SUCCEEDED)
+
+        with pytest.raises(OSError):
+            store.flush()
+        assert store.pending() == 2
+
+        store.flush()
+        written = backend.write_many.call_args.args[0]
+        assert [result["task_id"] for result in written] == ["task-1", "task-2"]
+
+    def test_store_is_configured_by_the_environment(self, tmp_path):
+        """Test that results are off unless RESULT_STORE_BACKEND is set"""
+        with patch.dict(os.environ, {}, clear=True):
+            assert get_result_store() is None
+
+        env = {
+            "RESULT_STORE_BACKEND": "file",
+            "RESULT_STORE_PATH": str(tmp_path / "results.jsonl"),
+        }
+        with patch.dict(os.environ, env):
+            store = get_result_store()
+            assert store is get_result_store()
+            assert isinstance(store.backend, FileBackend)
+
+        with patch.dict(os.environ, {"RESULT_STORE_BACKEND": "redis"}):
+            with pytest.raises(ValueError):
+                get_result_store()
+
+
+def _record(message_id, task_id, group_id="tasks", receive_count="1"):
+    return {
+        "messageId": message_id,
+        "body": json.dumps({"task_id": task_id, "task_type": "email"}),
+        "attributes": {
+            "MessageGroupId": group_id,
+            "ApproximateReceiveCount": receive_count,
+        },
+    }
+
+
+@pytest.fixture
+def memory_store():
+    """Fixture enabling the in-memory result store"""
+    with patch.dict(os.environ, {"RESULT_STORE_BACKEND": "memory"}):
+        yield get_result_store()
+
+
+class TestProcessResults:
+    """Tests for the results written by the process Lambda handler"""
+
+    @patch("task_handler.process_task")
+    def test_outcomes_are_written_once_per_invocation(
+        self, mock_process_task, memory_store
+    ):
+        """Test that a batch's results take a single backend write"""
+        mock_process_task.side_effect = [None, ValueError("boom"), None]
+        records = [
+            _record("msg-1", "task-1", group_id="a"),
+            _record("msg-2", "task-2", group_id="b", receive_count="3"),
+            _record("msg-3", "task-3", group_id="b"),
+        ]
+
+        process({"Records": records}, None)
+
+        assert memory_store.backend.writes == 1
+        succeeded = memory_store.get("task-1")
+        assert succeeded["status"] == STATUS_SUCCEEDED
+        assert succeeded["processing_ms"] is not None
+        assert succeeded["priority"] == "medium"
+
+        failed = memory_store.get("task-2")
+        assert failed["status"] == STATUS_FAILED
+        assert failed["error"] == "boom"
+        assert failed["attempts"] == 3
+
+        skipped = memory_store.get("task-3")
+        assert skipped["status"] == STATUS_FAILED
+        assert skipped["error"] == "Not processed"
+
+    def test_undecodable_messages_are_keyed_by_message_id(self, memory_store):
+        """Test that a bad body is recorded under its message id"""
+        record = {"messageId": "msg-1", "body": "not json", "attributes": {}}
+
+        process({"Records": [record]}, None)
+
+        result = memory_store.get("msg-1")
+        assert result["status"] == STATUS_FAILED
+        assert "Invalid JSON" in result["error"]
+
+    @patch("task_handler.process_task")
+    def test_write_failure_does_not_fail_the_batch(
+        self, mock_process_task, memory_store, capsys
+    ):
+        """Test that a failed write is logged and the batch still succeeds"""
+        with patch.object(
+            memory_store.backend, "write_many", side_effect=OSError("disk full")
+        ):
+            response = process({"Records": [_record("msg-1", "task-1")]}, None)
+
+        assert response["batchItemFailures"] == []
+        assert memory_store.pending() == 1
+        assert "Failed to write task results" in capsys.readouterr().out
+
+    def test_results_are_found_by_the_api_task_id(self, mock_env_local, memory_store):
+        """Test that a client finds its outcome under the task_id it was given"""
+        import handler
+
+        env = {**mock_env_local, "SQS_BACKEND": "memory", "QUEUE_URL": QUEUE_URL}
+        headers = {"x-api-key": "test-token"}
+        with patch.dict(os.environ, env):
+            single = handler.main(
+                {"headers": headers, "body": json.dumps({"title": "Welcome"})}, None
+            )
+            batch = handler.main(
+                {
+                    "path": "/tasks/batch",
+                    "headers": headers,
+                    "body": json.dumps([{"title": "First"}, {"title": "Second"}]),
+                },
+                None,
+            )
+
+            messages = get_emulator().receive_message(
+                QueueUrl=QUEUE_URL, MaxNumberOfMessages=10
+            )["Messages"]
+            process(to_lambda_event(messages), None)
+
+        task_ids = [json.loads(single["body"])["task_id"]] + [
+            result["task_id"] for result in json.loads(batch["body"])["results"]
+        ]
+        assert len(task_ids) == 3
+        for task_id in task_ids:
+            assert memory_store.get(task_id)["status"] == STATUS_SUCCEEDED
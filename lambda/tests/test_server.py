@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_handler"))
+
+from server import SendCoalescer, SendError, TaskApiServer
+
+
+def _accept_all(QueueUrl, Entries):
+    return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+
+def _event(path="/tasks", body=None, method="POST"):
+    return {
+        "httpMethod": method,
+        "path": path,
+        "headers": {"x-api-key": "valid-token"},
+        "body": json.dumps(body if body is not None else {"title": "Test"}),
+    }
+
+
+@pytest.fixture
+def mock_client():
+    """Fixture patching the SQS client used by the server"""
+    client = MagicMock()
+    client.send_message_batch.side_effect = _accept_all
+    with patch("handler.get_sqs_client", return_value=client):
+        yield client
+
+
+@pytest.fixture
+def server_env():
+    """Fixture providing the server's environment"""
+    with patch.dict(os.environ, {"API_TOKEN": "valid-token", "QUEUE_URL": "q"}):
+        yield
+
+
+class TestSendCoalescer:
+    """Tests for the SendCoalescer class"""
+
+    def test_concurrent_sends_share_a_batch(self, mock_client, server_env):
+        """Test that sends within the window go out in one call"""
+
+        async def run():
+            coalescer = SendCoalescer(window_seconds=0.01)
+            await asyncio.gather(
+                *(coalescer.send({"MessageBody": str(i)}) for i in range(5))
+            )
+            return coalescer
+
+        coalescer = asyncio.run(run())
+
+        mock_client.send_message_batch.assert_called_once()
+        entries = mock_client.send_message_batch.call_args.kwargs["Entries"]
+        assert [entry["MessageBody"] for entry in entries] == list("01234")
+        assert coalescer.batches_sent == 1
+        assert coalescer.messages_sent == 5
+
+    def test_batch_sizes_are_counted(self, mock_client, server_env):
+        """Test that the coalesced batch size is recorded as a count"""
+        import server
+
+        async def run():
+            coalescer = SendCoalescer(window_seconds=0.01)
+            await asyncio.gather(
+                *(coalescer.send({"MessageBody": "m"}) for _ in range(3))
+            )
+
+        with patch.object(server.metrics, "flush"):
+            asyncio.run(run())
+            document = server.metrics.documents()[0]
+
+        definitions = document["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+        assert document["CoalescedBatchSize"] == 3
+        assert {"Name": "CoalescedBatchSize", "Unit": "Count"} in definitions
+
+    def test_full_batches_do_not_wait_for_the_window(self, mock_client, server_env):
+        """Test that max_batch_size splits a burst without waiting a full window"""
+
+        async def run():
+            coalescer = SendCoalescer(window_seconds=60, max_batch_size=4)
+            await asyncio.wait_for(
+                asyncio.gather(
+                    *(coalescer.send({"MessageBody": str(i)}) for i in range(8))
+                ),
+                timeout=5,
+            )
+
+        asyncio.run(run())
+
+        sizes = [
+            len(call.kwargs["Entries"])
+            for call in mock_client.send_message_batch.call_args_list
+        ]
+        assert sizes == [4, 4]
+
+    def test_batch_size_is_capped_by_sqs(self):
+        """Test that batches never exceed the ten entries SQS accepts"""
+        assert SendCoalescer(max_batch_size=50).max_batch_size == 10
+
+    def test_failed_entry_is_raised_to_its_caller_only(self, mock_client, server_env):
+        """Test that a per-entry failure does not fail the rest of the batch"""
+        mock_client.send_message_batch.side_effect = lambda QueueUrl, Entries: {
+            "Failed": [{"Id": "1", "Code": "InternalError", "Message": "boom"}]
+        }
+
+        async def run():
+            coalescer = SendCoalescer(window_seconds=0.01)
+            return await asyncio.gather(
+                *(coalescer.send({"MessageBody": str(i)}) for i in range(3)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], SendError)
+        assert results[1].code == "InternalError"
+
+    def test_client_error_fails_the_whole_batch(self, mock_client, server_env):
+        """Test that an exception from send_message_batch reaches every caller"""
+        mock_client.send_message_batch.side_effect = RuntimeError("unreachable")
+
+        async def run():
+            coalescer = SendCoalescer(window_seconds=0.01)
+            return await asyncio.gather(
+                *(coalescer.send({"MessageBody": str(i)}) for i in range(2)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+
+class TestTaskApiServer:
+    """Tests for the TaskApiServer class"""
+
+    def test_single_tasks_are_coalesced(self, mock_client, server_env):
+        """Test that concurrent POST /tasks requests are sent in one batch"""
+
+        async def run():
+            server = TaskApiServer(SendCoalescer(window_seconds=0.01))
+            return await asyncio.gather(*(server.handle(_event()) for _ in range(3)))
+
+        responses = asyncio.run(run())
+
+        assert [response["statusCode"] for response in responses] == [200] * 3
+        task_ids = {json.loads(r["body"])["task_id"] for r in responses}
+        assert len(task_ids) == 3
+        mock_client.send_message_batch.assert_called_once()
+        mock_client.send_message.assert_not_called()
+
+    def test_requests_are_admitted_off_the_event_loop(self, mock_client, server_env):
+        """Test that authentication and message building run in a worker thread"""
+        import handler
+
+        threads = []
+        admit_request = handler.admit_request
+
+        def record_thread(event):
+            threads.append(threading.get_ident())
+            return admit_request(event)
+
+        with patch("handler.admit_request", side_effect=record_thread):
+            response = asyncio.run(TaskApiServer().handle(_event()))
+
+        assert response["statusCode"] == 200
+        assert threads and threads[0] != threading.get_ident()
+
+    def test_unauthorized(self, mock_client, server_env):
+        """Test that a bad key is rejected before anything is sent"""
+        event = {**_event(), "headers": {"x-api-key": "wrong"}}
+
+        response = asyncio.run(TaskApiServer().handle(event))
+
+        assert response["statusCode"] == 401
+        mock_client.send_message_batch.assert_not_called()
+
+    def test_invalid_json(self, mock_client, server_env):
+        """Test that an unparsable body answers 400"""
+        event = {**_event(), "body": "{not json"}
+
+        response = asyncio.run(TaskApiServer().handle(event))
+
+        assert response["statusCode"] == 400
+
+    def test_invalid_task_answers_400(self, mock_client, server_env):
+        """Test that a task failing validation lists its errors"""
+        response = asyncio.run(TaskApiServer().handle(_event(body={"title": 7})))
+
+        assert response["statusCode"] == 400
+        assert json.loads(response["body"])["errors"][0]["field"] == "title"
+        mock_client.send_message_batch.assert_not_called()
+
+    def test_failed_send_answers_502(self, mock_client, server_env):
+        """Test that a rejected entry answers 502"""
+        mock_client.send_message_batch.side_effect = RuntimeError("unreachable")
+
+        response = asyncio.run(
+            TaskApiServer(SendCoalescer(window_seconds=0)).handle(_event())
+        )
+
+        assert response["statusCode"] == 502
+
+    def test_batch_requests_use_the_lambda_handler(self, mock_client, server_env):
+        """Test that POST /tasks/batch is answered like the Lambda handler"""
+        event = _event("/tasks/batch", [{"title": "a"}, {"title": "b"}])
+        response = asyncio.run(TaskApiServer().handle(event))
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"])["succeeded"] == 2
+
+    def test_health_and_method(self, mock_client, server_env):
+        """Test the health check and that other methods are refused"""
+        server = TaskApiServer()
+
+        assert (
+            asyncio.run(server.handle(_event("/health", method="GET")))["statusCode"]
+            == 200
+        )
+        assert asyncio.run(server.handle(_event(method="GET")))["statusCode"] == 405
+
+    def test_unknown_paths_answer_404(self, mock_client, server_env):
+        """Test that only the task paths queue messages"""
+        server = TaskApiServer(SendCoalescer(window_seconds=0))
+
+        for path in ("/anything", "/tasks/other", "/"):
+            assert asyncio.run(server.handle(_event(path)))["statusCode"] == 404
+
+        mock_client.send_message_batch.assert_not_called()
+        assert asyncio.run(server.handle(_event("/tasks/")))["statusCode"] == 200
+
+    def test_asgi_round_trip(self, mock_client, server_env):
+        """Test a request through the ASGI interface, including the lifespan"""
+        sent = []
+
+        async def run():
+            server = TaskApiServer(SendCoalescer(window_seconds=0.01))
+            lifespan = iter(
+                [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+            )
+            request = iter(
+                [
+                    {"type": "http.request", "body": b'{"title":', "more_body": True},
+                    {"type": "http.request", "body": b'"Test"}'},
+                ]
+            )
+
+            async def receive_lifespan():
+                return next(lifespan)
+
+            async def receive_request():
+                return next(request)
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {
+                "type": "http",
+                "method": "POST",
+                "path": "/tasks",
+                "headers": [(b"x-api-key", b"valid-token")],
+            }
+            await server(scope, receive_request, send)
+            await server({"type": "lifespan"}, receive_lifespan, send)
+
+        asyncio.run(run())
+
+        assert sent[0]["type"] == "http.response.start"
+        assert sent[0]["status"] == 200
+        assert json.loads(sent[1]["body"])["task_id"]
+        assert sent[-1] == {"type": "lifespan.shutdown.complete"}
@@ -0,0 +1,59 @@
+import os
+import sys
+from unittest.mock import ANY, MagicMock, patch
+
+# Add the shared layer directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared", "python"))
+
+from sqs_clients import get_sqs_client
+
+PRODUCTION_ENV = {
+    "ENVIRONMENT": "production",
+    "AWS_SQS_ENDPOINT_URL": "https://sqs.us-west-2.amazonaws.com",
+    "AWS_REGION": "us-west-2",
+    "AWS_ACCESS_KEY_ID": "prod-key",
+    "AWS_SECRET_ACCESS_KEY": "prod-secret",
+}
+
+
+class TestGetSqsClient:
+    """Tests for the shared get_sqs_client function"""
+
+    @patch("sqs_clients.boto3.client")
+    def test_task_processor_client_uses_environment_credentials(self, mock_boto_client):
+        """Test that the processor's client gets the same endpoint and keys"""
+        import heartbeat
+
+        with patch.dict(os.environ, PRODUCTION_ENV):
+            heartbeat.get_sqs_client()
+
+        mock_boto_client.assert_called_once_with(
+            "sqs",
+            endpoint_url="https://sqs.us-west-2.amazonaws.com",
+            region_name="us-west-2",
+            aws_access_key_id="prod-key",
+            aws_secret_access_key="prod-secret",
+            config=ANY,
+        )
+
+    @patch("sqs_clients.boto3.client")
+    def test_clients_are_cached_per_settings(self, mock_boto_client):
+        """Test that differently tuned clients do not evict each other"""
+        mock_boto_client.side_effect = [MagicMock(), MagicMock()]
+
+        with patch.dict(os.environ, PRODUCTION_ENV):
+            default = get_sqs_client()
+            tuned = get_sqs_client({"read_timeout": 1.0})
+
+            assert default is not tuned
+            assert get_sqs_client() is default
+            assert get_sqs_client({"read_timeout": 1.0}) is tuned
+
+        assert mock_boto_client.call_count == 2
+
+    def test_memory_backend_returns_the_emulator(self):
+        """Test that SQS_BACKEND=memory returns the in-process emulator"""
+        import sqs_emulator
+
+        with patch.dict(os.environ, {"SQS_BACKEND": "memory"}):
+            assert get_sqs_client() is sqs_emulator.get_emulator()
@@ -0,0 +1,337 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the shared layer and task processor directories to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared", "python"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+from sqs_client import to_lambda_event
+from sqs_emulator import EmulatorError, InMemorySQS, dlq_url_for, get_emulator
+
+QUEUE_URL = "http://localhost:4566/000000000000/tasks.fifo"
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """Fixture providing a manually advanced clock"""
+    return FakeClock()
+
+
+@pytest.fixture
+def sqs(clock):
+    """Fixture providing an emulator with the messaging stack defaults"""
+    return InMemorySQS(clock=clock)
+
+
+def _send(sqs, body, group_id="tasks", dedup_id=None):
+    kwargs = {"MessageGroupId": group_id}
+    if dedup_id is not None:
+        kwargs["MessageDeduplicationId"] = dedup_id
+    return sqs.send_message(QueueUrl=QUEUE_URL, MessageBody=body, **kwargs)
+
+
+def _receive(sqs, max_messages=10, url=QUEUE_URL):
+    return sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=max_messages).get(
+        "Messages", []
+    )
+
+
+class TestFifoOrdering:
+    """Tests for message group ordering"""
+
+    def test_messages_of_a_group_are_received_in_order(self, sqs):
+        """Test that a group's messages are delivered in send order"""
+        for i in range(3):
+            _send(sqs, f"m{i}")
+
+        assert [m["Body"] for m in _receive(sqs)] == ["m0", "m1", "m2"]
+
+    def test_group_is_locked_while_in_flight(self, sqs):
+        """Test that later messages of a group wait for the in-flight ones"""
+        _send(sqs, "a0", group_id="a")
+        _send(sqs, "a1", group_id="a")
+        _send(sqs, "b0", group_id="b")
+
+        first = _receive(sqs, max_messages=1)
+        second = _receive(sqs)
+
+        assert [m["Body"] for m in first] == ["a0"]
+        assert [m["Body"] for m in second] == ["b0"]
+
+        sqs.delete_message(QueueUrl=QUEUE_URL, ReceiptHandle=first[0]["ReceiptHandle"])
+
+        assert [m["Body"] for m in _receive(sqs)] == ["a1"]
+
+    def test_locked_groups_are_not_scanned(self, sqs, clock):
+        """Test that receives only visit groups that may have a visible message"""
+        for i in range(100):
+            _send(sqs, f"m{i}", group_id=f"g{i}")
+        for _ in range(10):
+            _receive(sqs)
+
+        queue = sqs._queues[QUEUE_URL]
+        assert not queue.ready
+        assert _receive(sqs) == []
+
+        clock.advance(31)
+        assert len(_receive(sqs)) == 10
+        assert len(queue.ready) == 90
+
+    def test_group_is_unlocked_when_its_head_is_deleted(self, sqs):
+        """Test that deleting the in-flight message makes the next one receivable"""
+        _send(sqs, "a0", group_id="a")
+        _send(sqs, "a1", group_id="a")
+        first = _receive(sqs, max_messages=1)
+
+        sqs.delete_message(QueueUrl=QUEUE_URL, ReceiptHandle=first[0]["ReceiptHandle"])
+        _send(sqs, "b0", group_id="b")
+
+        assert [m["Body"] for m in _receive(sqs)] == ["a1", "b0"]
+
+    def test_group_id_is_required(self, sqs):
+        """Test that FIFO sends without a MessageGroupId are rejected"""
+        with pytest.raises(EmulatorError) as exc_info:
+            sqs.send_message(QueueUrl=QUEUE_URL, MessageBody="m")
+
+        assert exc_info.value.code == "MissingParameter"
+
+    def test_received_attributes(self, sqs):
+        """Test that FIFO attributes are reported on received messages"""
+        _send(sqs, "m", group_id="tenant-1")
+
+        attributes = _receive(sqs)[0]["Attributes"]
+
+        assert attributes["MessageGroupId"] == "tenant-1"
+        assert attributes["ApproximateReceiveCount"] == "1"
+        assert attributes["SequenceNumber"].isdigit()
+
+
+class TestDeduplication:
+    """Tests for the deduplication window"""
+
+    def test_explicit_deduplication_id(self, sqs):
+        """Test that a repeated MessageDeduplicationId is only queued once"""
+        first = _send(sqs, "m", dedup_id="task-1")
+        second = _send(sqs, "other body", dedup_id="task-1")
+
+        assert first["MessageId"] == second["MessageId"]
+        assert len(_receive(sqs)) == 1
+
+    def test_content_based_deduplication(self, sqs):
+        """Test that identical bodies without an id are deduplicated"""
+        _send(sqs, "same")
+        _send(sqs, "same")
+
+        assert len(_receive(sqs)) == 1
+
+    def test_window_expires(self, sqs, clock):
+        """Test that a duplicate is accepted again after five minutes"""
+        _send(sqs, "m", dedup_id="task-1")
+        clock.advance(301)
+        _send(sqs, "m", dedup_id="task-1")
+
+        assert len(_receive(sqs)) == 2
+
+
+class TestVisibility:
+    """Tests for visibility timeouts and receipt handles"""
+
+    def test_unacknowledged_message_is_redelivered(self, sqs, clock):
+        """Test that a message reappears after its visibility timeout"""
+        _send(sqs, "m")
+        first = _receive(sqs)
+
+        assert _receive(sqs) == []
+
+        clock.advance(31)
+        second = _receive(sqs)
+
+        assert second[0]["MessageId"] == first[0]["MessageId"]
+        assert second[0]["ReceiptHandle"] != first[0]["ReceiptHandle"]
+        assert second[0]["Attributes"]["ApproximateReceiveCount"] == "2"
+
+    def test_change_message_visibility(self, sqs, clock):
+        """Test that visibility can be extended or released"""
+        _send(sqs, "m")
+        handle = _receive(sqs)[0]["ReceiptHandle"]
+
+        sqs.change_message_visibility(
+            QueueUrl=QUEUE_URL, ReceiptHandle=handle, VisibilityTimeout=0
+        )
+
+        assert len(_receive(sqs)) == 1
+
+    def test_unknown_receipt_handle(self, sqs):
+        """Test that deleting with an unknown handle is rejected"""
+        with pytest.raises(EmulatorError) as exc_info:
+            sqs.delete_message(QueueUrl=QUEUE_URL, ReceiptHandle="unknown")
+
+        assert exc_info.value.code == "ReceiptHandleIsInvalid"
+
+    def test_delete_message_batch_reports_failures(self, sqs):
+        """Test that batch deletes report unknown handles per entry"""
+        _send(sqs, "m")
+        handle = _receive(sqs)[0]["ReceiptHandle"]
+
+        response = sqs.delete_message_batch(
+            QueueUrl=QUEUE_URL,
+            Entries=[
+                {"Id": "0", "ReceiptHandle": handle},
+                {"Id": "1", "ReceiptHandle": "unknown"},
+            ],
+        )
+
+        assert response["Successful"] == [{"Id": "0"}]
+        assert [f["Id"] for f in response["Failed"]] == ["1"]
+
+
+class TestRedrive:
+    """Tests for the dead-letter queue redrive"""
+
+    def test_message_moves_to_dlq_after_max_receive_count(self, sqs, clock):
+        """Test that a message received three times is redriven to the DLQ"""
+        _send(sqs, "poison", group_id="a")
+        _send(sqs, "next", group_id="a")
+
+        for _ in range(3):
+            assert _receive(sqs, max_messages=1)[0]["Body"] == "poison"
+            clock.advance(31)
+
+        assert [m["Body"] for m in _receive(sqs)] == ["next"]
+        assert [m["Body"] for m in _receive(sqs, url=dlq_url_for(QUEUE_URL))] == [
+            "poison"
+        ]
+
+    def test_dlq_keeps_messages_for_its_own_retention_period(self, clock):
+        """Test that the DLQ drops messages after 14 days, the main queue after 4"""
+        sqs = InMemorySQS(max_receive_count=1, clock=clock)
+        _send(sqs, "poison", group_id="a")
+        _receive(sqs)
+        clock.advance(31)
+        # Redrives "poison" to the DLQ
+        assert _receive(sqs) == []
+        _send(sqs, "stale", group_id="b")
+
+        clock.advance(5 * 24 * 3600)
+        dlq_url = dlq_url_for(QUEUE_URL)
+        assert _receive(sqs) == []
+        assert [m["Body"] for m in _receive(sqs, url=dlq_url)] == ["poison"]
+
+        clock.advance(10 * 24 * 3600)
+        assert _receive(sqs, url=dlq_url) == []
+
+    def test_dlq_url(self):
+        """Test that the DLQ of a FIFO queue keeps the .fifo suffix"""
+        assert dlq_url_for(QUEUE_URL).endswith("/tasks-dlq.fifo")
+
+
+class TestBatchAndEvents:
+    """Tests for batch sends and Lambda event conversion"""
+
+    def test_send_message_batch(self, sqs):
+        """Test that batch entries are queued and reported as successful"""
+        response = sqs.send_message_batch(
+            QueueUrl=QUEUE_URL,
+            Entries=[
+                {"Id": str(i), "MessageBody": f"m{i}", "MessageGroupId": "tasks"}
+                for i in range(3)
+            ],
+        )
+
+        assert [entry["Id"] for entry in response["Successful"]] == ["0", "1", "2"]
+        assert "Failed" not in response
+
+    def test_batch_size_is_limited(self, sqs):
+        """Test that batches of more than ten entries are rejected"""
+        entries = [
+            {"Id": str(i), "MessageBody": f"m{i}", "MessageGroupId": "tasks"}
+            for i in range(11)
+        ]
+
+        with pytest.raises(EmulatorError):
+            sqs.send_message_batch(QueueUrl=QUEUE_URL, Entries=entries)
+
+    def test_to_lambda_event(self, sqs):
+        """Test that received messages convert to SQS Lambda records"""
+        _send(sqs, "m")
+
+        event = to_lambda_event(_receive(sqs))
+
+        record = event["Records"][0]
+        assert record["body"] == "m"
+        assert record["attributes"]["MessageGroupId"] == "tasks"
+        assert record["eventSource"] == "aws:sqs"
+
+    def test_to_lambda_event_message_attributes(self, sqs):
+        """Test that message attributes take the Lambda trigger's shape"""
+        sqs.send_message(
+            QueueUrl=QUEUE_URL,
+            MessageBody="m",
+            MessageGroupId="tasks",
+            MessageDeduplicationId="m",
+            MessageAttributes={"TraceId": {"DataType": "String", "StringValue": "t"}},
+        )
+
+        event = to_lambda_event(_receive(sqs))
+
+        attribute = event["Records"][0]["messageAttributes"]["TraceId"]
+        assert attribute["stringValue"] == "t"
+        assert attribute["dataType"] == "String"
+
+
+class TestEmulatorSelection:
+    """Tests for selecting the emulator through get_sqs_client"""
+
+    def test_get_sqs_client_returns_emulator(self):
+        """Test that SQS_BACKEND=memory selects the shared emulator"""
+        import handler
+
+        with patch.dict(os.environ, {"SQS_BACKEND": "memory"}):
+            assert handler.get_sqs_client() is get_emulator()
+
+    def test_end_to_end_through_both_handlers(self, mock_env_local):
+        """Test that a task sent by the API handler is processed and deleted"""
+        import handler
+        from task_handler import process
+
+        env = {**mock_env_local, "SQS_BACKEND": "memory", "QUEUE_URL": QUEUE_URL}
+        with patch.dict(os.environ, env):
+            body = {
+                "title": "Welcome",
+                "description": "Send welcome email",
+                "priority": "high",
+            }
+            response = handler.main(
+                {"headers": {"x-api-key": "test-token"}, "body": json.dumps(body)},
+                None,
+            )
+            assert response["statusCode"] == 200
+
+            sqs = get_emulator()
+            event = to_lambda_event(_receive(sqs, url=QUEUE_URL))
+            assert len(event["Records"]) == 1
+
+            result = process(event, None)
+            assert result["batchItemFailures"] == []
+
+            sqs.delete_message(
+                QueueUrl=QUEUE_URL, ReceiptHandle=event["Records"][0]["receiptHandle"]
+            )
+            assert _receive(sqs, url=QUEUE_URL) == []
@@ -0,0 +1,98 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the shared layer directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared", "python"))
+
+from structured_logger import (INFO, WARNING, LazyJson, StructuredLogger,
+                               buffered, get_logger)
+
+
+class TestStructuredLogger:
+    """Tests for the StructuredLogger class"""
+
+    def test_writes_one_json_object_per_line(self, capsys):
+        """Test that log lines are JSON with level, logger and message"""
+        logger = StructuredLogger("test", level="INFO")
+
+        logger.info("Processing task %s", "task-1", task_id="task-1")
+
+        entry = json.loads(capsys.readouterr().out)
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "test"
+        assert entry["message"] == "Processing task task-1"
+        assert entry["task_id"] == "task-1"
+
+    def test_messages_and_names_are_escaped(self, capsys):
+        """Test that quotes, newlines and non-ASCII text keep the line valid JSON"""
+        logger = StructuredLogger('say "hi"', level="INFO")
+
+        logger.info('Task "%s"\nfailed', "caf\u00e9", detail={"why": 'a "b"'})
+
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 1
+        entry = json.loads(lines[0])
+        assert entry["logger"] == 'say "hi"'
+        assert entry["message"] == 'Task "caf\u00e9"\nfailed'
+        assert entry["detail"] == {"why": 'a "b"'}
+        assert isinstance(entry["time"], float)
+
+    def test_disabled_levels_are_not_formatted(self, capsys):
+        """Test that arguments of disabled lines are never serialized"""
+        logger = StructuredLogger("test", level="INFO")
+
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("formatted a disabled line")
+
+        logger.debug("Event: %s", Exploding())
+
+        assert capsys.readouterr().out == ""
+
+    def test_level_is_read_from_environment(self):
+        """Test that LOG_LEVEL configures the minimum level"""
+        with patch.dict(os.environ, {"LOG_LEVEL": "warning"}):
+            logger = StructuredLogger("test")
+
+        assert logger.level == WARNING
+        assert not logger.is_enabled(INFO)
+
+    def test_lazy_json_serializes_on_demand(self, capsys):
+        """Test that LazyJson values are dumped only for enabled lines"""
+        logger = StructuredLogger("test", level="DEBUG")
+
+        logger.debug("Event: %s", LazyJson({"Records": []}))
+
+        assert json.loads(capsys.readouterr().out)["message"] == (
+            'Event: {"Records": []}'
+        )
+
+    def test_sampled_lines_are_dropped_but_warnings_kept(self, capsys):
+        """Test that sampling only drops lines below WARNING"""
+        logger = StructuredLogger("test", level="INFO", sample_rate=0.0)
+
+        logger.sampled(INFO, "noisy")
+        logger.sampled(WARNING, "important")
+
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line)["message"] for line in lines] == ["important"]
+
+    def test_buffered_lines_are_written_on_exit(self, capsys):
+        """Test that lines are held back until the invocation ends"""
+        logger = StructuredLogger("test", level="INFO")
+
+        with buffered():
+            logger.info("first")
+            logger.info("second")
+            assert capsys.readouterr().out == ""
+
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line)["message"] for line in lines] == ["first", "second"]
+
+    def test_get_logger_returns_shared_instance(self):
+        """Test that loggers are created once per name"""
+        assert get_logger("shared") is get_logger("shared")
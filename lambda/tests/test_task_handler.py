@@ -10,7 +10,28 @@ import pytest
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
 
 from task_handler import (handle_high_priority_task, handle_low_priority_task,
-                          handle_normal_priority_task, process, process_task)
+                          handle_medium_priority_task, process, process_task,
+                          registry)
+
+
+def _record(message_id, task_id, group_id=None, priority="high"):
+    """Builds an SQS record for a valid task"""
+    record = {
+        "messageId": message_id,
+        "body": json.dumps(
+            {
+                "task_id": task_id,
+                "task_type": "email",
+                "description": "Test",
+                "priority": priority,
+                "created_at": "2025-11-09T10:00:00",
+            }
+        ),
+        "attributes": {},
+    }
+    if group_id is not None:
+        record["attributes"]["MessageGroupId"] = group_id
+    return record
 
 
 class TestHandlePriorityTasks:
@@ -30,16 +51,16 @@ class TestHandlePriorityTasks:
         assert "email" in captured.out
         assert "Send email" in captured.out
 
-    def test_handle_normal_priority_task_prints_correct_message(self, capsys):
-        """Test that normal priority handler prints correct format"""
-        handle_normal_priority_task(
+    def test_handle_medium_priority_task_prints_correct_message(self, capsys):
+        """Test that medium priority handler prints correct format"""
+        handle_medium_priority_task(
             task_id="456",
             task_type="notification",
             description="Send notification",
             created_at="2025-11-09T10:00:00",
         )
         captured = capsys.readouterr()
-        assert "[NORMAL PRIORITY]" in captured.out
+        assert "[MEDIUM PRIORITY]" in captured.out
         assert "456" in captured.out
         assert "notification" in captured.out
         assert "Send notification" in captured.out
@@ -58,13 +79,21 @@ class TestHandlePriorityTasks:
         assert "cleanup" in captured.out
         assert "Cleanup logs" in captured.out
 
+    def test_handler_lines_are_sampled(self, capsys):
+        """Test that per-task handler lines follow LOG_SAMPLE_RATE"""
+        with patch("task_handler.logger.sample_rate", 0.0):
+            handle_low_priority_task("789", "cleanup", "Cleanup logs", None)
+
+        assert capsys.readouterr().out == ""
+
 
 class TestProcessTask:
     """Tests for the process_task function"""
 
-    @patch("task_handler.handle_high_priority_task")
-    def test_routes_high_priority_correctly(self, mock_high):
+    def test_routes_high_priority_correctly(self, capsys):
         """Test that high priority tasks are routed correctly"""
+        assert registry.resolve("email", "high") is handle_high_priority_task
+
         process_task(
             task_id="task-1",
             task_type="email",
@@ -72,27 +101,29 @@ class TestProcessTask:
             priority="high",
             created_at="2025-11-09T10:00:00",
         )
-        mock_high.assert_called_once_with(
-            "task-1", "email", "Test", "2025-11-09T10:00:00"
+        assert "[HIGH PRIORITY] Handling task task-1" in capsys.readouterr().out
+
+    def test_routes_medium_priority_correctly(self, capsys):
+        """Test that medium priority tasks are routed correctly"""
+        assert registry.resolve("notification", "medium") is (
+            handle_medium_priority_task
         )
 
-    @patch("task_handler.handle_normal_priority_task")
-    def test_routes_normal_priority_correctly(self, mock_normal):
-        """Test that normal priority tasks are routed correctly"""
         process_task(
             task_id="task-2",
             task_type="notification",
             description="Test",
-            priority="normal",
+            priority="medium",
             created_at="2025-11-09T10:00:00",
         )
-        mock_normal.assert_called_once_with(
-            "task-2", "notification", "Test", "2025-11-09T10:00:00"
-        )
+        output = capsys.readouterr().out
+        assert "[MEDIUM PRIORITY] Handling task task-2" in output
+        assert "No handler" not in output
 
-    @patch("task_handler.handle_low_priority_task")
-    def test_routes_low_priority_correctly(self, mock_low):
+    def test_routes_low_priority_correctly(self, capsys):
         """Test that low priority tasks are routed correctly"""
+        assert registry.resolve("cleanup", "low") is handle_low_priority_task
+
         process_task(
             task_id="task-3",
             task_type="cleanup",
@@ -100,20 +131,21 @@ class TestProcessTask:
             priority="low",
             created_at="2025-11-09T10:00:00",
         )
-        mock_low.assert_called_once_with(
-            "task-3", "cleanup", "Test", "2025-11-09T10:00:00"
+        assert "[LOW PRIORITY] Handling task task-3" in capsys.readouterr().out
+
+    def test_unknown_priority_routes_to_default_handler(self, capsys):
+        """Test that an unknown priority falls back to the medium handler"""
+        process_task(
+            task_id="task-4",
+            task_type="unknown",
+            description="Test",
+            priority="urgent",  # Invalid priority
+            created_at="2025-11-09T10:00:00",
         )
 
-    def test_raises_error_for_unknown_priority(self):
-        """Test that unknown priority raises TypeError (bug in original code)"""
-        with pytest.raises(TypeError, match="'NoneType' object is not callable"):
-            process_task(
-                task_id="task-4",
-                task_type="unknown",
-                description="Test",
-                priority="urgent",  # Invalid priority
-                created_at="2025-11-09T10:00:00",
-            )
+        output = capsys.readouterr().out
+        assert "No handler for task_type=unknown priority=urgent" in output
+        assert "[MEDIUM PRIORITY] Handling task task-4" in output
 
 
 class TestProcessFunction:
@@ -132,6 +164,7 @@ class TestProcessFunction:
                             "description": "Send welcome email",
                             "priority": "high",
                             "created_at": "2025-11-09T10:00:00",
+                            "payload": {"to": "a@example.com"},
                         }
                     )
                 }
@@ -143,7 +176,12 @@ class TestProcessFunction:
         assert result["statusCode"] == 200
         assert "Tasks processed successfully" in result["body"]
         mock_process_task.assert_called_once_with(
-            "test-123", "email", "Send welcome email", "high", "2025-11-09T10:00:00"
+            "test-123",
+            "email",
+            "Send welcome email",
+            "high",
+            "2025-11-09T10:00:00",
+            {"to": "a@example.com"},
         )
 
     @patch("task_handler.process_task")
@@ -225,7 +263,31 @@ class TestProcessFunction:
         process(event, None)
 
         call_args = mock_process_task.call_args[0]
-        assert call_args[3] == "normal"
+        assert call_args[3] == "medium"
+
+    def test_default_priority_tasks_use_the_default_handler(self, capsys):
+        """Test that medium and legacy normal tasks dispatch without a fallback"""
+        event = {
+            "Records": [
+                {
+                    "messageId": f"msg-{priority}",
+                    "body": json.dumps(
+                        {
+                            "task_id": f"task-{priority}",
+                            "task_type": "default",
+                            "priority": priority,
+                        }
+                    ),
+                }
+                for priority in ("medium", "normal")
+            ]
+        }
+
+        process(event, None)
+
+        output = capsys.readouterr().out
+        assert output.count("[MEDIUM PRIORITY] Handling task") == 2
+        assert "No handler" not in output
 
     @patch("task_handler.process_task")
     def test_generates_timestamp_when_missing(self, mock_process_task):
@@ -252,13 +314,14 @@ class TestProcessFunction:
         assert "T" in call_args[4]  # ISO format contains 'T'
 
     @patch("task_handler.process_task")
-    def test_raises_exception_on_processing_error(self, mock_process_task):
-        """Test that exceptions during processing are raised"""
+    def test_reports_failed_record_on_processing_error(self, mock_process_task):
+        """Test that processing errors are reported as batch item failures"""
         mock_process_task.side_effect = ValueError("Processing error")
 
         event = {
             "Records": [
                 {
+                    "messageId": "msg-1",
                     "body": json.dumps(
                         {
                             "task_id": "task-1",
@@ -267,45 +330,125 @@ class TestProcessFunction:
                             "priority": "high",
                             "created_at": "2025-11-09T10:00:00",
                         }
-                    )
+                    ),
                 }
             ]
         }
 
-        with pytest.raises(ValueError, match="Processing error"):
-            process(event, None)
+        result = process(event, None)
+
+        assert result["batchItemFailures"] == [{"itemIdentifier": "msg-1"}]
 
     @patch("task_handler.process_task")
     def test_handles_malformed_json_in_record(self, mock_process_task):
-        """Test that malformed JSON raises an exception"""
-        event = {"Records": [{"body": "invalid-json"}]}
+        """Test that malformed JSON is reported as a batch item failure"""
+        event = {"Records": [{"messageId": "msg-1", "body": "invalid-json"}]}
 
-        with pytest.raises(json.JSONDecodeError):
-            process(event, None)
+        result = process(event, None)
+
+        assert result["batchItemFailures"] == [{"itemIdentifier": "msg-1"}]
+        mock_process_task.assert_not_called()
 
     @patch("task_handler.process_task")
     def test_handles_missing_task_id(self, mock_process_task):
-        """Test that missing task_id raises KeyError"""
+        """Test that missing task_id is reported as a batch item failure"""
         event = {
             "Records": [
-                {"body": json.dumps({"task_type": "email", "description": "Test"})}
+                {
+                    "messageId": "msg-1",
+                    "body": json.dumps({"task_type": "email", "description": "Test"}),
+                }
             ]
         }
 
-        with pytest.raises(KeyError):
-            process(event, None)
+        result = process(event, None)
+
+        assert result["batchItemFailures"] == [{"itemIdentifier": "msg-1"}]
 
     @patch("task_handler.process_task")
     def test_handles_missing_task_type(self, mock_process_task):
-        """Test that missing task_type raises KeyError"""
+        """Test that missing task_type is reported as a batch item failure"""
         event = {
             "Records": [
-                {"body": json.dumps({"task_id": "task-1", "description": "Test"})}
+                {
+                    "messageId": "msg-1",
+                    "body": json.dumps({"task_id": "task-1", "description": "Test"}),
+                }
             ]
         }
 
-        with pytest.raises(KeyError):
-            process(event, None)
+        result = process(event, None)
+
+        assert result["batchItemFailures"] == [{"itemIdentifier": "msg-1"}]
+
+    @patch("task_handler.process_task")
+    def test_only_failed_records_are_reported(self, mock_process_task):
+        """Test that successful records are not retried with a failed one"""
+        mock_process_task.side_effect = [None, ValueError("boom"), None]
+
+        event = {
+            "Records": [
+                _record("msg-1", "task-1"),
+                _record("msg-2", "task-2"),
+                _record("msg-3", "task-3"),
+            ]
+        }
+
+        result = process(event, None)
+
+        assert result["batchItemFailures"] == [{"itemIdentifier": "msg-2"}]
+        assert mock_process_task.call_count == 3
+        assert "1 of 3 tasks failed" in result["body"]
+
+    @patch("task_handler.process_task")
+    def test_later_records_of_failed_group_are_reported(self, mock_process_task):
+        """Test that a FIFO group stops at its first failure to keep ordering"""
+
+        def fail_first_task(task_id, *args):
+            if task_id == "task-1":
+                raise ValueError("boom")
+
+        mock_process_task.side_effect = fail_first_task
+
+        event = {
+            "Records": [
+                _record("msg-1", "task-1", group_id="tenant-a"),
+                _record("msg-2", "task-2", group_id="tenant-b"),
+                _record("msg-3", "task-3", group_id="tenant-a"),
+            ]
+        }
+
+        result = process(event, None)
+
+        assert result["batchItemFailures"] == [
+            {"itemIdentifier": "msg-1"},
+            {"itemIdentifier": "msg-3"},
+        ]
+        processed = [c[0][0] for c in mock_process_task.call_args_list]
+        assert processed == ["task-1", "task-2"]
+
+    @patch("task_handler.process_task")
+    def test_async_handlers_are_awaited(self, mock_process_task, capsys):
+        """Test that an async handler completes before the task is reported"""
+        completed = []
+
+        async def async_handler():
+            completed.append(True)
+
+        mock_process_task.side_effect = lambda *args: async_handler()
+
+        result = process({"Records": [_record("msg-1", "task-1")]}, None)
+
+        assert result["batchItemFailures"] == []
+        assert completed == [True]
+        assert "Task task-1 processed successfully." in capsys.readouterr().out
+
+    @patch("task_handler.process_task")
+    def test_no_failures_reported_on_success(self, mock_process_task):
+        """Test that a fully successful batch reports no failures"""
+        result = process({"Records": [_record("msg-1", "task-1")]}, None)
+
+        assert result["batchItemFailures"] == []
 
     @patch("task_handler.process_task")
     def test_prints_received_event(self, mock_process_task, capsys):
@@ -355,3 +498,59 @@ class TestProcessFunction:
         captured = capsys.readouterr()
         assert "Processing task task-123:" in captured.out
         assert "Task task-123 processed successfully." in captured.out
+
+
+def _emf_documents(output):
+    return [
+        json.loads(line)
+        for line in output.splitlines()
+        if line.startswith("{") and '"_aws"' in line
+    ]
+
+
+class TestTraceTimings:
+    """Tests for the per-record ingest, queue and processing times"""
+
+    @patch("task_handler.process_task")
+    def test_timings_are_logged_and_recorded(self, mock_process_task, capsys):
+        """Test that the trace attributes give ingest-to-enqueue and queue wait"""
+        record = _record("msg-1", "task-1")
+        record["attributes"]["SentTimestamp"] = "1700000000250"
+        record["messageAttributes"] = {
+            "TraceId": {"stringValue": "trace-1", "dataType": "String"},
+            "IngestedAt": {"stringValue": "1700000000000", "dataType": "Number"},
+        }
+
+        with patch("task_handler.time.time", return_value=1700000001.25):
+            process({"Records": [record]}, None)
+
+        output = capsys.readouterr().out
+        timings = next(
+            json.loads(line)
+            for line in output.splitlines()
+            if '"Task timings"' in line
+        )
+        assert timings["trace_id"] == "trace-1"
+        assert timings["ingest_to_enqueue_ms"] == 250
+        assert timings["queue_wait_ms"] == 1000
+        assert "processing_ms" in timings
+
+        (document,) = [
+            doc for doc in _emf_documents(output) if doc.get("priority") == "high"
+        ]
+        assert document["IngestToEnqueue"] == [250]
+        assert document["QueueWait"] == [1000]
+
+    @patch("task_handler.process_task")
+    def test_missing_attributes_are_tolerated(self, mock_process_task, capsys):
+        """Test that records without trace attributes still process"""
+        response = process({"Records": [_record("msg-1", "task-1")]}, None)
+
+        timings = next(
+            json.loads(line)
+            for line in capsys.readouterr().out.splitlines()
+            if '"Task timings"' in line
+        )
+        assert response["batchItemFailures"] == []
+        assert timings["trace_id"] is None
+        assert timings["queue_wait_ms"] is None
@@ -0,0 +1,119 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "task_processor"))
+
+import task_model
+from task_model import (DEFAULT_DESCRIPTION, DEFAULT_PRIORITY, JSON_BACKEND,
+                        Task, TaskSchemaError, decode_task)
+
+
+class TestDecodeTask:
+    """Tests for the decode_task function"""
+
+    def test_decodes_all_fields(self):
+        """Test that every field of a valid body is decoded"""
+        body = json.dumps(
+            {
+                "task_id": "task-1",
+                "task_type": "email",
+                "description": "Send welcome email",
+                "priority": "high",
+                "created_at": "2025-11-09T10:00:00",
+                "payload": {"to": "user@example.com"},
+            }
+        )
+
+        task = decode_task(body)
+
+        assert isinstance(task, Task)
+        assert task.task_id == "task-1"
+        assert task.task_type == "email"
+        assert task.description == "Send welcome email"
+        assert task.priority == "high"
+        assert task.created_at == "2025-11-09T10:00:00"
+        assert task.payload == {"to": "user@example.com"}
+
+    def test_applies_defaults(self):
+        """Test that optional fields get their defaults"""
+        task = decode_task(json.dumps({"task_id": "task-1", "task_type": "email"}))
+
+        assert task.description == DEFAULT_DESCRIPTION
+        assert task.priority == DEFAULT_PRIORITY
+        assert "T" in task.created_at
+        assert task.payload is None
+
+    def test_normal_priority_is_read_as_medium(self):
+        """Test that the priority the API used to send is normalized"""
+        body = json.dumps(
+            {"task_id": "task-1", "task_type": "email", "priority": "normal"}
+        )
+
+        assert decode_task(body).priority == "medium"
+
+    def test_accepts_api_handler_aliases(self):
+        """Test that id and timestamp written by the API handler are accepted"""
+        body = json.dumps(
+            {"id": "task-1", "task_type": "email", "timestamp": "2025-11-09T10:00:00"}
+        )
+
+        task = decode_task(body)
+
+        assert task.task_id == "task-1"
+        assert task.created_at == "2025-11-09T10:00:00"
+
+    def test_accepts_bytes(self):
+        """Test that bytes bodies are decoded"""
+        task = decode_task(b'{"task_id": "task-1", "task_type": "email"}')
+
+        assert task.task_id == "task-1"
+
+    def test_reports_every_error_at_once(self):
+        """Test that all schema problems are reported in one error"""
+        body = json.dumps({"task_type": 42, "priority": ["high"]})
+
+        with pytest.raises(TaskSchemaError) as exc_info:
+            decode_task(body)
+
+        message = str(exc_info.value)
+        assert "task_id is required" in message
+        assert "task_type must be a string" in message
+        assert "priority must be a string" in message
+
+    def test_invalid_json(self):
+        """Test that malformed JSON raises a TaskSchemaError"""
+        with pytest.raises(TaskSchemaError, match="Invalid JSON"):
+            decode_task("invalid json{")
+
+    def test_non_object_body(self):
+        """Test that a body that is not a JSON object is rejected"""
+        with pytest.raises(TaskSchemaError, match="JSON object"):
+            decode_task("[1, 2, 3]")
+
+    def test_schema_error_is_a_value_error(self):
+        """Test that schema errors can be caught as ValueError"""
+        assert issubclass(TaskSchemaError, ValueError)
+
+    def test_created_at_default_is_lazy(self):
+        """Test that the current time is only read when created_at is missing"""
+        body = json.dumps(
+            {
+                "task_id": "task-1",
+                "task_type": "email",
+                "created_at": "2025-11-09T10:00:00",
+            }
+        )
+
+        with patch.object(task_model, "datetime") as mock_datetime:
+            decode_task(body)
+
+        mock_datetime.utcnow.assert_not_called()
+
+    def test_json_backend_is_reported(self):
+        """Test that the JSON backend in use is exposed"""
+        assert JSON_BACKEND in ("orjson", "json")
@@ -0,0 +1,200 @@
+import os
+import sys
+
+import pytest
+
+# Add the lambda directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_handler"))
+
+from validation import (CLAIM_CHECK_MAX_PAYLOAD_BYTES, DESCRIPTION_MAX_LENGTH,
+                        SQS_MAX_PAYLOAD_BYTES, TITLE_MAX_LENGTH,
+                        ValidationError, compile_schema, max_payload_bytes,
+                        validate_task)
+
+SQS_MAX_MESSAGE_BYTES = 256 * 1024
+
+
+def _errors(body):
+    with pytest.raises(ValidationError) as excinfo:
+        validate_task(body)
+    return {error["field"]: error["message"] for error in excinfo.value.errors}
+
+
+class TestValidateTask:
+    """Tests for the validate_task function"""
+
+    def test_fills_in_defaults(self):
+        """Test that a task with only a title gets the spec's defaults"""
+        assert validate_task({"title": "Write docs"}) == {
+            "title": "Write docs",
+            "description": "",
+            "priority": "medium",
+            "task_type": "default",
+            "payload": {},
+        }
+
+    def test_keeps_valid_fields(self):
+        """Test that valid values are returned as sent"""
+        body = {
+            "title": "Ship",
+            "description": "Release 1.0",
+            "due_date": "2025-12-01",
+            "priority": "high",
+            "task_type": "email",
+            "payload": {"to": "a@example.com"},
+        }
+
+        assert validate_task(body) == body
+
+    def test_reports_every_error(self):
+        """Test that all invalid fields are reported together"""
+        errors = _errors(
+            {
+                "description": 5,
+                "due_date": "next week",
+                "priority": "urgent",
+                "task_type": "",
+                "payload": [1],
+            }
+        )
+
+        assert errors == {
+            "title": "is required",
+            "description": "must be a string",
+            "due_date": "must be an ISO-8601 date or date and time",
+            "priority": "must be one of: low, medium, high",
+            "task_type": "must not be empty",
+            "payload": "must be an object",
+        }
+
+    def test_rejects_non_objects(self):
+        """Test that a body that is not an object is rejected as a whole"""
+        assert _errors(["title"]) == {None: "must be a JSON object"}
+
+    @pytest.mark.parametrize(
+        "due_date",
+        ["2025-12-01", "2025-12-01T09:30:00", "2025-12-01T09:30:00Z", "20251201"],
+    )
+    def test_accepts_iso8601_dates(self, due_date):
+        """Test the ISO-8601 forms accepted as due_date"""
+        assert validate_task({"title": "t", "due_date": due_date})["due_date"] == (
+            due_date
+        )
+
+    def test_enforces_length_limits(self):
+        """Test the title and description length limits"""
+        errors = _errors(
+            {
+                "title": "t" * (TITLE_MAX_LENGTH + 1),
+                "description": "d" * (DESCRIPTION_MAX_LENGTH + 1),
+            }
+        )
+
+        assert errors["title"] == f"must be at most {TITLE_MAX_LENGTH} characters"
+        assert "description" in errors
+
+    def test_enforces_payload_size(self):
+        """Test that payloads above the size cap are rejected"""
+        errors = _errors({"title": "t", "payload": {"data": "x" * 1024 * 1024}})
+
+        assert errors["payload"].startswith("must be at most")
+
+    def test_payload_size_boundary(self):
+        """Test that a payload at the cap is accepted and one byte more is not"""
+        # {"data":"..."} is 11 bytes of compact JSON around the string
+        at_cap = {"data": "x" * (SQS_MAX_PAYLOAD_BYTES - 11)}
+        over_cap = {"data": "x" * (SQS_MAX_PAYLOAD_BYTES - 10)}
+
+        assert validate_task({"title": "t", "payload": at_cap})["payload"] == at_cap
+        assert _errors({"title": "t", "payload": over_cap}) == {
+            "payload": f"must be at most {SQS_MAX_PAYLOAD_BYTES} bytes as JSON"
+        }
+
+    def test_largest_task_fits_in_an_sqs_message(self):
+        """Test that the largest valid task builds a message SQS accepts"""
+        import handler
+
+        body = validate_task(
+            {
+                "title": "\u00e9" * TITLE_MAX_LENGTH,
+                "description": "\u00e9" * DESCRIPTION_MAX_LENGTH,
+                "task_type": "t" * 64,
+                "payload": {"data": "x" * (SQS_MAX_PAYLOAD_BYTES - 11)},
+                "due_date": "2025-12-01T09:00:00+00:00",
+            }
+        )
+        data = handler._get_data_from_body(body)
+        message = handler._build_message(data, data["id"], "g")
+
+        assert len(message["MessageBody"].encode("utf-8")) < SQS_MAX_MESSAGE_BYTES
+
+    def test_normal_priority_is_an_alias(self):
+        """Test that normal is accepted and returned as medium"""
+        assert validate_task({"title": "t", "priority": "normal"})["priority"] == (
+            "medium"
+        )
+
+    def test_booleans_are_not_strings_or_numbers(self):
+        """Test that JSON booleans fail type checks"""
+        assert _errors({"title": True}) == {"title": "must be a string"}
+
+    def test_default_payloads_are_not_shared(self):
+        """Test that each task gets its own default payload"""
+        first = validate_task({"title": "a"})
+        first["payload"]["key"] = "value"
+
+        assert validate_task({"title": "b"})["payload"] == {}
+
+
+class TestMaxPayloadBytes:
+    """Tests for the max_payload_bytes function"""
+
+    def test_defaults_below_the_sqs_limit(self):
+        """Test that the default leaves room for the rest of the message"""
+        os.environ.pop("TASK_MAX_PAYLOAD_BYTES", None)
+        os.environ.pop("CLAIM_CHECK_BACKEND", None)
+
+        assert max_payload_bytes() == SQS_MAX_PAYLOAD_BYTES
+
+    def test_inline_payloads_are_capped(self):
+        """Test that a larger setting is ignored without claim-check"""
+        os.environ["TASK_MAX_PAYLOAD_BYTES"] = str(1024 * 1024)
+        os.environ.pop("CLAIM_CHECK_BACKEND", None)
+
+        assert max_payload_bytes() == SQS_MAX_PAYLOAD_BYTES
+
+        os.environ["TASK_MAX_PAYLOAD_BYTES"] = "1024"
+        assert max_payload_bytes() == 1024
+
+    def test_claim_check_allows_larger_payloads(self):
+        """Test that claim-check lifts the cap to the configured size"""
+        os.environ["CLAIM_CHECK_BACKEND"] = "local"
+        os.environ.pop("TASK_MAX_PAYLOAD_BYTES", None)
+
+        assert max_payload_bytes() == CLAIM_CHECK_MAX_PAYLOAD_BYTES
+
+        os.environ["TASK_MAX_PAYLOAD_BYTES"] = str(4 * 1024 * 1024)
+        assert max_payload_bytes() == 4 * 1024 * 1024
+
+
+class TestCompileSchema:
+    """Tests for the compile_schema function"""
+
+    def test_compiles_custom_schemas(self):
+        """Test a schema with numeric and multi-type fields"""
+        validate = compile_schema(
+            {
+                "count": {"type": int, "required": True},
+                "tags": {"type": (list, dict), "max_bytes": 10},
+            }
+        )
+
+        assert validate({"count": 3}) == {"count": 3}
+        with pytest.raises(ValidationError) as excinfo:
+            validate({"count": "3", "tags": ["a" * 20]})
+
+        assert excinfo.value.errors == [
+            {"field": "count", "message": "must be an integer"},
+            {"field": "tags", "message": "must be at most 10 bytes as JSON"},
+        ]
+        assert str(excinfo.value).startswith("count must be an integer")
@@ -34,6 +34,11 @@ export class ApiStack extends cdk.Stack {
 
 		tasks.addMethod('POST', new apigateway.LambdaIntegration(props.apiHandler));
 
+		// Batch ingestion: POST /tasks/batch takes an array of tasks
+		const batch = tasks.addResource('batch');
+
+		batch.addMethod('POST', new apigateway.LambdaIntegration(props.apiHandler));
+
 		// Output API URL
 		new cdk.CfnOutput(this, 'ApiUrl', {
 			value: this.api.url,
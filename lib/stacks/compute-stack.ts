@@ -19,16 +19,26 @@ export class ComputeStack extends cdk.Stack {
 	constructor(scope: Construct, id: string, props: ComputeStackProps) {
 		super(scope, id, props);
 
+		// Modules shared by both functions (structured logging, ...).
+		// Lambda adds the layer's python/ directory to sys.path.
+		const sharedLayer = new lambda.LayerVersion(this, 'SharedLayer', {
+			code: lambda.Code.fromAsset('lambda/shared'),
+			compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
+			description: 'Modules shared by the API handler and task processor',
+		});
+
 		// API handler Lambda Function
 		this.apiHandler = new lambda.Function(this, 'ApiHandlerFunction', {
 			runtime: lambda.Runtime.PYTHON_3_11,
 			handler: 'handler.main',
 			code: lambda.Code.fromAsset('lambda/api_handler'),
+			layers: [sharedLayer],
 			environment: {
 				ENVIRONMENT: props.environment,
 				QUEUE_URL: props.queue.queueUrl,
 				LOCALSTACK_ENDPOINT: props.localstackEndpoint || '',
 				API_TOKEN: process.env.API_TOKEN || 'default_token',
+				LOG_LEVEL: process.env.LOG_LEVEL || 'INFO',
 			},
 			timeout: cdk.Duration.seconds(30),
 		});
@@ -38,16 +48,24 @@ export class ComputeStack extends cdk.Stack {
 			runtime: lambda.Runtime.PYTHON_3_11,
 			handler: 'processor.main',
 			code: lambda.Code.fromAsset('lambda/task_processor'),
+			layers: [sharedLayer],
 			environment: {
 				ENVIRONMENT: props.environment,
+				QUEUE_URL: props.queue.queueUrl,
 				LOCALSTACK_ENDPOINT: props.localstackEndpoint || '',
+				LOG_LEVEL: process.env.LOG_LEVEL || 'INFO',
+				// Extends in-flight messages so slow batches are not redelivered.
+				// Off unless set, as most batches finish well within the visibility timeout
+				VISIBILITY_HEARTBEAT_SECONDS: process.env.VISIBILITY_HEARTBEAT_SECONDS || '',
 			},
 			timeout: cdk.Duration.seconds(60),
 		});
 
-		// Event source mapping
+		// Event source mapping. The processor reports partial batch failures,
+		// so only failed records (and later records of their group) are retried.
 		new LambdaEventSources.SqsEventSource(props.queue, {
-			batchSize: 1,
+			batchSize: 10,
+			reportBatchItemFailures: true,
 		}).bind(this.taskProcessor);
 
 		// Grant permissions